@@ -0,0 +1,169 @@
+"""Benchmark of the affiliation matcher against the original affiliation functions.
+
+A large synthetic list of author affiliations is classified both with the affiliation functions as they were before
+the AffiliationMatcher was introduced (splitting every affiliation and scanning it for every name, and called twice
+per affiliation, as the classification used to do) and with the precompiled AffiliationMatcher, which classifies every
+affiliation once. The original functions attributed an SAAO affiliation to the author whose index was the position of
+the SAAO within the affiliation, so rather than the SAAO authors the affiliations with the SAAO are compared. The
+results are checked for equality.
+
+Usage:
+
+    python -m benchmarks.affiliation_matching [--authors N]
+"""
+
+import argparse
+import time
+
+from pubquery import config
+from pubquery.affiliations import SAAO, SALT_PARTNER, SOUTH_AFRICA, AffiliationMatcher
+
+from benchmarks.fixtures import synthetic_affiliations
+
+
+# the original affiliation functions, as they were in the publications query
+def original_get_south_african_affiliations(affiliations):
+    """Return string of South African institutions in a publication.
+
+    Params
+    ------
+    affiliations : list of affiliations in a publication separated by a semicolon
+
+    Returns
+    -------
+    str
+        South African institutions separated by '|'.
+    """
+    south_african_affiliations = []
+    for k, affiliation in enumerate(affiliations.split("; ")):
+        # add South African institutions
+        if "South Africa" in affiliation:
+            south_african_affiliations.append(affiliation)
+    return south_african_affiliations
+
+
+def original_get_salt_partners(affiliations):
+    """Return string of South African Large Telescope (SALT) partner institutions in a publication.
+
+    Params
+    ------
+    affiliations : list of affiliations in a publication separated by a semicolon
+
+    Returns
+    -------
+    str
+        SALT partner institutions separated by '|'.
+    """
+    salt_partners = set()
+    for k, affiliation in enumerate(affiliations.split("; ")):
+        # add SALT partner institutions
+        if any(partner in affiliation for partner in config.SALT_PARTNERS):
+            salt_partners.add(affiliation)
+
+    return salt_partners
+
+
+def original_get_saao_authors(affiliations, authors):
+    """Return string of authors affiliated South African institutions.
+
+    Params
+    ------
+    affiliations : list of affiliations in a publication separated by a semicolon
+
+    Returns
+    -------
+    str
+        authors affiliated South African institutions separated by '|'.
+    """
+    saao_authors = set()
+    for k, affiliation in enumerate(affiliations.split("; ")):
+        # only authors within the SAOO would have SALT as an affiliation
+        saao_ins = ["SAAO", "South African Astronomical Observatory"]
+        if any(institution in affiliation for institution in saao_ins):
+            k = min(k, len(authors) - 1)
+            saao_authors.add(authors[k])
+    return saao_authors
+
+
+def classify_original(affiliations, authors):
+    # the affiliations with the SAAO are recorded by their index
+    saao_affiliations = set()
+    south_african_affiliations = set()
+    salt_partners = set()
+    for j, affiliation in enumerate(affiliations):
+        if len(original_get_south_african_affiliations(affiliation)) > 0:
+            for aff in original_get_south_african_affiliations(affiliation):
+                south_african_affiliations.add(aff)
+        if len(original_get_saao_authors(affiliation, authors)) > 0:
+            for author in original_get_saao_authors(affiliation, authors):
+                saao_affiliations.add(j)
+        if len(original_get_salt_partners(affiliation)) > 0:
+            for partner in original_get_salt_partners(affiliation):
+                salt_partners.add(partner)
+    return south_african_affiliations, saao_affiliations, salt_partners
+
+
+def classify_matcher(affiliations, matcher):
+    # the i-th affiliation is that of the i-th author, so that the SAAO authors are those of the SAAO affiliations
+    saao_affiliations = set()
+    south_african_affiliations = set()
+    salt_partners = set()
+    for j, affiliation in enumerate(affiliations):
+        for fragment, categories in matcher.classify(affiliation):
+            if SOUTH_AFRICA in categories:
+                south_african_affiliations.add(fragment)
+            if SAAO in categories:
+                saao_affiliations.add(j)
+            if SALT_PARTNER in categories:
+                salt_partners.add(fragment)
+    return south_african_affiliations, saao_affiliations, salt_partners
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def speedup(original_time, time_taken):
+    ratio = original_time / time_taken
+    if ratio < 1:
+        return "{0:.1f} times slower".format(1 / ratio)
+    return "{0:.1f} times faster".format(ratio)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--authors", type=int, default=100000, help="number of authors"
+    )
+    args = parser.parse_args()
+
+    affiliations = synthetic_affiliations(args.authors)
+    authors = ["Author {0}".format(i) for i in range(args.authors)]
+
+    original, original_time = timed(classify_original, affiliations, authors)
+    matcher = AffiliationMatcher(salt_partners=config.SALT_PARTNERS)
+    matched, matcher_time = timed(classify_matcher, affiliations, matcher)
+    uncached_matcher = AffiliationMatcher(
+        salt_partners=config.SALT_PARTNERS, cache_size=0
+    )
+    _, uncached_time = timed(classify_matcher, affiliations, uncached_matcher)
+
+    assert original == matched, "The matcher's results differ from the original ones."
+    print("{0} authors".format(args.authors))
+    print("original functions: {0:.3f} s".format(original_time))
+    print(
+        "matcher:            {0:.3f} s ({1})".format(
+            matcher_time, speedup(original_time, matcher_time)
+        )
+    )
+    print(
+        "matcher (no cache): {0:.3f} s ({1})".format(
+            uncached_time, speedup(original_time, uncached_time)
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+"""Benchmark of the vectorised classification of publications against the original per-publication loop.
+
+A synthetic list of publications (most with a handful of authors, some collaboration papers with hundreds of authors)
+is classified both with the original per-publication classification, one publication at a time, and with
+add_derived_columns. The original classification joined sets of institutions, and it attributed an affiliation to the
+author whose index was the position of a matching institution within the affiliation. So the institutions are
+compared irrespective of their order, and the number of SA authors and the SAAO authors are checked against the
+affiliation of every author rather than against the original results.
+
+Usage:
+
+    python -m benchmarks.classification [--publications N]
+"""
+
+import argparse
+import copy
+import random
+import time
+
+from pubquery import config
+from pubquery.affiliations import SAAO_NAMES
+from pubquery.analytics import add_derived_columns
+
+from benchmarks.fixtures import synthetic_affiliations
+
+
+# the original per-publication classification and the affiliation functions it used
+def original_classify_publication(p):
+    """Add the derived details (such as the refereed status and the SA institutions) to a publication.
+
+    Params
+    ------
+    p : publication dictionary
+        The publication. Its authors and affiliations must be lists.
+    """
+    authors = p["author"]
+    affiliations = p["aff"]
+
+    # add refereed status
+    p["refereed"] = p["property"] and "REFEREED" in p["property"]
+
+    # add ADS url
+    p["ads_url"] = "https://ui.adsabs.harvard.edu/#abs/{0}/abstract".format(p["bibcode"])
+
+    # No. of authors on paper affiliated to a SA institution
+    p["no_of_authors_aff_to_SA_ins"] = original_count_authors_affiliated_to_sa_ins(
+        affiliations, authors
+    )
+
+    # First author institution and SALT partner institutions
+    p["institute_of_first_author"] = affiliations[0]
+
+    saao_authors = set()
+    south_african_affiliations = set()
+    salt_partners = set()
+    for j, affiliation in enumerate(affiliations):
+
+        if len(original_get_south_african_affiliations(affiliation)) > 0:
+            for aff in original_get_south_african_affiliations(affiliation):
+                south_african_affiliations.add(aff)
+        if len(original_get_saao_authors(affiliation, authors)) > 0:
+            for author in original_get_saao_authors(affiliation, authors):
+                saao_authors.add(author)
+        if len(original_get_salt_partners(affiliation)) > 0:
+            for partner in original_get_salt_partners(affiliation):
+                salt_partners.add(partner)
+
+    # removes all empty elements from the list
+    p["authors_affiliated_with_SAAO"] = "; ".join(saao_authors)
+
+    p["SA_institutions"] = "; ".join(south_african_affiliations)
+
+    p["SALT_partners"] = "; ".join(salt_partners)
+
+
+def original_get_south_african_affiliations(affiliations):
+    """Return string of South African institutions in a publication.
+
+    Params
+    ------
+    affiliations : list of affiliations in a publication separated by a semicolon
+
+    Returns
+    -------
+    str
+        South African institutions separated by '|'.
+    """
+    south_african_affiliations = []
+    for k, affiliation in enumerate(affiliations.split("; ")):
+        # add South African institutions
+        if "South Africa" in affiliation:
+            south_african_affiliations.append(affiliation)
+    return south_african_affiliations
+
+
+def original_get_salt_partners(affiliations):
+    """Return string of South African Large Telescope (SALT) partner institutions in a publication.
+
+    Params
+    ------
+    affiliations : list of affiliations in a publication separated by a semicolon
+
+    Returns
+    -------
+    str
+        SALT partner institutions separated by '|'.
+    """
+    salt_partners = set()
+    for k, affiliation in enumerate(affiliations.split("; ")):
+        # add SALT partner institutions
+        if any(partner in affiliation for partner in config.SALT_PARTNERS):
+            salt_partners.add(affiliation)
+
+    return salt_partners
+
+
+def original_get_saao_authors(affiliations, authors):
+    """Return string of authors affiliated South African institutions.
+
+    Params
+    ------
+    affiliations : list of affiliations in a publication separated by a semicolon
+
+    Returns
+    -------
+    str
+        authors affiliated South African institutions separated by '|'.
+    """
+    saao_authors = set()
+    for k, affiliation in enumerate(affiliations.split("; ")):
+        # only authors within the SAOO would have SALT as an affiliation
+        saao_ins = ["SAAO", "South African Astronomical Observatory"]
+        if any(institution in affiliation for institution in saao_ins):
+            k = min(k, len(authors) - 1)
+            saao_authors.add(authors[k])
+    return saao_authors
+
+
+def original_count_authors_affiliated_to_sa_ins(affiliations, authors):
+    """Return counts of authors affiliated South African institutions.
+
+    Params
+    ------
+    affiliations : list of affiliations in a publication separated by a semicolon
+    authors : list of authors in a publication
+
+    Returns
+    -------
+    int
+        counts of authors affiliated South African institutions
+    """
+    authors_aff_to_sa_inst = set()
+    for affiliation in affiliations:
+        for k, ins in enumerate(affiliation.split("; ")):
+            if "South Africa" in affiliation:
+                k = min(k, len(authors) - 1)
+                authors_aff_to_sa_inst.add(authors[k])
+
+    return len(authors_aff_to_sa_inst)
+
+
+def synthetic_publications(n, seed=42):
+    # publications with 1 to 20 authors, and with 200 to 1000 authors for every 100th publication
+    rnd = random.Random(seed)
+    publications = []
+    for i in range(n):
+        authors = rnd.randint(200, 1000) if i % 100 == 0 else rnd.randint(1, 20)
+        publications.append(
+            dict(
+                bibcode="2025MNRAS.{0:05d}".format(i),
+                property=["REFEREED"] if rnd.random() < 0.8 else ["NOT REFEREED"],
+                author=["Author {0}".format(k) for k in range(authors)],
+                aff=synthetic_affiliations(authors, seed=i),
+            )
+        )
+    return publications
+
+
+def unordered(joined):
+    # the distinct values of a joined string, irrespective of their order
+    return set(joined.split("; ")) if joined else set()
+
+
+def check(original, vectorised):
+    # Compare the results of the original and the vectorised classification of a publication, and return whether the
+    # original classification attributed the affiliations to the right authors.
+    for column in ("refereed", "ads_url", "institute_of_first_author"):
+        assert original[column] == vectorised[column], column
+    for column in ("SA_institutions", "SALT_partners"):
+        assert unordered(original[column]) == unordered(vectorised[column]), column
+
+    # the i-th affiliation is that of the i-th author
+    affiliations = list(zip(vectorised["author"], vectorised["aff"]))
+    sa_authors = {author for author, aff in affiliations if "South Africa" in aff}
+    saao_authors = dict.fromkeys(
+        author
+        for author, aff in affiliations
+        if any(name in aff for name in SAAO_NAMES)
+    )
+    assert vectorised["no_of_authors_aff_to_SA_ins"] == len(sa_authors)
+    assert vectorised["authors_affiliated_with_SAAO"] == "; ".join(saao_authors)
+    return (
+        original["no_of_authors_aff_to_SA_ins"] == len(sa_authors)
+        and unordered(original["authors_affiliated_with_SAAO"]) == set(saao_authors)
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--publications", type=int, default=10000, help="number of publications"
+    )
+    args = parser.parse_args()
+
+    publications = synthetic_publications(args.publications)
+    looped = copy.deepcopy(publications)
+    vectorised = copy.deepcopy(publications)
+
+    start = time.perf_counter()
+    for p in looped:
+        original_classify_publication(p)
+    loop_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    add_derived_columns(vectorised)
+    vectorised_time = time.perf_counter() - start
+
+    correctly_attributed = sum(
+        check(original, p) for original, p in zip(looped, vectorised)
+    )
+    print(
+        "{0} publications with {1} authors".format(
+            len(publications), sum(len(p["author"]) for p in publications)
+        )
+    )
+    print(
+        "The original loop attributed the affiliations of {0} publications to the wrong authors".format(
+            len(publications) - correctly_attributed
+        )
+    )
+    print("per-publication loop: {0:.3f} s".format(loop_time))
+    print(
+        "vectorised:           {0:.3f} s ({1:.1f} times faster)".format(
+            vectorised_time, loop_time / vectorised_time
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+"""Recorded and synthetic HTTP fixtures for the benchmarks.
+
+All HTTP requests of the script (those of the ads library, the authors and affiliations queries and the Web of Science
+queries) are made with the requests library, and thus end up in the send method of a requests transport adapter.
+The context managers in this module replace that method, so that responses can be recorded from the real services,
+replayed from a recording, or generated for a synthetic set of publications of any size. No network access is needed
+for replaying or generating responses.
+
+The module also provides synthetic author affiliations for the benchmarks of the affiliation classification.
+"""
+
+import contextlib
+import json
+import random
+import re
+import threading
+from urllib.parse import parse_qs, urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+ADS_HOSTS = ("api.adsabs.harvard.edu", "ui.adsabs.harvard.edu")
+WOS_HOST = "wos-api.clarivate.com"
+
+JOURNALS = ["MNRAS", "ApJ", "A&A", "AJ", "PASP", "ApJS"]
+AFFILIATIONS = [
+    "South African Astronomical Observatory, PO Box 9, Observatory 7935, Cape Town, South Africa",
+    "Department of Astronomy, University of Cape Town, Rondebosch 7701, South Africa",
+    "Max-Planck-Institut für Astronomie, Heidelberg, Germany",
+    "Department of Physics and Astronomy, Rutgers University, Piscataway, NJ, USA",
+    "Centre for Extragalactic Astronomy, Durham University, Durham, UK",
+    "Institute of Astronomy, University of Cambridge, Cambridge, UK",
+    "Harvard-Smithsonian Center for Astrophysics, Cambridge, MA, USA",
+    "Inter-University Centre for Astronomy & Astrophysics, Pune, India",
+]
+
+
+# institutions of the synthetic author affiliations, including a variant of the SAAO's name
+INSTITUTIONS = [
+    "South African Astronomical Observatory, PO Box 9, Observatory 7935, Cape Town, South Africa",
+    "SAAO, Cape Town, South Africa",
+    "Department of Astronomy, University of Cape Town, Rondebosch 7701, South Africa",
+    "Max-Planck-Institut für Astronomie, Heidelberg, Germany",
+    "Department of Physics and Astronomy, Rutgers University, Piscataway, NJ, USA",
+    "Centre for Extragalactic Astronomy, Durham University, Durham, UK",
+    "Department of Astronomy, University of Wisconsin-Madison, Madison, WI, USA",
+    "Institute of Astronomy, University of Cambridge, Cambridge, UK",
+    "Harvard-Smithsonian Center for Astrophysics, Cambridge, MA, USA",
+    "Inter-University Centre for Astronomy & Astrophysics, Pune, India",
+]
+
+
+def synthetic_affiliations(n, seed=42):
+    """Return the affiliations of n authors, with one to three institutions each.
+
+    The institutions of an affiliation are separated by "; ", as in ADS records.
+    """
+
+    rnd = random.Random(seed)
+    return [
+        "; ".join(rnd.sample(INSTITUTIONS, rnd.randint(1, 3))) for _ in range(n)
+    ]
+
+
+def _response(request, status_code, headers, body):
+    response = requests.Response()
+    response.status_code = status_code
+    response.headers.update(headers)
+    response._content = body.encode("utf-8")
+    response.encoding = "utf-8"
+    response.url = request.url
+    response.request = request
+    return response
+
+
+def _json_response(request, content):
+    headers = {
+        "Content-Type": "application/json",
+        "X-RateLimit-Limit": "5000",
+        "X-RateLimit-Remaining": "5000",
+        "X-RateLimit-Reset": "0",
+    }
+    return _response(request, 200, headers, json.dumps(content))
+
+
+@contextlib.contextmanager
+def _sending(send):
+    # replace the transport adapter's send method
+    original = HTTPAdapter.send
+    HTTPAdapter.send = lambda adapter, request, **kwargs: send(
+        original, adapter, request, **kwargs
+    )
+    try:
+        yield
+    finally:
+        HTTPAdapter.send = original
+
+
+class Recording:
+    """Recorded HTTP responses, keyed by request method and URL.
+
+    Params
+    ------
+    responses : dict
+        Dictionary of request keys and recorded responses.
+    """
+
+    def __init__(self, responses=None):
+        self.responses = responses or dict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(request):
+        return "{method} {url}".format(method=request.method, url=request.url)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls(json.load(f))
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump(self.responses, f)
+
+    @contextlib.contextmanager
+    def record(self):
+        """Context manager recording the responses of all requests, which are sent to the real services."""
+
+        def send(original, adapter, request, **kwargs):
+            response = original(adapter, request, **kwargs)
+            with self._lock:
+                self.responses[Recording.key(request)] = dict(
+                    status_code=response.status_code,
+                    headers=dict(response.headers),
+                    body=response.text,
+                )
+            return response
+
+        with _sending(send):
+            yield
+
+    @contextlib.contextmanager
+    def replay(self):
+        """Context manager answering all requests with the recorded responses.
+
+        A LookupError is raised for a request without a recorded response.
+        """
+
+        def send(original, adapter, request, **kwargs):
+            recorded = self.responses.get(Recording.key(request))
+            if recorded is None:
+                raise LookupError("No recorded response for " + Recording.key(request))
+            headers = {
+                name: value
+                for name, value in recorded["headers"].items()
+                if name.lower() not in ("content-encoding", "transfer-encoding")
+            }
+            return _response(
+                request, recorded["status_code"], headers, recorded["body"]
+            )
+
+        with _sending(send):
+            yield
+
+
+class SyntheticServices:
+    """Synthetic ADS and Web of Science services for a given number of publications.
+
+    Every ADS search finds a random (but reproducible) sample of the publications, whose size is chosen so that the
+    given number of searches find each publication twice on average. Search results are paged with a cursor, as by the
+    real ADS. Authors and affiliations queries return the requested publications, and the Web of Science finds half of
+    the DOIs.
+
+    Params
+    ------
+    publications : int
+        Number of publications.
+    searches : int
+        Number of searches (per term) which are run.
+    seed : int
+        Seed for the random numbers.
+    """
+
+    def __init__(self, publications, searches, seed=42):
+        self.count = publications
+        self.searches = max(searches, 1)
+        self.seed = seed
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def document(self, i):
+        """Return the ADS document of the i-th publication."""
+
+        rnd = random.Random(self.seed * 1000003 + i)
+        authors = rnd.randint(200, 1000) if i % 100 == 0 else rnd.randint(1, 20)
+        journal = rnd.choice(JOURNALS)
+        bibcode = "2025{journal:.<5}{i:010d}".format(journal=journal, i=i)
+        return dict(
+            id=str(i),
+            abstract="Abstract of publication {0}.".format(i),
+            aff=[
+                "; ".join(rnd.sample(AFFILIATIONS, rnd.randint(1, 2)))
+                for _ in range(authors)
+            ],
+            author=["Author{0}, A.".format(k) for k in range(authors)],
+            bibcode=bibcode,
+            data=None,
+            doi=["10.0000/{0}".format(bibcode)],
+            identifier=[bibcode],
+            keyword=["keyword"],
+            page=[str(rnd.randint(1, 999))],
+            property=["REFEREED"] if rnd.random() < 0.8 else ["NOT REFEREED"],
+            pub=journal,
+            pubdate="2025-01-00",
+            title=["Title of publication {0}".format(i)],
+            volume=str(rnd.randint(1, 600)),
+        )
+
+    def _index(self, bibcode):
+        return int(bibcode[-10:])
+
+    def _search_results(self, q):
+        # indices of the publications found by a search (or by the given bibcodes)
+        listed = re.match(r'\s*(?:identifier|bibcode):\((.*)\)', q)
+        if listed:
+            return [self._index(b) for b in re.findall(r'"([^"]+)"', listed.group(1))]
+        terms = q.split(" AND pubdate:")[0].count(" OR ") + 1
+        size = min(self.count, -(-2 * self.count * terms // self.searches))
+        return random.Random(q).sample(range(self.count), size)
+
+    def _ads(self, request):
+        params = parse_qs(urlsplit(request.url).query)
+        q = params["q"][0]
+        fl = [f.strip() for value in params.get("fl", []) for f in value.split(",")]
+        rows = int(params.get("rows", ["10"])[0])
+        cursor = params.get("cursorMark", [None])[0]
+        start = 0 if cursor in (None, "*") else int(cursor)
+
+        found = self._search_results(q)
+        page = found[start : start + rows]
+        docs = []
+        for i in page:
+            document = self.document(i)
+            docs.append({f: document[f] for f in fl if f in document})
+        content = dict(
+            responseHeader=dict(params=dict(rows=str(rows))),
+            response=dict(numFound=len(found), start=start, docs=docs),
+            nextCursorMark=str(start + len(page)),
+        )
+        if "hl" in params:
+            term = re.search(r'"([^"]+)"', q)
+            snippet = "a mention of <em>{0}</em>".format(term.group(1) if term else "")
+            content["highlighting"] = {str(i): dict(body=[snippet]) for i in page}
+        return _json_response(request, content)
+
+    def _wos(self, request):
+        params = parse_qs(urlsplit(request.url).query)
+        dois = re.findall(r'"([^"]+)"', params["usrQuery"][0]) or [
+            params["usrQuery"][0][len("do=") :]
+        ]
+        data = [
+            {"Other": {"Identifier.Doi": [doi]}}
+            for doi in dois
+            if self._index(doi) % 2 == 0
+        ]
+        return _json_response(
+            request, {"QueryResult": {"RecordsFound": len(data)}, "Data": data}
+        )
+
+    @contextlib.contextmanager
+    def serve(self):
+        """Context manager answering all ADS and Web of Science requests with synthetic responses."""
+
+        def send(original, adapter, request, **kwargs):
+            with self._lock:
+                self.requests += 1
+            host = urlsplit(request.url).hostname
+            if host in ADS_HOSTS:
+                return self._ads(request)
+            if host == WOS_HOST:
+                return self._wos(request)
+            raise LookupError("No synthetic service for " + request.url)
+
+        with _sending(send):
+            yield
@@ -0,0 +1,177 @@
+"""Benchmark of the query pipeline, with recorded or synthetic responses instead of the real ADS and Web of Science.
+
+The ADS searches (ADSQueries.by_fulltext_keywords, by_authors and by_affiliations), the authors and affiliations
+queries, the Web of Science checks, the spreadsheet creation (publications_spreadsheet) and the HTML publication list
+(generate_publications_list.create_html) are timed one after the other.
+
+By default synthetic responses for 100, 1000 and 10000 publications are used (see fixtures.SyntheticServices). As the
+searches overlap, somewhat fewer distinct publications are found. Alternatively, the responses of the real services
+can be recorded for a date range, and the recording can then be replayed for the same date range, which requires no
+network access.
+
+Usage:
+
+    python -m benchmarks.pipeline [--sizes 100 1000 10000]
+    python -m benchmarks.pipeline --record fixtures.json --start 2025-01-01 --end 2025-01-31
+    python -m benchmarks.pipeline --replay fixtures.json --start 2025-01-01 --end 2025-01-31
+"""
+
+import argparse
+import contextlib
+import copy
+import datetime
+import io
+import time
+
+import pandas as pd
+
+from pubquery import config
+from pubquery.ads_queries import ADSQueries
+from pubquery.analytics import add_derived_columns
+from pubquery.generate_publications_list import create_html
+from pubquery.publications_query import (
+    check_dois_indexed_in_wos,
+    get_authors_and_affiliations,
+    publications_spreadsheet,
+    spreadsheet_columns,
+)
+from pubquery.wos_queries import WoSQueries
+
+from benchmarks.fixtures import Recording, SyntheticServices
+
+
+def search(queries):
+    # the searches of a run, without rate limiting
+    found = dict()
+    for publications in (
+        queries.by_fulltext_keywords(config.KEYWORDS),
+        queries.by_authors(config.AUTHORS.keys()),
+        queries.by_affiliations(config.AFFILIATIONS),
+        queries.by_affiliations(config.INSTITUTIONS),
+    ):
+        for bibcode, p in publications.items():
+            found.setdefault(bibcode, p)
+    return list(found.values())
+
+
+def enrich(publications):
+    get_authors_and_affiliations(publications)
+
+
+def check_wos(publications):
+    check_dois_indexed_in_wos(publications, WoSQueries(requests_per_second=0))
+
+
+def spreadsheet(publications):
+    publications = copy.deepcopy(publications)
+    add_derived_columns(publications)
+    publications_spreadsheet(publications, spreadsheet_columns())
+
+
+def publication_list(publications):
+    df = pd.DataFrame(
+        {
+            "YEAR": [int(p["pubdate"][:4]) for p in publications],
+            "PSAAO": [str(i) for i in range(len(publications))],
+            "Responsibility": [", ".join(p["author"]) for p in publications],
+            "TITLE": [p["title"][0] for p in publications],
+            "REF": [p["pub"] for p in publications],
+            "VOL": [p["volume"] for p in publications],
+            "FPG": [p["page"][0] if p["page"] else None for p in publications],
+            "URL": [
+                "https://ui.adsabs.harvard.edu/abs/{0}".format(p["bibcode"])
+                for p in publications
+            ],
+            "TELESCOPE": ["SALT|1.9m" for _ in publications],
+        }
+    )
+    create_html(df)
+
+
+def timed(func, *args):
+    # call a function without its progress output, and return its result and the elapsed time
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def run(label, from_date, to_date):
+    # time all the stages and print the results
+    queries = ADSQueries(from_date, to_date, requests_per_second=0)
+    publications, search_time = timed(search, queries)
+    times = [("ADS searches", search_time)]
+    for name, func in (
+        ("authors and affiliations", enrich),
+        ("Web of Science", check_wos),
+        ("spreadsheet", spreadsheet),
+        ("publication list", publication_list),
+    ):
+        times.append((name, timed(func, publications)[1]))
+
+    print("{0}: {1} publications".format(label, len(publications)))
+    for name, seconds in times:
+        print(
+            "    {name:<26} {seconds:8.3f} s {rate:10.0f} publications/s".format(
+                name=name, seconds=seconds, rate=len(publications) / max(seconds, 1e-9)
+            )
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[100, 1000, 10000],
+        help="numbers of synthetic publications",
+    )
+    parser.add_argument("--record", help="file for recording the real responses")
+    parser.add_argument("--replay", help="file with recorded responses")
+    parser.add_argument(
+        "--start",
+        type=datetime.date.fromisoformat,
+        help="start date of the recorded date range",
+    )
+    parser.add_argument(
+        "--end",
+        type=datetime.date.fromisoformat,
+        help="end date of the recorded date range",
+    )
+    args = parser.parse_args()
+
+    if args.record or args.replay:
+        if not args.start or not args.end:
+            parser.error("--start and --end are required for recording and replaying")
+        if args.record:
+            recording = Recording()
+            with recording.record():
+                run("recorded", args.start, args.end)
+            recording.save(args.record)
+        else:
+            config.ADS_API_KEY = config.ADS_API_KEY or "replay"
+            with Recording.load(args.replay).replay():
+                run("replayed", args.start, args.end)
+        return
+
+    config.ADS_API_KEY = config.ADS_API_KEY or "synthetic"
+    searches = (
+        len(config.KEYWORDS)
+        + len(config.AUTHORS)
+        + len(config.AFFILIATIONS)
+        + len(config.INSTITUTIONS)
+    )
+    for size in args.sizes:
+        services = SyntheticServices(size, searches)
+        with services.serve():
+            run(
+                "{0} synthetic publications".format(size),
+                datetime.date(2025, 1, 1),
+                datetime.date(2025, 1, 31),
+            )
+        print("    ({0} requests)".format(services.requests))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""Benchmark of the HTML publication list against the original implementation.
+
+A synthetic catalogue of publications (including missing values, page ranges, collaborations in parentheses and years
+outside the list's range) is rendered both with the original create_html, which filtered the whole catalogue for every
+year and rendered one row at a time, and with the current one, which sorts and groups the catalogue once and renders
+all rows together. The results are checked for equality.
+
+Usage:
+
+    python -m benchmarks.publication_list [--rows N]
+"""
+
+import argparse
+import datetime
+import random
+import time
+
+import numpy as np
+import pandas as pd
+
+from pubquery.generate_publications_list import create_html
+
+JOURNALS = ["MNRAS", "ApJ", "A&A", "AJ", "PASP", "Nature & Science "]
+TELESCOPES = ["SALT", "1.9m", "SALT|1.9m", "Lesedi|1.0m|SALT"]
+
+
+def synthetic_catalogue(n, seed=42):
+    # a catalogue of n publications, with some missing and unusual values
+    rnd = random.Random(seed)
+
+    def maybe(value, probability=0.05):
+        return None if rnd.random() < probability else value
+
+    rows = []
+    for i in range(n):
+        authors = ", ".join(
+            "Author{0}, {1}.".format(rnd.randint(0, 5000), chr(65 + rnd.randint(0, 25)))
+            for _ in range(rnd.randint(1, 8))
+        )
+        if rnd.random() < 0.1:
+            authors += " (& the {0} collaboration), ".format(rnd.choice(["H.E.S.S.", "MeerKAT"]))
+        rows.append(
+            dict(
+                YEAR=maybe(float(rnd.randint(1965, datetime.datetime.now().year + 1))),
+                PSAAO=rnd.randint(1, n // 2),
+                Responsibility=maybe(authors),
+                TITLE=maybe(" Title of publication {0} ".format(i)),
+                REF=maybe(rnd.choice(JOURNALS)),
+                VOL=maybe(float(rnd.randint(1, 600))),
+                FPG=maybe(rnd.choice([str(rnd.randint(1, 999)), "12 pp", "L5", 0])),
+                URL=maybe(
+                    rnd.choice(
+                        [
+                            "https://ui.adsabs.harvard.edu/abs/{0}".format(i),
+                            "https://example.org/{0}".format(i),
+                        ]
+                    )
+                ),
+                TELESCOPE=maybe(rnd.choice(TELESCOPES), 0.3),
+            )
+        )
+    return pd.DataFrame(rows)
+
+
+# the original implementation of create_html
+def original_create_html(df):
+    start_year = 1971
+    end_year = datetime.datetime.now().year
+
+    html = ""
+    for year in range(end_year, start_year - 1, -1):
+        html += "<h2>{year}</h2>\n".format(year=year)
+        df_year = df[np.isclose(df["YEAR"].values, year)]
+        rows = []
+        for _, row in df_year.iterrows():
+            rows.append(row)
+        rows.sort(key=lambda x: str(x["PSAAO"]), reverse=True)
+        for row in rows:
+            html += original_create_row_content(year, row)
+
+    return html
+
+
+def original_create_row_content(year, row):
+    return """<p><strong>{id}. </strong> {authors}, {year}. {title} {location} {link} {telescopes}</p>\n""".format(
+        id=row["PSAAO"],
+        authors=original_create_authors(row["Responsibility"]),
+        title=(
+            "{title}.".format(title=row["TITLE"].strip())
+            if not pd.isna([row["TITLE"]])
+            else ""
+        ),
+        year=year,
+        location=original_create_location(row["REF"], row["VOL"], row["FPG"]),
+        link=original_create_link(row["URL"]),
+        telescopes=original_create_telescopes(row["TELESCOPE"]),
+    )
+
+
+def original_create_authors(authors):
+    if pd.isna([authors]):
+        return ""
+    authors = authors.strip(", ").replace("( &", "(&").replace("& ", "&amp; ")
+    parenthesis = authors.find("(")
+    if parenthesis != -1:
+        return "{first}<em>{second}</em>".format(
+            first=authors[:parenthesis], second=authors[parenthesis:]
+        )
+    else:
+        return authors
+
+
+def original_create_location(ref, volume, first_page):
+    location = ""
+    if pd.isna([ref]):
+        return location
+    location += "<em>{ref}</em>".format(ref=ref.strip().replace("& ", "&amp; "))
+    if pd.isna([volume]):
+        return location
+    location += ", <strong>{volume}".format(volume=volume)
+    if pd.isna([first_page]):
+        first_page = None
+    if first_page and "pp" in str(first_page).lower():
+        first_page = None
+    if first_page:
+        location += ": "
+    location += "</strong>"
+    if first_page:
+        location += str(first_page)
+    location += "."
+
+    return location
+
+
+def original_create_link(url):
+    if url and not pd.isna([url]):
+        title = "ADS" if "saaoads." in url or "adsabs." in url else "Link"
+        return '<a href="{url}">{title}</a>'.format(url=url, title=title)
+    else:
+        return ""
+
+
+def original_create_telescopes(telescopes):
+    if pd.isna([telescopes]):
+        return ""
+    return "<em>[{telescopes}]</em>".format(telescopes=telescopes.replace("|", ", "))
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--rows", type=int, default=20000, help="number of publications"
+    )
+    args = parser.parse_args()
+
+    df = synthetic_catalogue(args.rows)
+    original, original_time = timed(original_create_html, df)
+    html, html_time = timed(create_html, df)
+
+    assert original == html, "The rendered list differs from the original one."
+    print("{0} publications".format(args.rows))
+    print("original create_html: {0:.3f} s".format(original_time))
+    print(
+        "create_html:          {0:.3f} s ({1:.1f} times faster)".format(
+            html_time, original_time / html_time
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
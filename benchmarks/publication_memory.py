@@ -0,0 +1,83 @@
+"""Benchmark of the memory used by Publication records against the publication dictionaries used before.
+
+Synthetic ADS search results (see fixtures.SyntheticServices) are turned into publications in the same way as by
+ADSQueries, once as dictionaries with the requested fields and once as Publication records. The results are read from
+their JSON representation, as they are when they come from ADS or from the cache, so that every result has its own
+copy of every string. The memory retained by the publications is measured with tracemalloc.
+
+Usage:
+
+    python -m benchmarks.publication_memory [--publications N]
+"""
+
+import argparse
+import json
+import tracemalloc
+
+from pubquery.publication import Publication
+
+from benchmarks.fixtures import SyntheticServices
+
+FIELDS = [
+    "abstract",
+    "aff",
+    "author",
+    "bibcode",
+    "data",
+    "doi",
+    "keyword",
+    "page",
+    "property",
+    "pub",
+    "pubdate",
+    "title",
+    "volume",
+]
+
+
+def as_dict(document):
+    record = {f: document[f] for f in FIELDS}
+    record["fulltext_keywords"] = []
+    return record
+
+
+def retained_memory(results, convert):
+    # memory (in bytes) retained by the publications created from search results
+    tracemalloc.start()
+    publications = [convert(json.loads(result)) for result in results]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert len(publications) == len(results)
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--publications", type=int, default=20000, help="number of publications"
+    )
+    args = parser.parse_args()
+
+    services = SyntheticServices(args.publications, 1)
+    results = [json.dumps(services.document(i)) for i in range(args.publications)]
+
+    dict_size = retained_memory(results, as_dict)
+    publication_size = retained_memory(results, Publication.from_dict)
+
+    print("{0} publications".format(args.publications))
+    print(
+        "dictionaries:        {0:8.1f} MB ({1:.0f} bytes per publication)".format(
+            dict_size / 1e6, dict_size / args.publications
+        )
+    )
+    print(
+        "Publication records: {0:8.1f} MB ({1:.0f} bytes per publication, {2:.0%} less)".format(
+            publication_size / 1e6,
+            publication_size / args.publications,
+            1 - publication_size / dict_size,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
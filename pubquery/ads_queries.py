@@ -1,6 +1,45 @@
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import ads
 
 from pubquery import config
+from pubquery.cache import ADS_SEARCH_TTL, normalized_query
+from pubquery.instrumentation import RequestStats
+from pubquery.publication import Publication
+from pubquery.rate_limiter import RateLimiter
+from pubquery.retry import RetryPolicy
+
+
+def _ads_rate_limit_headers(error):
+    # The ads library doesn't expose the response of a failed request, but it records the rate limit headers of the
+    # last successful one.
+    limits = ads.base.RateLimits.getRateLimits("SearchQuery").to_dict()
+    return {
+        "X-RateLimit-Remaining": limits.get("remaining", ""),
+        "X-RateLimit-Reset": limits.get("reset", ""),
+    }
+
+
+def _month(date):
+    # number of months since the year 0
+    return 12 * date.year + date.month - 1
+
+
+def _pubdate(first_month, last_month):
+    # ADS pubdate range for a range of months (as returned by _month)
+    return "[{0:04d}-{1:02d} TO {2:04d}-{3:02d}]".format(
+        first_month // 12, first_month % 12 + 1, last_month // 12, last_month % 12 + 1
+    )
+
+
+def _mentions(text, term):
+    # Check whether a text contains a term as a whole word or phrase. As ADS treats acronyms case-sensitively, terms in
+    # upper case are matched case-sensitively; all other terms are matched case-insensitively.
+    pattern = r"(?<!\w)" + r"\s+".join(re.escape(word) for word in term.split()) + r"(?!\w)"
+    flags = 0 if term.isupper() else re.IGNORECASE
+    return re.search(pattern, text, flags) is not None
 
 
 class ADSQueries:
@@ -14,13 +53,70 @@ class ADSQueries:
         Earliest date for which publications should be queried. Only the year and month are relevant.
     to_date : datetime.date
         Latest date for which publications should be queried. Only the year and month are relevant.
+    max_pages : int
+        Maximum number of result pages to request per search.
+    rows : int
+        Number of results per page. ADS allows at most 2000.
+    max_workers : int
+        Maximum number of searches to run concurrently. A value of 1 runs the searches one after the other.
+    requests_per_second : float
+        Maximum number of searches to start per second, across all workers.
+    cache : ResponseCache
+        Cache for search results. No cache is used if this is None.
+    quota : ADSQuota
+        Tracker for the ADS API quota. The quota is not tracked if this is None.
+    combine_terms : bool
+        Whether to combine the search terms (keywords, authors, etc.) into as few OR-combined queries as the maximum
+        query length allows, rather than searching for every term separately.
+    max_query_length : int
+        Maximum length of a combined query string.
+    verify_keywords : bool
+        Whether to search for the keywords of a combined full text search which aren't in the highlights of a result,
+        to find all the keywords the result contains. This needs more searches than searching for every keyword
+        separately.
+    shard_months : int
+        Number of months per date range shard. If this is None, the whole date range is searched at once. Otherwise
+        every search is run separately for consecutive shards of the date range, and a shard whose search is truncated
+        is split in half until it covers a single month.
+
+    Attributes
+    ----------
+    search_stats : list of dict
+        The number of results found and returned for every search, with the keys "query", "found", "returned",
+        "seconds" (the time taken by the search) and "cached" (whether the results were taken from the cache). A
+        search is truncated if fewer results are returned than found, as at most rows * max_pages results are
+        returned.
+    request_stats : RequestStats
+        Statistics of the requests made for the searches.
+    truncated : list of str
+        The publication searches whose results are incomplete as they were truncated.
     """
 
-    def __init__(self, from_date, to_date, max_pages=30):
+    # fields for which highlights are requested when combined full text searches are attributed to their keywords
+    HIGHLIGHT_FIELDS = ["abstract", "ack", "body", "title"]
+
+    # maximum number of bibcodes per search verifying the keywords of combined full text searches
+    VERIFICATION_BATCH_SIZE = 100
+
+    def __init__(
+        self,
+        from_date,
+        to_date,
+        max_pages=30,
+        rows=500,
+        max_workers=4,
+        requests_per_second=2,
+        cache=None,
+        quota=None,
+        combine_terms=False,
+        max_query_length=1000,
+        shard_months=None,
+        verify_keywords=False,
+    ):
         ads.config.token = config.ADS_API_KEY
-        self.pubdate = "[{from_date} TO {to_date}]".format(
-            from_date=from_date.strftime("%Y-%m"), to_date=to_date.strftime("%Y-%m")
-        )
+        self.first_month = _month(from_date)
+        self.last_month = _month(to_date)
+        self.pubdate = _pubdate(self.first_month, self.last_month)
         self.fields = [
             "abstract",
             "aff",
@@ -37,22 +133,298 @@ class ADSQueries:
             "volume",
         ]
         self.max_pages = max_pages
+        self.rows = rows
         self.max_retries = 5
+        self.retry_policy = RetryPolicy(
+            max_retries=self.max_retries,
+            retryable=lambda error: isinstance(error, ads.exceptions.APIResponseError),
+            headers=_ads_rate_limit_headers,
+        )
+        self.max_workers = max_workers
+        self.rate_limiter = RateLimiter(requests_per_second)
+        self.cache = cache
+        self.quota = quota
+        self.combine_terms = combine_terms
+        self.max_query_length = max_query_length
+        self.shard_months = shard_months
+        self.verify_keywords = verify_keywords
+        self.search_stats = []
+        self.truncated = []
+        self.request_stats = RequestStats()
+
+    def _map(self, search, terms):
+        """Run a search for each of a list of terms, possibly concurrently.
+
+        The results are returned in the order of the terms, irrespective of the order in which the searches finish,
+        so that merging them gives the same output as running the searches one after the other.
+        """
+
+        terms = list(terms)
+        if self.max_workers <= 1 or len(terms) <= 1:
+            return [search(term) for term in terms]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return list(executor.map(search, terms))
+
+    def _search(self, q, fl, fq=None, hl=None):
+        """Search ADS, returning the requested fields of all results as dictionaries.
+
+        If highlights are requested, they are included as a dictionary of fields and lists of snippets under the key
+        "highlights". Results are taken from the cache if possible, and stored in it otherwise.
+        """
+
+        return self._search_with_count(q, fl, fq, hl)[0]
+
+    def _search_with_count(self, q, fl, fq=None, hl=None):
+        """Search ADS, returning the results (as for _search) and the number of results found.
+
+        The results are paged with a cursor, and the number of results found (which may be larger than the number of
+        results returned) is recorded in the search statistics.
+        """
+
+        key = normalized_query(
+            q, fl=fl, fq=fq, hl=hl, rows=self.rows, max_pages=self.max_pages
+        )
+        start = time.perf_counter()
+        result = self.cache.get("ads_search", key) if self.cache is not None else None
+        cached = result is not None
+        if not cached:
+            result = self.retry_policy.call(self._fetch, q, fl, fq, hl)
+            if self.cache is not None:
+                self.cache.set("ads_search", key, result, ADS_SEARCH_TTL)
+
+        self.search_stats.append(
+            dict(
+                query=q,
+                found=result["found"],
+                returned=len(result["records"]),
+                seconds=round(time.perf_counter() - start, 3),
+                cached=cached,
+            )
+        )
+        return result["records"], result["found"]
+
+    def _fetch(self, q, fl, fq, hl):
+        # request all result pages of a search
+        if self.quota is not None:
+            self.quota.acquire()
+        self.rate_limiter.acquire()
+        query = ads.SearchQuery(
+            q=q,
+            fl=fl,
+            fq=fq,
+            hl=hl,
+            rows=self.rows,
+            max_pages=self.max_pages,
+            cursorMark="*",
+        )
+        start = time.perf_counter()
+        pages = 0
+        size = 0
+        response = None
+        try:
+            records = []
+            for result in query:
+                # every new response is a new page
+                if query.response is not response:
+                    response = query.response
+                    pages += 1
+                    size += len(getattr(response, "_raw", None) or "")
+                record = {f: getattr(result, f) for f in fl}
+                if hl is not None:
+                    record["highlights"] = query.highlights(result)
+                records.append(record)
+            found = query.response.numFound if query.response is not None else 0
+            return dict(records=records, found=found)
+        finally:
+            self.request_stats.add(size, time.perf_counter() - start, max(pages, 1))
+            if self.quota is not None:
+                self.quota.update_from_ads()
+
+    def shards(self):
+        """Split the queried date range into the shards to search separately.
+
+        Returns
+        -------
+        list of tuple
+            The first and last month of every shard, as numbers of months since the year 0.
+        """
+
+        if self.shard_months is None:
+            return [(self.first_month, self.last_month)]
+        return [
+            (first, min(first + self.shard_months - 1, self.last_month))
+            for first in range(self.first_month, self.last_month + 1, self.shard_months)
+        ]
+
+    def _query(self, field, terms, shard=None):
+        # A single term is searched for as field:"term", several terms as field:("term 1" OR "term 2" OR ...).
+        if len(terms) == 1:
+            condition = '{field}:"{term}"'.format(field=field, term=terms[0])
+        else:
+            condition = "{field}:({terms})".format(
+                field=field, terms=" OR ".join('"{0}"'.format(t) for t in terms)
+            )
+        pubdate = _pubdate(*shard) if shard is not None else self.pubdate
+        return "{condition} AND pubdate:{pubdate}".format(
+            condition=condition, pubdate=pubdate
+        )
+
+    def plan(self, field, terms):
+        """Group search terms into the queries to run for them.
+
+        Unless terms are combined, every term gets a query of its own. Otherwise consecutive terms are grouped
+        greedily, so that each group's OR-combined query stays within the maximum query length.
+
+        Params
+        ------
+        field : str
+            ADS field to search, such as "full" or "author".
+        terms : list of str
+            The search terms.
+
+        Returns
+        -------
+        list of list of str
+            The groups of terms, one per query.
+        """
+
+        if not self.combine_terms:
+            return [[term] for term in terms]
+        groups = []
+        for term in terms:
+            if (
+                groups
+                and len(self._query(field, groups[-1] + [term])) <= self.max_query_length
+            ):
+                groups[-1].append(term)
+            else:
+                groups.append([term])
+        return groups
+
+    def _truncated(self, q, found, records):
+        print(
+            "Warning: Only {returned} of the {found} results of the search for {q} were returned".format(
+                returned=len(records), found=found, q=q
+            )
+        )
+        self.truncated.append(q)
+
+    def _by_terms(self, field, terms, hl=None, shard=None):
+        if self.shard_months is None:
+            print("Searching for " + ", ".join(terms))
+            q = self._query(field, terms)
+            records, found = self._search_with_count(
+                q, fl=self.fields, fq="database:astronomy", hl=hl
+            )
+            if found > len(records):
+                self._truncated(q, found, records)
+            return records
+
+        # search a shard of the date range, splitting it in half as long as the search is truncated and the shard
+        # covers more than one month
+        shard = shard or (self.first_month, self.last_month)
+        q = self._query(field, terms, shard)
+        print("Searching for {0} in {1}".format(", ".join(terms), _pubdate(*shard)))
+        records, found = self._search_with_count(
+            q, fl=self.fields, fq="database:astronomy", hl=hl
+        )
+        if found <= len(records):
+            return records
+        first, last = shard
+        if first == last:
+            self._truncated(q, found, records)
+            return records
+        middle = (first + last) // 2
+        return self._by_terms(field, terms, hl, (first, middle)) + self._by_terms(
+            field, terms, hl, (middle + 1, last)
+        )
+
+    def _by_groups(self, field, terms, hl=None):
+        """Search for groups of terms (as planned by plan) in every shard of the date range.
+
+        Returns a list of tuples of a group of terms and the records found for it in all shards.
+        """
+
+        groups = self.plan(field, list(terms))
+        shards = self.shards()
+        searches = [(group, shard) for group in groups for shard in shards]
+        results = iter(
+            self._map(
+                lambda search: self._by_terms(field, search[0], hl, search[1]),
+                searches,
+            )
+        )
+        return [
+            (group, [record for _ in shards for record in next(results)])
+            for group in groups
+        ]
+
+    def _attribute(self, keywords, records):
+        """Find the keywords of an OR-combined full text search which each of its results contains.
+
+        The keywords are looked up in the highlights of the results. The highlights needn't include every keyword
+        which a result contains (and ADS may have matched a synonym instead), so if keywords are verified, every
+        keyword is then searched for among the results whose highlights don't contain it. These verification searches
+        are made for batches of at most VERIFICATION_BATCH_SIZE bibcodes, so that the query length stays bounded.
+
+        Returns a dictionary of bibcodes and lists of keywords, in the order of the given keywords.
+        """
+
+        confirmed = dict()
+        for record in records:
+            highlights = record.pop("highlights", None) or dict()
+            text = re.sub(
+                "</?em>",
+                "",
+                " ".join(
+                    snippet for snippets in highlights.values() for snippet in snippets
+                ),
+            )
+            confirmed[record["bibcode"]] = {
+                keyword for keyword in keywords if _mentions(text, keyword)
+            }
+
+        batch_size = ADSQueries.VERIFICATION_BATCH_SIZE
+        verifications = []
+        for keyword in keywords if self.verify_keywords else []:
+            unconfirmed = [b for b, found in confirmed.items() if keyword not in found]
+            verifications.extend(
+                (keyword, unconfirmed[i : i + batch_size])
+                for i in range(0, len(unconfirmed), batch_size)
+            )
+
+        def verify(verification):
+            keyword, bibcodes = verification
+            q = 'full:"{keyword}" AND bibcode:({bibcodes})'.format(
+                keyword=keyword,
+                bibcodes=" OR ".join('"{0}"'.format(b) for b in bibcodes),
+            )
+            return {record["bibcode"] for record in self._search(q, fl=["bibcode"])}
+
+        for (keyword, bibcodes), found in zip(
+            verifications, self._map(verify, verifications)
+        ):
+            for bibcode in bibcodes:
+                if bibcode in found:
+                    confirmed[bibcode].add(keyword)
+
+        return {
+            bibcode: [keyword for keyword in keywords if keyword in found]
+            for bibcode, found in confirmed.items()
+        }
+
+    @staticmethod
+    def _merge(results, publications):
+        for _, records in results:
+            for record in records:
+                if record["bibcode"] not in publications:
+                    publications[record["bibcode"]] = Publication.from_dict(record)
 
     def _by_journal(self, journal):
-        retries = 0
-        while retries <= self.max_retries:
-            try:
-                q = "bibstem:{journal} AND pubdate:{pubdate}".format(
-                    journal=journal, pubdate=self.pubdate
-                )
-                query = ads.SearchQuery(q=q, fl=["bibcode"], max_pages=self.max_pages)
-                return [a.bibcode for a in list(query)]
-            except ads.exceptions.APIResponseError:
-                retries += 1
-                print("Retrying...")
-                if retries > self.max_retries:
-                    raise
+        q = "bibstem:{journal} AND pubdate:{pubdate}".format(
+            journal=journal, pubdate=self.pubdate
+        )
+        return [record["bibcode"] for record in self._search(q, fl=["bibcode"])]
 
     def by_journals(self, journals):
         """Query ADS for the publications published in any of a list of journals.
@@ -73,37 +445,10 @@ class ADSQueries:
         """
 
         bibcodes = []
-        for journal in journals:
-            bibcodes.extend(self._by_journal(journal))
+        for journal_bibcodes in self._map(self._by_journal, journals):
+            bibcodes.extend(journal_bibcodes)
         return bibcodes
 
-    def _by_fulltext_keyword(self, keyword, publications):
-        retries = 0
-        while retries <= self.max_retries:
-            try:
-                q = 'full:"{keyword}" AND pubdate:{pubdate}'.format(
-                    keyword=keyword, pubdate=self.pubdate
-                )
-                query = ads.SearchQuery(
-                    q=q,
-                    fl=self.fields,
-                    fq="database:astronomy",
-                    max_pages=self.max_pages,
-                )
-                for result in list(query):
-                    if result.bibcode not in publications:
-                        publications[result.bibcode] = {
-                            f: getattr(result, f) for f in self.fields
-                        }
-                        publications[result.bibcode]["fulltext_keywords"] = []
-                    publications[result.bibcode]["fulltext_keywords"].append(keyword)
-                return
-            except ads.exceptions.APIResponseError:
-                retries += 1
-                print("Retrying...")
-                if retries > self.max_retries:
-                    raise
-
     def by_fulltext_keywords(self, keywords):
         """Query ADS for the publications containing any of a list of keywords.
 
@@ -120,38 +465,22 @@ class ADSQueries:
             The publications containing any of the keywords (or their synonyms).
         """
 
+        hl = ADSQueries.HIGHLIGHT_FIELDS if self.combine_terms else None
         publications = dict()
-        for keyword in keywords:
-            print("Searching for " + keyword)
-            self._by_fulltext_keyword(keyword, publications)
+        for group, records in self._by_groups("full", keywords, hl):
+            if len(group) == 1:
+                attributions = {record["bibcode"]: group for record in records}
+            else:
+                attributions = self._attribute(group, records)
+            for record in records:
+                if record["bibcode"] not in publications:
+                    publications[record["bibcode"]] = Publication.from_dict(record)
+                publications[record["bibcode"]].fulltext_keywords.extend(
+                    attributions[record["bibcode"]]
+                )
 
         return publications
 
-    def _by_author(self, author, publications):
-        retries = 0
-        while retries <= self.max_retries:
-            try:
-                q = 'author:"{author}" AND pubdate:{pubdate}'.format(
-                    author=author, pubdate=self.pubdate
-                )
-                query = ads.SearchQuery(
-                    q=q,
-                    fl=self.fields,
-                    fq="database:astronomy",
-                    max_pages=self.max_pages,
-                )
-                for result in list(query):
-                    if result.bibcode not in publications:
-                        publications[result.bibcode] = {
-                            f: getattr(result, f) for f in self.fields
-                        }
-                return
-            except ads.exceptions.APIResponseError:
-                retries += 1
-                print("Retrying...")
-                if retries > self.max_retries:
-                    raise
-
     def by_authors(self, authors):
         """Query ADS for the publications containing any of a list of authors.
 
@@ -170,37 +499,10 @@ class ADSQueries:
         """
 
         publications = dict()
-        for author in authors:
-            print("Searching for " + author)
-            self._by_author(author, publications)
+        self._merge(self._by_groups("author", authors), publications)
 
         return publications
 
-    def _by_affiliation(self, affiliation, publications):
-        retries = 0
-        while retries <= self.max_retries:
-            try:
-                q = 'aff:"{affiliation}" AND pubdate:{pubdate}'.format(
-                    affiliation=affiliation, pubdate=self.pubdate
-                )
-                query = ads.SearchQuery(
-                    q=q,
-                    fl=self.fields,
-                    fq="database:astronomy",
-                    max_pages=self.max_pages,
-                )
-                for result in list(query):
-                    if result.bibcode not in publications:
-                        publications[result.bibcode] = {
-                            f: getattr(result, f) for f in self.fields
-                        }
-                return
-            except ads.exceptions.APIResponseError:
-                retries += 1
-                print("Retrying...")
-                if retries > self.max_retries:
-                    raise
-
     def by_affiliations(self, affiliations):
         """Query ADS for the publications with any of a list of affiliations.
 
@@ -220,37 +522,10 @@ class ADSQueries:
         """
 
         publications = dict()
-        for affiliation in affiliations:
-            print("Searching for " + affiliation)
-            self._by_affiliation(affiliation, publications)
+        self._merge(self._by_groups("aff", affiliations), publications)
 
         return publications
 
-    def _by_institution(self, institution, publications):
-        retries = 0
-        while retries <= self.max_retries:
-            try:
-                q = 'institution:"{institution}" AND pubdate:{pubdate}'.format(
-                    institution=institution, pubdate=self.pubdate
-                )
-                query = ads.SearchQuery(
-                    q=q,
-                    fl=self.fields,
-                    fq="database:astronomy",
-                    max_pages=self.max_pages,
-                )
-                for result in list(query):
-                    if result.bibcode not in publications:
-                        publications[result.bibcode] = {
-                            f: getattr(result, f) for f in self.fields
-                        }
-                return
-            except ads.exceptions.APIResponseError:
-                retries += 1
-                print("Retrying...")
-                if retries > self.max_retries:
-                    raise
-
     def by_institutions(self, institutions):
         """Query ADS for the publications with any of a list of institutions.
 
@@ -270,11 +545,111 @@ class ADSQueries:
         """
 
         publications = dict()
-        for institution in institutions:
-            print("Searching for " + institution)
-            self._by_institution(institution, publications)
+        self._merge(self._by_groups("institution", institutions), publications)
         return publications
 
+    def _planned(self, searches):
+        # The searches to run, as tuples of the field, the group of terms, the highlight fields and the shard. The full
+        # text searches come first, so that the keywords of all of them are known as early as possible.
+        hl = ADSQueries.HIGHLIGHT_FIELDS if self.combine_terms else None
+        return sorted(
+            (
+                (field, group, hl if field == "full" else None, shard)
+                for field, terms in searches
+                for group in self.plan(field, list(terms))
+                for shard in self.shards()
+            ),
+            key=lambda search: search[0] != "full",
+        )
+
+    def search_keys(self, searches):
+        """Return the keys identifying the searches run by stream.
+
+        Params
+        ------
+        searches : list of tuple
+            The searches, as for stream.
+
+        Returns
+        -------
+        list of str
+            The keys, which are the query strings of the searches.
+        """
+
+        return [
+            self._query(field, group, shard)
+            for field, group, _, shard in self._planned(searches)
+        ]
+
+    def stream(self, searches, finished=None, on_finished=None):
+        """Query ADS for publications, yielding the results of every search as soon as it has finished.
+
+        This is an alternative to by_fulltext_keywords, by_authors, by_affiliations and by_institutions. Rather than
+        collecting all the publications first, it yields each result (together with the keywords found in its full
+        text) as soon as the search for it has finished. The searches are run concurrently, but their results are
+        yielded in the order of the searches, except that the full text searches come first.
+
+        A publication is yielded once for every search which finds it, so a publication found by several full text
+        searches is yielded with some of its keywords each time. All the keywords are known once the first result of
+        a search in another field is yielded (or the last result has been yielded). If the date range is sharded,
+        every search is run for each shard, and the shards are searched concurrently as well.
+
+        The results of searches which have finished in a previous run may be passed on, so that these searches are not
+        run again, and the results of every search may be passed to a function as soon as the search has finished,
+        for example to save them. In both cases a search is identified by its key (see search_keys), and its results
+        are a list of the found records (as dictionaries of the ADS fields) and their lists of full text keywords.
+
+        Params
+        ------
+        searches : list of tuple
+            Tuples of an ADS field (such as "full", "author", "aff" or "institution") and the list of terms to search
+            for in that field. The terms of each tuple are combined as in the other query methods.
+        finished : dict
+            Dictionary of search keys and the results of searches which don't need to be run again.
+        on_finished : function
+            Function called with the key and the results of every search which has been run.
+
+        Returns
+        -------
+        iterable of tuple
+            Tuples of a publication and the list of keywords found in its full text by the search. The list of
+            keywords is None for the results of searches in other fields than "full".
+        """
+
+        finished = finished or dict()
+        planned = self._planned(searches)
+        if not planned:
+            return
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            keys = [self._query(field, group, shard) for field, group, _, shard in planned]
+            futures = [
+                None if key in finished else executor.submit(self._by_terms, *search)
+                for key, search in zip(keys, planned)
+            ]
+            for (field, group, _, _), key, future in zip(planned, keys, futures):
+                if future is None:
+                    results = finished[key]
+                else:
+                    records = future.result()
+                    if field != "full":
+                        attributions = {record["bibcode"]: [] for record in records}
+                    elif len(group) == 1:
+                        attributions = {record["bibcode"]: group for record in records}
+                    else:
+                        attributions = self._attribute(group, records)
+                    for record in records:
+                        record.pop("highlights", None)
+                    results = [
+                        (record, attributions[record["bibcode"]]) for record in records
+                    ]
+                    if on_finished is not None:
+                        on_finished(key, results)
+                for record, keywords in results:
+                    yield Publication.from_dict(record), (
+                        list(keywords) if field == "full" else None
+                    )
+
     def full_details(self, bibcode):
         """Query ADS for the full details of a publication.
 
@@ -293,19 +668,7 @@ class ADSQueries:
         """
 
         try:
-            retries = 0
-            while retries <= self.max_retries:
-                try:
-                    query = ads.SearchQuery(
-                        bibcode=bibcode, fl=self.fields, max_pages=self.max_pages
-                    )
-                    details = list(query)[0]
-                    return {f: getattr(details, f) for f in self.fields}
-                except ads.exceptions.APIResponseError:
-                    retries += 1
-                    print("Retrying...")
-                    if retries > self.max_retries:
-                        raise
+            return self._search('bibcode:"{0}"'.format(bibcode), fl=self.fields)[0]
         except:
             details = {f: "" for f in self.fields}
             details["bibcode"] = bibcode
@@ -0,0 +1,144 @@
+import functools
+import re
+
+from pubquery import config
+
+# categories of affiliation fragments
+SOUTH_AFRICA = "south_africa"
+SALT_PARTNER = "salt_partner"
+SAAO = "saao"
+
+SOUTH_AFRICA_NAMES = ["South Africa"]
+SAAO_NAMES = ["SAAO", "South African Astronomical Observatory"]
+
+_NO_CATEGORIES = frozenset()
+
+
+def _overlapping(categories):
+    # check whether a name may overlap with another name (without containing it) which has other categories, so that
+    # a match for the first name would hide categories of the second one
+    return any(
+        a[-k:] == b[:k]
+        for a in categories
+        for b in categories
+        if a != b and b not in a and a not in b and not categories[b] <= categories[a]
+        for k in range(1, min(len(a), len(b)))
+    )
+
+
+class AffiliationMatcher:
+    """Matcher classifying affiliations as South African, SALT partner and SAAO affiliations.
+
+    An affiliation string may contain several institutions separated by "; ", and every such fragment is classified
+    separately. A fragment falls into a category if it contains any of the category's names (case-sensitively).
+
+    All the names are combined into a single regular expression, which is compiled once, so that a fragment is
+    classified in a single pass, however many names there are. As the same affiliations occur again and again, the
+    categories of the most recently classified fragments are cached.
+
+    Params
+    ------
+    south_africa : list of str
+        Names marking an affiliation as South African.
+    salt_partners : list of str
+        Names of the SALT partner institutions.
+    saao : list of str
+        Names of the SAAO.
+    cache_size : int
+        Maximum number of fragments whose categories are cached.
+    """
+
+    def __init__(
+        self,
+        south_africa=SOUTH_AFRICA_NAMES,
+        salt_partners=config.SALT_PARTNERS,
+        saao=SAAO_NAMES,
+        cache_size=100000,
+    ):
+        categories = dict()
+        for category, names in (
+            (SOUTH_AFRICA, south_africa),
+            (SALT_PARTNER, salt_partners),
+            (SAAO, saao),
+        ):
+            for name in names:
+                categories.setdefault(name, set()).add(category)
+
+        # A name may contain other names (as "South African Astronomical Observatory" contains "South Africa"), and
+        # then a match for it is a match for the names it contains as well.
+        self._categories = {
+            name: frozenset(
+                category
+                for other in categories
+                if other in name
+                for category in categories[other]
+            )
+            for name in categories
+        }
+
+        # The names are matched longest first. If a name may overlap with another one without containing it, a match
+        # for one could hide the other, and then the names are matched with a (slower) lookahead at every position.
+        names = sorted(self._categories, key=len, reverse=True)
+        alternatives = "|".join(re.escape(name) for name in names)
+        if _overlapping(self._categories):
+            self._pattern = re.compile("(?=({0}))".format(alternatives))
+        else:
+            self._pattern = re.compile("({0})".format(alternatives))
+        self._cached_match = functools.lru_cache(maxsize=cache_size)(self._match)
+
+    def _match(self, fragment):
+        # Most fragments match no name or a single one, and then the (shared) categories are returned without creating
+        # a new set, which matters for indices keeping the categories of many fragments.
+        names = self._pattern.findall(fragment)
+        if not names:
+            return _NO_CATEGORIES
+        if len(names) == 1:
+            return self._categories[names[0]]
+        return _NO_CATEGORIES.union(*(self._categories[name] for name in names))
+
+    def match(self, fragment):
+        """Return the categories of an affiliation fragment.
+
+        Params
+        ------
+        fragment : str
+            A single institution of an affiliation.
+
+        Returns
+        -------
+        frozenset of str
+            The categories (SOUTH_AFRICA, SALT_PARTNER and SAAO) of the fragment.
+        """
+
+        return self._cached_match(fragment)
+
+    def classify(self, affiliation):
+        """Split an affiliation into its fragments and return the categories of each of them.
+
+        Params
+        ------
+        affiliation : str
+            Affiliation, with its institutions separated by "; ".
+
+        Returns
+        -------
+        list of tuple
+            Tuples of a fragment and its categories, in the order of the fragments.
+        """
+
+        return [(fragment, self.match(fragment)) for fragment in affiliation.split("; ")]
+
+
+@functools.cache
+def default_matcher():
+    """Return the matcher for the names defined in the configuration.
+
+    The matcher is created when this function is called for the first time.
+
+    Returns
+    -------
+    AffiliationMatcher
+        The matcher.
+    """
+
+    return AffiliationMatcher()
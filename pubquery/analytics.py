@@ -0,0 +1,160 @@
+import numpy as np
+import pandas as pd
+
+from pubquery.affiliations import SAAO, SALT_PARTNER, SOUTH_AFRICA, default_matcher
+
+
+def _flatten(lists):
+    # flatten lists, returning the items and the offset of each list's first item (plus the total number of items)
+    lengths = np.array([len(items) for items in lists], dtype=np.int64)
+    offsets = np.concatenate(([0], np.cumsum(lengths)))
+    return [item for items in lists for item in items], lengths, offsets
+
+
+def _per_publication(publications, values, count):
+    # distinct values per publication (in the order of their first occurrence), given as the publication index and
+    # value of rows ordered by publication index
+    distinct = pd.DataFrame(
+        {"publication": publications, "value": values}
+    ).drop_duplicates()
+    bounds = np.searchsorted(
+        distinct["publication"].to_numpy(), np.arange(count + 1)
+    )
+    return distinct["value"].tolist(), bounds
+
+
+def affiliation_table(publications):
+    """Return a long-format table of the affiliation fragments of publications.
+
+    Every affiliation (of an author) may contain several institutions separated by "; ". The table has a row for
+    every such fragment, ordered by publication, and the following columns:
+
+    publication
+        Index of the publication in the list of publications.
+    index
+        Index of the affiliation (and thus of the author) in the publication.
+    fragment_index
+        Index of the fragment within its affiliation.
+    fragment
+        The fragment.
+    south_africa, salt_partner, saao
+        Whether the fragment is a South African, SALT partner and SAAO affiliation.
+
+    Each distinct affiliation and fragment is classified only once.
+
+    Params
+    ------
+    publications : list of publication dictionaries
+        The publications. Their affiliations must be lists.
+
+    Returns
+    -------
+    pandas.DataFrame
+        The table.
+    """
+
+    affiliations, aff_lengths, aff_offsets = _flatten(
+        [p["aff"] or [] for p in publications]
+    )
+
+    # The same affiliations occur again and again, so only the distinct ones are split and classified.
+    aff_codes, distinct_affs = pd.factorize(np.array(affiliations, dtype=object))
+    distinct_fragments, distinct_lengths, distinct_offsets = _flatten(
+        [aff.split("; ") for aff in distinct_affs]
+    )
+    distinct_fragments = np.array(distinct_fragments, dtype=object)
+    fragment_lengths = distinct_lengths[aff_codes]
+    fragment_offsets = np.concatenate(([0], np.cumsum(fragment_lengths)))
+    fragment_count = int(fragment_offsets[-1])
+
+    # index of the affiliation of every fragment, within all affiliations and within its publication
+    aff_rows = np.repeat(np.arange(len(affiliations)), fragment_lengths)
+    aff_publications = np.repeat(np.arange(len(publications)), aff_lengths)
+    fragment_indices = np.arange(fragment_count) - fragment_offsets[aff_rows]
+    fragment_ids = distinct_offsets[aff_codes][aff_rows] + fragment_indices
+
+    table = pd.DataFrame(
+        {
+            "publication": aff_publications[aff_rows],
+            "index": (np.arange(len(affiliations)) - aff_offsets[aff_publications])[
+                aff_rows
+            ],
+            "fragment_index": fragment_indices,
+            "fragment": distinct_fragments[fragment_ids],
+        }
+    )
+
+    matcher = default_matcher()
+    categories = [matcher.match(fragment) for fragment in distinct_fragments]
+    for category in (SOUTH_AFRICA, SALT_PARTNER, SAAO):
+        matches = np.array([category in c for c in categories], dtype=bool)
+        table[category] = matches[fragment_ids]
+    return table
+
+
+def add_derived_columns(publications):
+    """Add the derived details (such as the refereed status and the SA institutions) to publications.
+
+    Rather than looping over the publications, the details are computed for all of them together, using a long-format
+    table of their affiliation fragments (see affiliation_table) and an array of all their authors. The table's index
+    column is the index of the author whose affiliation a fragment belongs to, so that the table serves as an index
+    of the authors' affiliations.
+
+    The following keys are added to every publication dictionary: refereed, ads_url, no_of_authors_aff_to_SA_ins,
+    institute_of_first_author, authors_affiliated_with_SAAO, SA_institutions and SALT_partners.
+
+    Params
+    ------
+    publications : list of publication dictionaries
+        The publications. Their authors and affiliations must be lists.
+    """
+
+    count = len(publications)
+    if not count:
+        return
+
+    authors, author_lengths, author_offsets = _flatten(
+        [p["author"] or [] for p in publications]
+    )
+    authors = np.array(authors, dtype=object)
+    table = affiliation_table(publications)
+    fragment_publications = table["publication"].to_numpy()
+
+    # The i-th affiliation belongs to the i-th author. Affiliations without a corresponding author are ignored.
+    author_indices = table["index"].to_numpy()
+    has_author = author_indices < author_lengths[fragment_publications]
+    author_rows = np.where(
+        has_author, author_offsets[fragment_publications] + author_indices, 0
+    )
+
+    def joined(mask, values):
+        values, bounds = _per_publication(fragment_publications[mask], values, count)
+        return ["; ".join(values[bounds[i] : bounds[i + 1]]) for i in range(count)]
+
+    sa_authors = table[SOUTH_AFRICA].to_numpy() & has_author
+    _, bounds = _per_publication(
+        fragment_publications[sa_authors], authors[author_rows[sa_authors]], count
+    )
+    sa_author_counts = np.diff(bounds)
+
+    saao = table[SAAO].to_numpy() & has_author
+    saao_authors = joined(saao, authors[author_rows[saao]])
+    sa_institutions = joined(
+        table[SOUTH_AFRICA].to_numpy(),
+        table["fragment"].to_numpy()[table[SOUTH_AFRICA].to_numpy()],
+    )
+    salt_partners = joined(
+        table[SALT_PARTNER].to_numpy(),
+        table["fragment"].to_numpy()[table[SALT_PARTNER].to_numpy()],
+    )
+
+    for i, p in enumerate(publications):
+        p["refereed"] = bool(p["property"]) and "REFEREED" in p["property"]
+        p["ads_url"] = "https://ui.adsabs.harvard.edu/#abs/{0}/abstract".format(
+            p["bibcode"]
+        )
+        p["no_of_authors_aff_to_SA_ins"] = int(sa_author_counts[i])
+        p["institute_of_first_author"] = p["aff"][0] if p["aff"] else None
+        p["authors_affiliated_with_SAAO"] = saao_authors[i]
+        p["SA_institutions"] = sa_institutions[i]
+        p["SALT_partners"] = salt_partners[i]
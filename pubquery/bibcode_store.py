@@ -0,0 +1,96 @@
+import os
+import sqlite3
+
+
+class BibcodeStore:
+    """Store of the bibcodes of publications which have been reported to the librarians.
+
+    The bibcodes are stored in an indexed SQLite table, so that membership tests remain fast for large numbers of
+    bibcodes. Earlier versions of this script stored the bibcodes as a text file with one bibcode per line. If the
+    store's file is such a text file, it is converted to an SQLite database when the store is opened.
+
+    The store can be used as a context manager, which closes it on exit.
+
+    Params
+    ------
+    path : str
+        Path of the SQLite database file. The file and its directory are created if need be.
+    """
+
+    def __init__(self, path):
+        legacy_bibcodes = BibcodeStore._legacy_bibcodes(path)
+        if legacy_bibcodes is not None:
+            os.replace(path, path + ".txt")
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        self._connection = sqlite3.connect(path)
+        with self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS bibcodes (bibcode TEXT PRIMARY KEY, recorded TEXT NOT NULL)"
+            )
+        if legacy_bibcodes:
+            self.add(legacy_bibcodes)
+
+    @staticmethod
+    def _legacy_bibcodes(path):
+        # return the bibcodes if the file is a text file, and None otherwise
+        if not os.path.isfile(path):
+            return None
+        with open(path, "rb") as f:
+            if f.read(16) == b"SQLite format 3\x00":
+                return None
+        with open(path) as f:
+            return [line.strip() for line in f if line.strip()]
+
+    def __contains__(self, bibcode):
+        return (
+            self._connection.execute(
+                "SELECT 1 FROM bibcodes WHERE bibcode = ?", (bibcode,)
+            ).fetchone()
+            is not None
+        )
+
+    def __len__(self):
+        return self._connection.execute("SELECT COUNT(*) FROM bibcodes").fetchone()[0]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def bibcodes(self):
+        """Return all the bibcodes in the store.
+
+        Returns
+        -------
+        set of str
+            The bibcodes.
+        """
+
+        return {row[0] for row in self._connection.execute("SELECT bibcode FROM bibcodes")}
+
+    def add(self, bibcodes):
+        """Add bibcodes to the store.
+
+        The bibcodes are added in a single transaction, so that either all or none of them are recorded. Bibcodes
+        already in the store are ignored.
+
+        Params
+        ------
+        bibcodes : iterable of str
+            The bibcodes to add.
+        """
+
+        with self._connection:
+            self._connection.executemany(
+                "INSERT OR IGNORE INTO bibcodes (bibcode, recorded) VALUES (?, datetime('now'))",
+                ((bibcode,) for bibcode in bibcodes),
+            )
+
+    def close(self):
+        """Close the database connection."""
+
+        self._connection.close()
@@ -0,0 +1,191 @@
+import datetime
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+class ResponseCache:
+    """Persistent cache for query results, stored in an SQLite database.
+
+    Every entry belongs to a source (such as "ads_search" or "wos_doi") and is identified by a key within that source.
+    Entries expire after a time to live, which is chosen when they are stored. If the total size of the cached values
+    exceeds a maximum, the least recently used entries are evicted.
+
+    The cache may be used from multiple threads.
+
+    Params
+    ------
+    path : str
+        Path of the SQLite database file. The file and its directory are created if need be.
+    max_size : int
+        Maximum total size (in bytes) of the cached values.
+    refresh : bool
+        Whether to ignore existing entries. New results are still stored, so that a refreshed cache can be used by
+        later runs.
+    """
+
+    def __init__(self, path, max_size=200 * 1024 * 1024, refresh=False):
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        self.max_size = max_size
+        self.refresh = refresh
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._connection:
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS responses (
+                    source TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    expires REAL NOT NULL,
+                    accessed REAL NOT NULL,
+                    PRIMARY KEY (source, key)
+                )
+                """
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)"
+            )
+            self._connection.execute(
+                "DELETE FROM responses WHERE expires < ?", (time.time(),)
+            )
+        self._size = self._connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()[0]
+
+    def get(self, source, key):
+        """Return the cached value for a key, or None if there is no (unexpired) entry.
+
+        Params
+        ------
+        source : str
+            Source of the entry.
+        key : str
+            Key of the entry.
+
+        Returns
+        -------
+        object
+            The cached value, or None.
+        """
+
+        if self.refresh:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT value, expires FROM responses WHERE source = ? AND key = ?",
+                (source, key),
+            ).fetchone()
+            if row is None or row[1] < now:
+                self.misses += 1
+                return None
+            with self._connection:
+                self._connection.execute(
+                    "UPDATE responses SET accessed = ? WHERE source = ? AND key = ?",
+                    (now, source, key),
+                )
+            self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, source, key, value, ttl):
+        """Store a value in the cache.
+
+        Params
+        ------
+        source : str
+            Source of the entry.
+        key : str
+            Key of the entry.
+        value : object
+            Value to store. It must be serializable as JSON.
+        ttl : datetime.timedelta
+            Time after which the entry expires.
+        """
+
+        serialized = json.dumps(value)
+        now = time.time()
+        with self._lock:
+            with self._connection:
+                previous = self._connection.execute(
+                    "SELECT size FROM responses WHERE source = ? AND key = ?",
+                    (source, key),
+                ).fetchone()
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO responses (source, key, value, size, expires, accessed) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (
+                        source,
+                        key,
+                        serialized,
+                        len(serialized),
+                        now + ttl.total_seconds(),
+                        now,
+                    ),
+                )
+                self._size += len(serialized) - (previous[0] if previous else 0)
+                if self._size > self.max_size:
+                    self._evict()
+
+    def _evict(self):
+        # remove the least recently used entries until the cache is reduced to 90 % of its maximum size
+        target = 0.9 * self.max_size
+        rows = self._connection.execute(
+            "SELECT source, key, size FROM responses ORDER BY accessed"
+        ).fetchall()
+        evicted = []
+        for source, key, size in rows:
+            if self._size <= target:
+                break
+            evicted.append((source, key))
+            self._size -= size
+        self._connection.executemany(
+            "DELETE FROM responses WHERE source = ? AND key = ?", evicted
+        )
+
+    def close(self):
+        """Close the database connection."""
+
+        self._connection.close()
+
+
+def normalized_query(q, **params):
+    """Return a normalized string for a query, suitable as a cache key.
+
+    Whitespace in the query string is collapsed, and list-valued parameters (such as the list of fields) are sorted, so
+    that equivalent queries share the same key.
+
+    Params
+    ------
+    q : str
+        Query string.
+    params : dict
+        Further query parameters.
+
+    Returns
+    -------
+    str
+        The normalized query.
+    """
+
+    normalized = {"q": " ".join(q.split())}
+    for name, value in params.items():
+        if isinstance(value, (list, tuple, set)):
+            value = sorted(value)
+        normalized[name] = value
+    return json.dumps(normalized, sort_keys=True)
+
+
+# time to live for the various kinds of cache entries
+ADS_SEARCH_TTL = datetime.timedelta(days=3)
+ADS_ENRICHMENT_TTL = datetime.timedelta(days=30)
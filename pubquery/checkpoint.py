@@ -0,0 +1,164 @@
+import json
+import os
+import tempfile
+import threading
+
+
+class Checkpoint:
+    """Checkpoint of a run of the publications query, so that a failed run can be resumed.
+
+    The results of the various stages of a run (such as the search results or the Web of Science statuses) are saved
+    to a JSON file, whose name is derived from the queried date range. Every save replaces the file atomically, so
+    that a crash cannot leave a corrupted checkpoint behind.
+
+    Alternatively, a stage whose results are a dictionary may add new results as it goes along (see update). These
+    are appended to a journal file next to the checkpoint file, so that the cost of saving progress is proportional
+    to the new results rather than to all the results so far. A stage should either save or update its results, but
+    not both.
+
+    Results are serialized when they are saved, so that a stage may keep modifying them afterwards, and different
+    stages may save their results from different threads.
+
+    Params
+    ------
+    directory : str
+        Directory for the checkpoint file. It is created if need be.
+    from_date : datetime.date
+        Earliest date for which publications are queried. Only the year and month are relevant.
+    to_date : datetime.date
+        Latest date for which publications are queried. Only the year and month are relevant.
+    """
+
+    def __init__(self, directory, from_date, to_date):
+        self.path = os.path.join(
+            directory,
+            "checkpoint_{from_date}_{to_date}.json".format(
+                from_date=from_date.strftime("%Y-%m"), to_date=to_date.strftime("%Y-%m")
+            ),
+        )
+        self.journal_path = os.path.splitext(self.path)[0] + ".jsonl"
+        self._stages = dict()
+        self._serialized = dict()
+        self._updated = set()
+        self._lock = threading.Lock()
+        if os.path.isfile(self.path):
+            with open(self.path) as f:
+                self._stages = json.load(f)
+            self._serialized = {
+                stage: json.dumps(results) for stage, results in self._stages.items()
+            }
+        if os.path.isfile(self.journal_path):
+            with open(self.journal_path) as f:
+                lines = f.readlines()
+            # a line without a line break was being written when the run crashed, and is discarded
+            if lines and not lines[-1].endswith("\n"):
+                os.truncate(
+                    self.journal_path, os.path.getsize(self.journal_path) - len(lines.pop())
+                )
+            for line in lines:
+                entry = json.loads(line)
+                self._stages.setdefault(entry["stage"], dict()).update(entry["results"])
+
+    def has(self, stage):
+        """Return whether results have been saved for a stage.
+
+        Params
+        ------
+        stage : str
+            Name of the stage.
+
+        Returns
+        -------
+        bool
+            Whether there are results for the stage.
+        """
+
+        return stage in self._stages or stage in self._updated
+
+    def get(self, stage, default=None):
+        """Return the saved results of a stage.
+
+        Results added with update since the checkpoint was opened are not included. They are only read when the
+        checkpoint is opened again, so that they need not be kept in memory.
+
+        Params
+        ------
+        stage : str
+            Name of the stage.
+        default : object
+            Value to return if no results have been saved for the stage.
+
+        Returns
+        -------
+        object
+            The results.
+        """
+
+        return self._stages.get(stage, default)
+
+    def save(self, stage, results):
+        """Save the results of a stage.
+
+        Previously saved results of the stage are replaced.
+
+        Params
+        ------
+        stage : str
+            Name of the stage.
+        results : object
+            Results to save. They must be serializable as JSON.
+        """
+
+        serialized = json.dumps(results)
+        with self._lock:
+            self._stages[stage] = results
+            self._serialized[stage] = serialized
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w") as f:
+                    f.write("{")
+                    f.write(
+                        ", ".join(
+                            "{0}: {1}".format(json.dumps(name), value)
+                            for name, value in self._serialized.items()
+                        )
+                    )
+                    f.write("}")
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                os.remove(tmp_path)
+                raise
+
+    def update(self, stage, results):
+        """Add new results to the saved results of a stage.
+
+        The results of the stage must be a dictionary, which is updated with the new results. Only the new results are
+        written, by appending them as a line to the journal file.
+
+        Params
+        ------
+        stage : str
+            Name of the stage.
+        results : dict
+            New results to add. They must be serializable as JSON.
+        """
+
+        line = json.dumps(dict(stage=stage, results=results)) + "\n"
+        with self._lock:
+            self._updated.add(stage)
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.journal_path, "a") as f:
+                f.write(line)
+
+    def clear(self):
+        """Remove all saved results."""
+
+        with self._lock:
+            self._stages = dict()
+            self._serialized = dict()
+            self._updated = set()
+            for path in (self.path, self.journal_path):
+                if os.path.isfile(path):
+                    os.remove(path)
@@ -14,6 +14,9 @@ SMTP_SERVER = os.getenv("SMTP_SERVER")
 
 SMTP_PORT = os.getenv("SMTP_PORT")
 
+# maximum size (in bytes) of an email; larger results are split over several emails
+MAX_EMAIL_SIZE = int(os.getenv("MAX_EMAIL_SIZE", 10 * 1000 * 1000))
+
 try:
     LIBRARIAN_EMAIL_ADDRESSES = json.loads(os.getenv("LIBRARIAN_EMAIL_ADDRESSES"))
 except JSONDecodeError:
@@ -26,6 +29,27 @@ except JSONDecodeError:
 
 FROM_EMAIL_ADDRESS = os.getenv("FROM_EMAIL_ADDRESS")
 
+# SQLite database for recording the bibcodes of publications which have been reported to the librarians
+PREVIOUS_BIBCODES_FILE = os.getenv(
+    "PREVIOUS_BIBCODES_FILE",
+    os.path.expanduser("~/.local/share/pubquery/previous_bibcodes.sqlite"),
+)
+
+# directory for the checkpoints of runs, which allow failed runs to be resumed
+CHECKPOINT_DIR = os.getenv(
+    "CHECKPOINT_DIR", os.path.expanduser("~/.local/share/pubquery/checkpoints")
+)
+
+# directory for the JSON reports of runs
+REPORT_DIR = os.getenv(
+    "REPORT_DIR", os.path.expanduser("~/.local/share/pubquery/reports")
+)
+
+# SQLite database for caching ADS and Web of Science results
+CACHE_FILE = os.getenv(
+    "CACHE_FILE", os.path.expanduser("~/.cache/pubquery/responses.sqlite")
+)
+
 # keywords to search for
 KEYWORDS = [
     "SAAO",
@@ -0,0 +1,334 @@
+import base64
+import email.policy
+import os
+import shutil
+import smtplib
+import tempfile
+import uuid
+import zipfile
+from email.mime.base import MIMEBase
+from email.mime.multipart import MIMEMultipart
+
+from pubquery.exporters import EXPORTERS, SPILL_SIZE, ExportFormat
+
+# size (in bytes) above which attachments are zipped, provided that this makes them smaller
+COMPRESSION_SIZE = 1024 * 1024
+
+# allowance (in bytes) for the headers and text of an email, in addition to its attachments
+MESSAGE_OVERHEAD = 64 * 1024
+
+# number of bytes encoded per line of base64 text, and length of such a line (including CRLF)
+_BASE64_BYTES_PER_LINE = 57
+_BASE64_LINE_LENGTH = 78
+
+_POLICY = email.policy.SMTP
+
+
+def attachment_size(attachment):
+    """Return the size of an attachment.
+
+    Params
+    ------
+    attachment : dict
+        The attachment, as a dictionary with the file name ("name"), the content as a file object ("content") and,
+        optionally, the MIME type ("mime_type").
+
+    Returns
+    -------
+    int
+        The size, in bytes.
+    """
+
+    content = attachment["content"]
+    content.seek(0, os.SEEK_END)
+    size = content.tell()
+    content.seek(0)
+    return size
+
+
+def encoded_size(attachment):
+    """Return the size of an attachment once it is base64 encoded for an email.
+
+    Params
+    ------
+    attachment : dict
+        The attachment (see attachment_size).
+
+    Returns
+    -------
+    int
+        The size, in bytes.
+    """
+
+    lines = -(-attachment_size(attachment) // _BASE64_BYTES_PER_LINE)
+    return lines * _BASE64_LINE_LENGTH
+
+
+def zipped(attachment):
+    """Return an attachment as a zip file.
+
+    Params
+    ------
+    attachment : dict
+        The attachment (see attachment_size).
+
+    Returns
+    -------
+    dict
+        The zipped attachment, whose name is that of the original attachment with ".zip" appended.
+    """
+
+    content = tempfile.SpooledTemporaryFile(max_size=SPILL_SIZE)
+    with zipfile.ZipFile(content, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        with archive.open(attachment["name"], "w") as f:
+            attachment["content"].seek(0)
+            shutil.copyfileobj(attachment["content"], f)
+    attachment["content"].seek(0)
+    content.seek(0)
+    return dict(
+        name=attachment["name"] + ".zip", content=content, mime_type="application/zip"
+    )
+
+
+def compressed(attachment, compression_size=COMPRESSION_SIZE):
+    """Return an attachment zipped if it is large and zipping makes it smaller, or as it is otherwise.
+
+    Params
+    ------
+    attachment : dict
+        The attachment (see attachment_size).
+    compression_size : int
+        Size (in bytes) above which the attachment is zipped.
+
+    Returns
+    -------
+    dict
+        The attachment, zipped or as it is.
+    """
+
+    size = attachment_size(attachment)
+    if size <= compression_size:
+        return attachment
+    archive = zipped(attachment)
+    return archive if attachment_size(archive) < size else attachment
+
+
+def by_year(attachment, columns):
+    """Split an exported file into separate files for every publication year.
+
+    The publications are read from the given attachment, so that they needn't be kept in memory, and they are split
+    by the year of their publication date. The files have the format of the attachment, and they are named after it,
+    with the year appended to the file name (such as all_2024.xlsx for all.xlsx).
+
+    Params
+    ------
+    attachment : dict
+        The attachment with all the publications (see attachment_size).
+    columns : dict
+        Dictionary of the keys of the details to include and the column names, as returned by spreadsheet_columns.
+
+    Returns
+    -------
+    list of dict
+        The attachments for the years, in chronological order.
+    """
+
+    stem, extension = os.path.splitext(attachment["name"])
+    exporter_class = EXPORTERS[ExportFormat(extension[1:])]
+    exporters = dict()
+    for p in exporter_class.read(attachment["content"], columns):
+        year = (p.get("pubdate") or "")[:4] or "unknown"
+        if year not in exporters:
+            exporters[year] = exporter_class(columns)
+        exporters[year].write(p)
+    return [
+        dict(
+            name="{stem}_{year}{extension}".format(
+                stem=stem, year=year, extension=extension
+            ),
+            content=exporters[year].close(),
+            mime_type=attachment.get("mime_type"),
+        )
+        for year in sorted(exporters)
+    ]
+
+
+def plan_messages(
+    attachments,
+    max_size,
+    columns=None,
+    compression_size=COMPRESSION_SIZE,
+):
+    """Distribute attachments over as few emails as a maximum email size allows.
+
+    Large attachments are zipped (see compressed). If an attachment is too large for an email even so, and the
+    columns are given, it is replaced with separate attachments for every publication year (see by_year). An
+    attachment which is still too large for an email gets an email of its own, and a warning is printed.
+
+    The attachments are distributed in their order, starting a new email whenever the next attachment doesn't fit
+    into the current one.
+
+    Params
+    ------
+    attachments : list of dict
+        The attachments (see attachment_size).
+    max_size : int
+        Maximum size of an email, in bytes.
+    columns : dict
+        Dictionary of the keys of the details included in the attachments and the column names, as returned by
+        spreadsheet_columns. Attachments aren't split by year if this is None.
+    compression_size : int
+        Size (in bytes) above which attachments are zipped.
+
+    Returns
+    -------
+    list of list of dict
+        The attachments of every email. There is at least one email, even if there are no attachments.
+    """
+
+    available = max_size - MESSAGE_OVERHEAD
+    prepared = []
+    for attachment in attachments:
+        candidate = compressed(attachment, compression_size)
+        if encoded_size(candidate) > available and columns is not None:
+            print(
+                "{name} is too large for a single email, so it is split by publication year".format(
+                    name=attachment["name"]
+                )
+            )
+            prepared.extend(
+                compressed(a, compression_size)
+                for a in by_year(attachment, columns)
+            )
+        else:
+            prepared.append(candidate)
+
+    messages = [[]]
+    size = 0
+    for attachment in prepared:
+        attachment_encoded_size = encoded_size(attachment)
+        if attachment_encoded_size > available:
+            print(
+                "Warning: {name} is larger than the maximum email size, so its email may be rejected".format(
+                    name=attachment["name"]
+                )
+            )
+        if messages[-1] and size + attachment_encoded_size > available:
+            messages.append([])
+            size = 0
+        messages[-1].append(attachment)
+        size += attachment_encoded_size
+    return messages
+
+
+def write_message(out, headers, body, attachments):
+    """Write an email with attachments to a binary file.
+
+    The email is written as a multipart/mixed MIME message, with line endings as required by SMTP. The attachments
+    are base64 encoded chunk by chunk, so that neither they nor the email are ever held in memory in full.
+
+    Params
+    ------
+    out : file object
+        The file to write to.
+    headers : dict
+        Dictionary of the email headers (such as "Subject" or "To") and their values.
+    body : email.message.Message
+        The body of the email, such as a multipart/alternative message with a plain text and an HTML version.
+    attachments : list of dict
+        The attachments (see attachment_size).
+
+    Returns
+    -------
+    int
+        The size of the email, in bytes.
+    """
+
+    start = out.tell()
+    boundary = "=" * 15 + uuid.uuid4().hex
+    delimiter = "\r\n--{0}\r\n".format(boundary).encode("ascii")
+
+    outer = MIMEMultipart(boundary=boundary)
+    for name, value in headers.items():
+        outer[name] = value
+    for name, value in outer.items():
+        out.write(_POLICY.fold_binary(name, value))
+    out.write(b"\r\nYou will not see this in a MIME-aware mail reader.\r\n")
+
+    out.write(delimiter)
+    out.write(body.as_bytes(policy=_POLICY))
+
+    for attachment in attachments:
+        part = MIMEBase(
+            *attachment.get("mime_type", "application/octet-stream").split("/", 1)
+        )
+        part["Content-Transfer-Encoding"] = "base64"
+        part.add_header("Content-Disposition", "attachment", filename=attachment["name"])
+        out.write(delimiter)
+        for name, value in part.items():
+            out.write(_POLICY.fold_binary(name, value))
+        out.write(b"\r\n")
+
+        content = attachment["content"]
+        content.seek(0)
+        while chunk := content.read(_BASE64_BYTES_PER_LINE * 1024):
+            out.write(base64.encodebytes(chunk).replace(b"\n", b"\r\n"))
+        content.seek(0)
+
+    out.write("\r\n--{0}--\r\n".format(boundary).encode("ascii"))
+    return out.tell() - start
+
+
+def send_message_file(smtp, sender, recipients, message):
+    """Send an email from a file over an SMTP connection.
+
+    The email is streamed to the server line by line, rather than being read into memory. Apart from that, this
+    function behaves like smtplib.SMTP.sendmail.
+
+    Params
+    ------
+    smtp : smtplib.SMTP
+        The SMTP connection.
+    sender : str
+        Email address of the sender.
+    recipients : list of str
+        Email addresses of the recipients.
+    message : file object
+        Binary file with the email, as written by write_message.
+
+    Returns
+    -------
+    dict
+        Dictionary of the refused recipients and the SMTP error code and message for each.
+    """
+
+    smtp.ehlo_or_helo_if_needed()
+    code, response = smtp.mail(sender)
+    if code != 250:
+        smtp.rset()
+        raise smtplib.SMTPSenderRefused(code, response, sender)
+    refused = dict()
+    for recipient in recipients:
+        code, response = smtp.rcpt(recipient)
+        if code not in (250, 251):
+            refused[recipient] = (code, response)
+    if len(refused) == len(recipients):
+        smtp.rset()
+        raise smtplib.SMTPRecipientsRefused(refused)
+
+    code, response = smtp.docmd("data")
+    if code != 354:
+        smtp.rset()
+        raise smtplib.SMTPDataError(code, response)
+    message.seek(0)
+    for line in message:
+        # a line starting with a period must have another period prepended (see RFC 5321)
+        if line.startswith(b"."):
+            line = b"." + line
+        smtp.send(line)
+    smtp.send(b".\r\n")
+    code, response = smtp.getreply()
+    if code != 250:
+        smtp.rset()
+        raise smtplib.SMTPDataError(code, response)
+    return refused
@@ -0,0 +1,312 @@
+import abc
+import csv
+import io
+import tempfile
+from enum import Enum
+
+import openpyxl
+import xlsxwriter
+
+from pubquery.publication import FIELD_TYPES
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    # pyarrow is optional, as it is only needed for exporting to Parquet
+    pyarrow = None
+
+# size (in bytes) above which a finished export is kept in a temporary file rather than in memory
+SPILL_SIZE = 10 * 1024 * 1024
+
+# columns whose values are written as booleans, numbers or URLs in a spreadsheet; all other values are written as
+# strings
+BOOLEAN_COLUMNS = {"refereed"}
+NUMBER_COLUMNS = {"no_of_authors_aff_to_SA_ins"}
+URL_COLUMNS = {"ads_url"}
+
+# separators for joining list values, by column; the items of other lists are joined with ", "
+LIST_SEPARATORS = {"aff": "| "}
+
+# maximum number of hyperlinks in an Excel worksheet, and maximum length of a hyperlink
+MAX_URLS = 65530
+MAX_URL_LENGTH = 2079
+
+# number of publications per row group of a Parquet file
+PARQUET_ROW_GROUP_SIZE = 10000
+
+
+class ExportFormat(Enum):
+    XLSX = "xlsx"
+    CSV = "csv"
+    PARQUET = "parquet"
+
+
+def _joined(key, value):
+    # join a list value into a single string
+    if isinstance(value, list):
+        return LIST_SEPARATORS.get(key, ", ").join(value)
+    return value
+
+
+class Exporter(abc.ABC):
+    """Base class for the exporters of publications, which write one publication at a time.
+
+    The details to include are given as the columns of a table, with a row for every publication. The finished export
+    is kept in memory, unless it is larger than the given size, in which case it is moved to a temporary file.
+
+    Subclasses must implement the write and read methods, and they may extend the close method to finish the export.
+
+    Params
+    ------
+    columns : dict
+        Dictionary of the keys of the details to include and the column names, as returned by spreadsheet_columns.
+    spill_size : int
+        Size (in bytes) above which the finished export is kept in a temporary file.
+    """
+
+    # file extension and MIME type of the exported files
+    extension = None
+    mime_type = None
+
+    def __init__(self, columns, spill_size=SPILL_SIZE):
+        self.columns = columns
+        self.keys = list(columns.keys())
+        self.rows = 0
+        self._file = tempfile.SpooledTemporaryFile(max_size=spill_size)
+
+    @abc.abstractmethod
+    def write(self, publication):
+        """Write a publication as the next row.
+
+        Params
+        ------
+        publication : Publication or dict
+            The publication.
+        """
+
+    def close(self):
+        """Finish the export.
+
+        Returns
+        -------
+        file object
+            The exported file, rewound to its start.
+        """
+
+        self._file.seek(0)
+        return self._file
+
+    @staticmethod
+    @abc.abstractmethod
+    def read(file, columns):
+        """Read the rows of an exported file.
+
+        The values are returned as they are stored in the file, so that, for example, lists may have been joined into
+        a single string. The rows can be written with an exporter of the same kind.
+
+        Params
+        ------
+        file : file object
+            The exported file, which is rewound to its start when the rows have been read.
+        columns : dict
+            Dictionary of the keys of the details and the column names, as used for the export.
+
+        Returns
+        -------
+        iterable of dict
+            Dictionaries of the column keys and values, one for every row.
+        """
+
+
+class XlsxExporter(Exporter):
+    """Exporter writing an Excel spreadsheet.
+
+    The spreadsheet has a header row with the column names, followed by a row for every publication. It is written in
+    xlsxwriter's constant memory mode, so that every row is flushed to a temporary file once the next row is started,
+    and thus the rows may be written as the publications are produced.
+
+    List values (such as the authors) are joined into a single string. Values which are missing or empty are left
+    blank.
+    """
+
+    extension = "xlsx"
+    mime_type = "application/vnd.ms-excel"
+
+    def __init__(self, columns, spill_size=SPILL_SIZE):
+        super().__init__(columns, spill_size)
+        self._urls = 0
+        self._workbook = xlsxwriter.Workbook(self._file, {"constant_memory": True})
+        self._worksheet = self._workbook.add_worksheet()
+
+        header = self._workbook.add_format({"bold": True})
+        for col, name in enumerate(columns.values()):
+            self._worksheet.write_string(0, col, name, header)
+        self._worksheet.freeze_panes(1, 0)
+
+    def _write_url(self, row, col, url):
+        # Excel limits the number and length of hyperlinks, so any other URLs are written as strings.
+        if self._urls >= MAX_URLS or len(url) > MAX_URL_LENGTH:
+            self._worksheet.write_string(row, col, url)
+            return
+        self._worksheet.write_url(row, col, url)
+        self._urls += 1
+
+    def write(self, publication):
+        self.rows += 1
+        row = self.rows
+        for col, key in enumerate(self.keys):
+            value = _joined(key, publication.get(key))
+            if value is None or value == "":
+                continue
+            if key in BOOLEAN_COLUMNS:
+                self._worksheet.write_boolean(row, col, bool(value))
+            elif key in NUMBER_COLUMNS:
+                self._worksheet.write_number(row, col, value)
+            elif key in URL_COLUMNS:
+                self._write_url(row, col, value)
+            else:
+                self._worksheet.write_string(row, col, str(value))
+
+    def close(self):
+        self._workbook.close()
+        return super().close()
+
+    @staticmethod
+    def read(file, columns):
+        keys = {name: key for key, name in columns.items()}
+        file.seek(0)
+        workbook = openpyxl.load_workbook(file, read_only=True)
+        try:
+            rows = workbook.active.values
+            header = [keys[name] for name in next(rows)]
+            for row in rows:
+                yield dict(zip(header, row))
+        finally:
+            workbook.close()
+            file.seek(0)
+
+
+class CsvExporter(Exporter):
+    """Exporter writing a UTF-8 encoded CSV file.
+
+    The file has a header row with the column keys (rather than the more human-friendly column names), followed by a
+    row for every publication. List values are joined into a single string, as in a spreadsheet.
+    """
+
+    extension = "csv"
+    mime_type = "text/csv"
+
+    def __init__(self, columns, spill_size=SPILL_SIZE):
+        super().__init__(columns, spill_size)
+        self._text = io.TextIOWrapper(self._file, encoding="utf-8", newline="")
+        self._writer = csv.writer(self._text)
+        self._writer.writerow(self.keys)
+
+    def write(self, publication):
+        self.rows += 1
+        self._writer.writerow(
+            [_joined(key, publication.get(key)) for key in self.keys]
+        )
+
+    def close(self):
+        self._text.flush()
+        self._text.detach()
+        return super().close()
+
+    @staticmethod
+    def read(file, columns):
+        file.seek(0)
+        text = io.TextIOWrapper(file, encoding="utf-8", newline="")
+        try:
+            yield from csv.DictReader(text)
+        finally:
+            text.detach()
+            file.seek(0)
+
+
+def _arrow_type(key):
+    # Arrow type of the values of a column, as derived from the type of the corresponding publication field
+    field_type = FIELD_TYPES.get(key, str)
+    if field_type is list:
+        return pyarrow.list_(pyarrow.string())
+    if field_type is bool:
+        return pyarrow.bool_()
+    if field_type is int:
+        return pyarrow.int64()
+    return pyarrow.string()
+
+
+class ParquetExporter(Exporter):
+    """Exporter writing a Parquet file.
+
+    The columns are named by their keys, and the column names are included as field metadata. List values (such as
+    the authors) are stored as lists, and all other values with the type of the corresponding publication field.
+    Missing and empty values are stored as nulls. The publications are written in row groups of a fixed size.
+
+    This exporter requires pyarrow.
+    """
+
+    extension = "parquet"
+    mime_type = "application/vnd.apache.parquet"
+
+    def __init__(self, columns, spill_size=SPILL_SIZE):
+        if pyarrow is None:
+            raise ImportError(
+                "Exporting to Parquet requires pyarrow, which can be installed with pip install pyarrow"
+            )
+        super().__init__(columns, spill_size)
+        self.schema = pyarrow.schema(
+            [
+                pyarrow.field(key, _arrow_type(key), metadata={"name": name})
+                for key, name in columns.items()
+            ]
+        )
+        self._writer = pyarrow.parquet.ParquetWriter(self._file, self.schema)
+        self._batch = {key: [] for key in self.keys}
+
+    def _flush(self):
+        if self._batch[self.keys[0]]:
+            self._writer.write_table(
+                pyarrow.table(self._batch, schema=self.schema),
+                row_group_size=PARQUET_ROW_GROUP_SIZE,
+            )
+            self._batch = {key: [] for key in self.keys}
+
+    def write(self, publication):
+        self.rows += 1
+        for key, field in zip(self.keys, self.schema):
+            value = publication.get(key)
+            if value is None or value == "":
+                value = None
+            elif isinstance(field.type, pyarrow.ListType):
+                value = [str(v) for v in value] if isinstance(value, list) else [value]
+            elif pyarrow.types.is_string(field.type):
+                value = str(_joined(key, value))
+            self._batch[key].append(value)
+        if self.rows % PARQUET_ROW_GROUP_SIZE == 0:
+            self._flush()
+
+    def close(self):
+        self._flush()
+        self._writer.close()
+        return super().close()
+
+    @staticmethod
+    def read(file, columns):
+        file.seek(0)
+        try:
+            for batch in pyarrow.parquet.ParquetFile(file).iter_batches(
+                batch_size=PARQUET_ROW_GROUP_SIZE
+            ):
+                yield from batch.to_pylist()
+        finally:
+            file.seek(0)
+
+
+# exporters for the export formats
+EXPORTERS = {
+    ExportFormat.XLSX: XlsxExporter,
+    ExportFormat.CSV: CsvExporter,
+    ExportFormat.PARQUET: ParquetExporter,
+}
@@ -23,117 +23,278 @@ The format flag must be used to specify whether to generate the list as html or
 
 The generated list is printed to the standard output.
 
+A PDF may also be generated in sections, by using the sections flag with year or decade. Every section is then
+rendered as a PDF of its own, in a pool of processes (whose size may be set with the workers flag), and the section PDFs
+are merged into the final document. The section PDFs are cached in a directory (which may be set with the cache-dir
+flag), so that only the sections whose publications have changed are rendered again. Cached sections are only removed
+once no generated PDF uses them any longer, so that several lists may share the cache directory. Every section starts
+on a new page. Generating a PDF in sections requires pypdf.
+
 Usage: python generate_publications_list.py --format pdf|html --spreadsheet /path/to/spreadsheet --out /path/to/output
+       [--sections year|decade] [--workers N] [--cache-dir /path/to/cache]
 """
 
 import argparse
+import concurrent.futures
 import datetime
+import hashlib
+import importlib.metadata
+import json
+import os
+import re
 import numpy as np
 import pandas as pd
-from weasyprint import HTML
 
-parser = argparse.ArgumentParser()
-parser.add_argument('--format', help='format of the generated list (html or pdf)', required=True)
-parser.add_argument('--spreadsheet', help='spreadsheet with the SAAO publication data', required=True)
-parser.add_argument('--out', help='Output file', required=True)
-args = parser.parse_args()
+# columns with text values
+TEXT_COLUMNS = ['Responsibility', 'TITLE', 'REF', 'TELESCOPE']
 
+# directory for caching the PDFs of sections
+PDF_CACHE_DIR = os.path.expanduser('~/.cache/pubquery/publications_list')
 
-def create_html():
-    df = pd.read_excel(args.spreadsheet)
 
+def create_html(df):
+    return ''.join(html for _, html in create_sections(df))
+
+
+def create_sections(df):
+    """
+    Return the HTML for every year, from the current year down to 1971.
+
+    The rows of all the years are rendered together, and the rendered rows are then grouped by year, so that the
+    DataFrame is sorted and grouped only once. A year without publications just gets its heading.
+
+    Params
+    ------
+    df : pandas.DataFrame
+        The publications, with the columns described in the module docstring.
+
+    Returns
+    -------
+    list of tuple
+        Tuples of a year and the HTML for that year, in descending order of the years.
+    """
     start_year = 1971
     end_year = datetime.datetime.now().year
 
-    html = ''
-    for year in range(end_year, start_year - 1, -1):
-        html += '<h2>{year}</h2>\n'.format(year=year)
-        df_year = df[np.isclose(df['YEAR'].values, year)]
-        rows = []
-        for _, row in df_year.iterrows():
-            rows.append(row)
-        rows.sort(key=lambda x: str(x['PSAAO']), reverse=True)
-        for row in rows:
-            html += create_row_content(year, row)
-
-    return html
-
-
-def create_row_content(year, row):
-    id = row['PSAAO']
-    authors = row['Responsibility']
-    title = row['TITLE']
-    ref = row['REF']
-    volume = row['VOL']
-    first_page = row['FPG']
-    url = row['URL']
-    telescopes = row['TELESCOPE']
-
-    return '''<p><strong>{id}. </strong> {authors}, {year}. {title} {location} {link} {telescopes}</p>\n'''\
-        .format(id=id,
-                authors=create_authors(authors),
-                title='{title}.'.format(title=title.strip()) if not pd.isna([title]) else '',
-                year=year,
-                location=create_location(ref, volume, first_page),
-                link=create_link(url),
-                telescopes=create_telescopes(telescopes))
+    # Years are given as (possibly non-integer) numbers and are matched approximately.
+    years = df['YEAR'].to_numpy(dtype=float)
+    rounded = np.round(years)
+    included = np.isclose(years, rounded) & (rounded >= start_year) & (rounded <= end_year)
+    # columns without any values may not have a string dtype
+    df = df[included].astype({column: object for column in TEXT_COLUMNS})
+    year_values = rounded[included].astype(int)
+
+    # sort by year and, within a year, by id in descending order (keeping the order of rows with the same id)
+    ids = df['PSAAO'].map(str).to_numpy(dtype=str)
+    order = np.lexsort((np.arange(len(df))[::-1], ids, year_values))[::-1]
+    df = df.iloc[order]
+    year_values = year_values[order]
+
+    rendered = dict()
+    if len(df):
+        rows = create_rows(df, year_values)
+        rendered = rows.groupby(year_values, sort=False).agg(''.join).to_dict()
+
+    return [
+        (year, '<h2>{year}</h2>\n'.format(year=year) + rendered.get(year, ''))
+        for year in range(end_year, start_year - 1, -1)
+    ]
+
+
+def create_rows(df, years):
+    # the HTML for all rows of a DataFrame, whose publication years are given as an array
+    ids = df['PSAAO'].map(str)
+    titles = df['TITLE']
+    titles = (titles.str.strip() + '.').fillna('')
+
+    return (
+        '<p><strong>' + ids + '. </strong> ' + create_authors(df['Responsibility']) + ', '
+        + pd.Series(years, index=df.index).map(str) + '. ' + titles + ' '
+        + create_location(df['REF'], df['VOL'], df['FPG']) + ' '
+        + create_link(df['URL']) + ' '
+        + create_telescopes(df['TELESCOPE']) + '</p>\n'
+    )
 
 
 def create_authors(authors):
-    if pd.isna([authors]):
-        return ''
-    authors = authors.strip(', ')\
-        .replace('( &', '(&')\
-        .replace('& ', '&amp; ')
-    parenthesis = authors.find('(')
-    if parenthesis != -1:
-        return '{first}<em>{second}</em>'\
-            .format(first=authors[:parenthesis], second=authors[parenthesis:])
-    else:
-        return authors
+    authors = authors.str.strip(', ')\
+        .str.replace('( &', '(&', regex=False)\
+        .str.replace('& ', '&amp; ', regex=False)
+    parts = authors.str.extract(r'([^(]*)(\(.*)?', flags=re.DOTALL)
+    return (parts[0] + ('<em>' + parts[1] + '</em>').fillna('')).fillna('')
 
 
 def create_location(ref, volume, first_page):
-    location = ''
-    if pd.isna([ref]):
-        return location
-    location += '<em>{ref}</em>'.format(ref=ref.strip().replace('& ', '&amp; '))
-    if pd.isna([volume]):
-        return location
-    location += ', <strong>{volume}'.format(volume=volume)
-    if pd.isna([first_page]):
-        first_page = None
-    if first_page and 'pp' in str(first_page).lower():
-        first_page = None
-    if first_page:
-        location += ': '
-    location += '</strong>'
-    if first_page:
-        location += str(first_page)
-    location += '.'
-
-    return location
+    first_page_text = first_page.map(str)
+    with_first_page = first_page.notna() \
+        & ~first_page_text.str.lower().str.contains('pp', regex=False) \
+        & first_page.map(bool)
+    location = '<em>' + ref.str.strip().str.replace('& ', '&amp; ', regex=False) + '</em>'
+    location_with_volume = location + ', <strong>' + volume.map(str) \
+        + (': </strong>' + first_page_text).where(with_first_page, '</strong>') + '.'
+
+    return location_with_volume.where(volume.notna(), location)\
+        .where(ref.notna(), '')\
+        .fillna('')
 
 
 def create_link(url):
-    if url and not pd.isna([url]):
-        title = 'ADS' if 'saaoads.' in url or 'adsabs.' in url else 'Link'
-        return '<a href="{url}">{title}</a>'.format(url=url, title=title)
-    else:
-        return ''
+    url_text = url.map(str)
+    ads = url_text.str.contains('saaoads.', regex=False) | url_text.str.contains('adsabs.', regex=False)
+    titles = pd.Series('Link', index=url.index).where(~ads, 'ADS')
+    return ('<a href="' + url_text + '">' + titles + '</a>')\
+        .where(url.notna() & url.map(bool), '')
 
 
 def create_telescopes(telescopes):
-    if pd.isna([telescopes]):
-        return ''
-    return '<em>[{telescopes}]</em>'.format(telescopes=telescopes.replace('|', ', '))
-
-
-html = create_html()
-if args.format == 'html':
-    with open(args.out, 'w') as f:
-        f.write(html)
-elif args.format == 'pdf':
-    HTML(string=html).write_pdf(args.out)
-else:
-    raise ValueError('Unsupported format: {format}'.format(format=args.format))
+    return ('<em>[' + telescopes.str.replace('|', ', ', regex=False) + ']</em>')\
+        .where(telescopes.notna(), '')\
+        .fillna('')
+
+
+def group_sections(sections, grouping):
+    """
+    Group the sections for years into the sections of a PDF.
+
+    Params
+    ------
+    sections : list of tuple
+        Tuples of a year and the HTML for that year, as returned by create_sections.
+    grouping : str
+        How to group the years, either 'year' (for a section per year) or 'decade' (for a section per decade).
+
+    Returns
+    -------
+    list of str
+        The HTML for every section, in the order of the given years.
+    """
+    if grouping == 'year':
+        return [html for _, html in sections]
+    if grouping == 'decade':
+        decades = dict()
+        for year, html in sections:
+            decades[year // 10] = decades.get(year // 10, '') + html
+        return list(decades.values())
+    raise ValueError('Unsupported sections: {grouping}'.format(grouping=grouping))
+
+
+def render_pdf(html, path):
+    # render HTML as a PDF file, which is only created once the PDF is complete
+    # WeasyPrint needs Cairo and Pango, so it is only imported if it is used
+    from weasyprint import HTML
+    partial_path = '{path}.{pid}.part'.format(path=path, pid=os.getpid())
+    HTML(string=html).write_pdf(partial_path)
+    os.replace(partial_path, path)
+
+
+def create_pdf(sections, out, cache_dir=PDF_CACHE_DIR, workers=None):
+    """
+    Generate a PDF by rendering every section as a PDF of its own and merging the section PDFs.
+
+    The section PDFs are cached, keyed by a hash of the section's HTML (and hence of its publications) and the
+    WeasyPrint version. Only sections which aren't in the cache are rendered, in parallel.
+
+    The section PDFs are kept in the subdirectory "sections" of the cache directory, as section_<hash>.pdf. For every
+    generated PDF a manifest with the section PDFs it uses is kept in the subdirectory "manifests", so that several
+    lists may share the cache. Section PDFs which aren't used by any manifest are removed, and so are the manifests of
+    PDFs which don't exist any longer. No other files are removed.
+
+    Params
+    ------
+    sections : list of str
+        The HTML for every section, as returned by group_sections.
+    out : str
+        Path of the generated PDF.
+    cache_dir : str
+        Directory for caching the section PDFs.
+    workers : int
+        Maximum number of processes for rendering sections. The number of processors is used if this is None.
+    """
+    try:
+        from pypdf import PdfWriter
+    except ImportError:
+        raise ImportError('Generating a PDF in sections requires pypdf, which can be installed with pip install pypdf')
+    weasyprint_version = importlib.metadata.version('weasyprint')
+
+    sections_dir = os.path.join(cache_dir, 'sections')
+    manifests_dir = os.path.join(cache_dir, 'manifests')
+    os.makedirs(sections_dir, exist_ok=True)
+    os.makedirs(manifests_dir, exist_ok=True)
+    names = [
+        'section_{hash}.pdf'.format(
+            hash=hashlib.sha256((weasyprint_version + '\n' + html).encode('utf-8')).hexdigest()
+        )
+        for html in sections
+    ]
+    paths = [os.path.join(sections_dir, name) for name in names]
+
+    # the same HTML may occur more than once (such as for years without publications), but is rendered only once
+    missing = {path: html for path, html in zip(paths, sections) if not os.path.exists(path)}
+    print('Rendering {missing} of {total} distinct sections'.format(missing=len(missing), total=len(set(paths))))
+    if missing:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+            for _ in executor.map(render_pdf, missing.values(), missing.keys()):
+                pass
+
+    writer = PdfWriter()
+    for path in paths:
+        writer.append(path)
+    with open(out, 'wb') as f:
+        writer.write(f)
+
+    # record the sections used for the generated PDF, replacing those used for it before
+    out_path = os.path.realpath(out)
+    manifest = os.path.join(
+        manifests_dir, hashlib.sha256(out_path.encode('utf-8')).hexdigest() + '.json'
+    )
+    with open(manifest + '.part', 'w') as f:
+        json.dump(dict(out=out_path, sections=sorted(set(names))), f)
+    os.replace(manifest + '.part', manifest)
+
+    # the manifests of PDFs which don't exist any longer are removed as well
+    used = set()
+    for name in os.listdir(manifests_dir):
+        if re.fullmatch(r'[0-9a-f]{64}\.json', name):
+            with open(os.path.join(manifests_dir, name)) as f:
+                content = json.load(f)
+            if os.path.exists(content['out']):
+                used.update(content['sections'])
+            else:
+                os.remove(os.path.join(manifests_dir, name))
+    for name in os.listdir(sections_dir):
+        path = os.path.join(sections_dir, name)
+        if re.fullmatch(r'section_[0-9a-f]{64}\.pdf', name) and name not in used \
+                and os.path.realpath(path) != out_path:
+            os.remove(path)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--format', help='format of the generated list (html or pdf)', required=True)
+    parser.add_argument('--spreadsheet', help='spreadsheet with the SAAO publication data', required=True)
+    parser.add_argument('--out', help='Output file', required=True)
+    parser.add_argument('--sections', choices=['year', 'decade'],
+                        help='render a PDF in sections for every year or decade, which are cached')
+    parser.add_argument('--workers', type=int, help='maximum number of processes for rendering PDF sections')
+    parser.add_argument('--cache-dir', default=PDF_CACHE_DIR, help='directory for caching PDF sections')
+    args = parser.parse_args()
+
+    df = pd.read_excel(args.spreadsheet)
+    if args.format == 'pdf' and args.sections:
+        create_pdf(group_sections(create_sections(df), args.sections), args.out, args.cache_dir, args.workers)
+        return
+
+    html = create_html(df)
+    if args.format == 'html':
+        with open(args.out, 'w') as f:
+            f.write(html)
+    elif args.format == 'pdf':
+        # WeasyPrint needs Cairo and Pango, so it is only imported if it is used
+        from weasyprint import HTML
+        HTML(string=html).write_pdf(args.out)
+    else:
+        raise ValueError('Unsupported format: {format}'.format(format=args.format))
+
+
+if __name__ == '__main__':
+    main()
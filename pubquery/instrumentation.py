@@ -0,0 +1,398 @@
+import contextlib
+import datetime
+import json
+import os
+import tempfile
+import threading
+import time
+
+
+class RequestStats:
+    """Statistics of the HTTP requests made to a service.
+
+    The statistics may be updated from multiple threads.
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.bytes = 0
+        self.seconds = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, size, seconds, requests=1):
+        """Record requests.
+
+        Params
+        ------
+        size : int
+            Number of bytes downloaded.
+        seconds : float
+            Time taken by the requests, in seconds.
+        requests : int
+            Number of requests.
+        """
+
+        with self._lock:
+            self.requests += requests
+            self.bytes += size
+            self.seconds += seconds
+
+    def to_dict(self):
+        """Return the statistics as a dictionary.
+
+        Returns
+        -------
+        dict
+            The number of requests, the number of bytes downloaded and the time taken, in seconds.
+        """
+
+        return dict(
+            requests=self.requests, bytes=self.bytes, seconds=round(self.seconds, 3)
+        )
+
+
+class StageTimes:
+    """Timer for the stages of a run.
+
+    The stages of a pipeline run concurrently and wait for each other, so for a pipeline stage only the time during
+    which it is busy is counted, excluding the time it spends waiting for items from the preceding stage. Other
+    stages are timed with a context manager.
+
+    The times may be updated from multiple threads.
+    """
+
+    def __init__(self):
+        self.seconds = dict()
+        self.items = dict()
+        self._lock = threading.Lock()
+
+    def _add(self, name, seconds, items=0):
+        with self._lock:
+            self.seconds[name] = self.seconds.get(name, 0.0) + seconds
+            self.items[name] = self.items.get(name, 0) + items
+
+    def _iterate(self, name, items, waited=None):
+        # yield the items of an iterable, timing the calls to get the next item, except for the time recorded in
+        # waited[0] during the call
+        items = iter(items)
+        while True:
+            waited_before = waited[0] if waited else 0.0
+            start = time.perf_counter()
+            try:
+                item = next(items)
+            except StopIteration:
+                waited_during = (waited[0] if waited else 0.0) - waited_before
+                self._add(name, time.perf_counter() - start - waited_during)
+                return
+            waited_during = (waited[0] if waited else 0.0) - waited_before
+            self._add(name, time.perf_counter() - start - waited_during, 1)
+            yield item
+
+    def source(self, name, items):
+        """Time the production of the items of a pipeline source.
+
+        Params
+        ------
+        name : str
+            Name of the stage.
+        items : iterable
+            The items produced by the source.
+
+        Returns
+        -------
+        iterable
+            The items.
+        """
+
+        return self._iterate(name, items)
+
+    def stage(self, name, stage):
+        """Wrap a pipeline stage (see pipeline.run_pipeline), so that the time it is busy is recorded.
+
+        Params
+        ------
+        name : str
+            Name of the stage.
+        stage : function
+            The stage.
+
+        Returns
+        -------
+        function
+            The wrapped stage.
+        """
+
+        def timed_stage(items):
+            waited = [0.0]
+
+            def upstream():
+                items_iterator = iter(items)
+                while True:
+                    start = time.perf_counter()
+                    try:
+                        item = next(items_iterator)
+                    except StopIteration:
+                        waited[0] += time.perf_counter() - start
+                        return
+                    waited[0] += time.perf_counter() - start
+                    yield item
+
+            return self._iterate(name, stage(upstream()), waited)
+
+        return timed_stage
+
+    @contextlib.contextmanager
+    def timed(self, name):
+        """Context manager recording the time spent in its block.
+
+        Params
+        ------
+        name : str
+            Name of the stage.
+        """
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._add(name, time.perf_counter() - start)
+
+    def to_dict(self):
+        """Return the times as a dictionary.
+
+        Returns
+        -------
+        dict
+            Dictionary of stage names and dictionaries with the time (in seconds) and the number of items produced.
+        """
+
+        return {
+            name: dict(seconds=round(seconds, 3), items=self.items[name])
+            for name, seconds in self.seconds.items()
+        }
+
+
+def run_report(
+    from_date,
+    to_date,
+    started,
+    publications,
+    stage_times,
+    queries,
+    enrichment_stats,
+    enrichment_retries,
+    wos_queries,
+    cache=None,
+    slowest=10,
+    enrichment_reused=0,
+    found=None,
+):
+    """Return the report of a run.
+
+    Params
+    ------
+    from_date : datetime.date
+        Start date of the queried date range.
+    to_date : datetime.date
+        End date of the queried date range.
+    started : datetime.datetime
+        Time when the run was started.
+    publications : int
+        Number of publications reported.
+    stage_times : StageTimes
+        Times of the stages.
+    queries : ADSQueries
+        The ADS queries used for the searches.
+    enrichment_stats : RequestStats
+        Statistics of the authors and affiliations requests.
+    enrichment_retries : int
+        Number of retried authors and affiliations requests.
+    wos_queries : WoSQueries
+        The Web of Science queries.
+    cache : ResponseCache
+        Cache of the query results, or None if no cache is used.
+    slowest : int
+        Number of slowest searches to include.
+    enrichment_reused : int
+        Number of publications whose authors and affiliations were reused from the search results rather than
+        queried.
+    found : int
+        Number of relevant publications found, including those which have been reported already. The number of
+        reported publications is used if this is None.
+
+    Returns
+    -------
+    dict
+        The report, which can be serialized as JSON.
+    """
+
+    finished = datetime.datetime.now().astimezone()
+    searches = queries.search_stats
+    report = dict(
+        from_date=from_date.isoformat(),
+        to_date=to_date.isoformat(),
+        started=started.isoformat(),
+        seconds=round((finished - started).total_seconds(), 3),
+        publications=publications,
+        found=publications if found is None else found,
+        stages=stage_times.to_dict(),
+        requests=dict(
+            ads_search=dict(
+                queries.request_stats.to_dict(), retries=queries.retry_policy.retries
+            ),
+            ads_enrichment=dict(
+                enrichment_stats.to_dict(),
+                retries=enrichment_retries,
+                reused=enrichment_reused,
+            ),
+            wos=dict(
+                wos_queries.request_stats.to_dict(),
+                retries=wos_queries.retry_policy.retries,
+            ),
+        ),
+        cache=None,
+        searches=dict(
+            count=len(searches),
+            cached=sum(1 for s in searches if s["cached"]),
+            found=sum(s["found"] for s in searches),
+            returned=sum(s["returned"] for s in searches),
+            truncated=list(queries.truncated),
+        ),
+        slowest_searches=sorted(searches, key=lambda s: s["seconds"], reverse=True)[
+            :slowest
+        ],
+    )
+    if cache is not None:
+        lookups = cache.hits + cache.misses
+        report["cache"] = dict(
+            hits=cache.hits,
+            misses=cache.misses,
+            hit_rate=round(cache.hits / lookups, 3) if lookups else None,
+        )
+    return report
+
+
+def report_summary(report):
+    """Return a plain text summary of a run report.
+
+    Params
+    ------
+    report : dict
+        The run report, as returned by run_report.
+
+    Returns
+    -------
+    str
+        The summary.
+    """
+
+    lines = [
+        "Run time: {0:.1f} s for {1} publications".format(
+            report["seconds"], report["publications"]
+        ),
+        "",
+        "Stages:",
+    ]
+    for name, stage in report["stages"].items():
+        lines.append("  {0}: {1:.1f} s".format(name, stage["seconds"]))
+    lines += ["", "Requests:"]
+    for name, requests in report["requests"].items():
+        lines.append(
+            "  {0}: {1} requests ({2} retried), {3:.1f} MB, {4:.1f} s".format(
+                name,
+                requests["requests"],
+                requests["retries"],
+                requests["bytes"] / 1e6,
+                requests["seconds"],
+            )
+        )
+    reused = report["requests"]["ads_enrichment"].get("reused")
+    if reused:
+        lines.append(
+            "  Reused authors and affiliations for {0} publications ({0} refetches avoided)".format(
+                reused
+            )
+        )
+    if report["cache"] is not None:
+        lines += [
+            "",
+            "Cache: {0} hits, {1} misses".format(
+                report["cache"]["hits"], report["cache"]["misses"]
+            ),
+        ]
+    lines += ["", "Slowest searches:"]
+    for search in report["slowest_searches"]:
+        lines.append("  {0:.1f} s: {1}".format(search["seconds"], search["query"]))
+    if report["searches"]["truncated"]:
+        lines += ["", "Truncated searches:"]
+        lines += ["  " + q for q in report["searches"]["truncated"]]
+    return "\n".join(lines)
+
+
+def save_run_report(report, directory):
+    """Save a run report as a JSON file.
+
+    The file name is derived from the queried date range and the start time of the run.
+
+    Params
+    ------
+    report : dict
+        The run report, as returned by run_report.
+    directory : str
+        Directory for the report. It is created if need be.
+
+    Returns
+    -------
+    str
+        Path of the report file.
+    """
+
+    os.makedirs(directory, exist_ok=True)
+    started = datetime.datetime.fromisoformat(report["started"])
+    path = os.path.join(
+        directory,
+        "run_report_{from_date}_{to_date}_{started}.json".format(
+            from_date=report["from_date"][:7],
+            to_date=report["to_date"][:7],
+            started=started.strftime("%Y%m%dT%H%M%S"),
+        ),
+    )
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(report, f, indent=2)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return path
+
+
+def latest_run_report(directory):
+    """Return the most recently saved run report in a directory.
+
+    Params
+    ------
+    directory : str
+        Directory with the reports.
+
+    Returns
+    -------
+    dict
+        The report, or None if there is no (readable) report in the directory.
+    """
+
+    if not os.path.isdir(directory):
+        return None
+    paths = [
+        os.path.join(directory, name)
+        for name in os.listdir(directory)
+        if name.startswith("run_report_") and name.endswith(".json")
+    ]
+    for path in sorted(paths, key=os.path.getmtime, reverse=True):
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            continue
+    return None
@@ -0,0 +1,95 @@
+import queue
+import threading
+
+_DONE = object()
+
+
+class _Failure:
+    # marker passed downstream when a stage fails
+    def __init__(self, error):
+        self.error = error
+
+
+def _pump(items, outbox):
+    # move the items produced by a stage into the queue for the next stage
+    try:
+        for item in items:
+            outbox.put(item)
+    except BaseException as error:
+        outbox.put(_Failure(error))
+    else:
+        outbox.put(_DONE)
+
+
+def _drain(inbox):
+    # yield the items in a queue, re-raising the error of a failed upstream stage
+    while True:
+        item = inbox.get()
+        if item is _DONE:
+            return
+        if isinstance(item, _Failure):
+            raise item.error
+        yield item
+
+
+def run_pipeline(source, *stages, maxsize=100):
+    """Stream items from a source through a sequence of stages.
+
+    Each stage is a function which takes an iterable of items and returns an iterable of (possibly different) items,
+    typically a generator. The source and all stages but the last run in threads of their own, and consecutive
+    stages are connected by queues holding at most maxsize items. So a stage starts working on the first items as soon
+    as they are available, while the stages before it are still producing more, and a fast stage cannot run ahead of a
+    slow one by more than maxsize items.
+
+    The last stage runs in the calling thread, as the returned iterable is consumed. If any stage fails, its error is
+    passed downstream and re-raised to the caller.
+
+    Params
+    ------
+    source : iterable
+        Source of the items.
+    stages : list of function
+        The stages.
+    maxsize : int
+        Maximum number of items in a queue between stages.
+
+    Returns
+    -------
+    iterable
+        The items produced by the last stage.
+    """
+
+    items = source
+    for stage in stages:
+        inbox = queue.Queue(maxsize=maxsize)
+        threading.Thread(target=_pump, args=(items, inbox), daemon=True).start()
+        items = stage(_drain(inbox))
+    return items
+
+
+def batched(items, size):
+    """Group the items of an iterable into lists of a given size.
+
+    The last list may be shorter. An empty iterable results in no lists.
+
+    Params
+    ------
+    items : iterable
+        Items to group.
+    size : int
+        Number of items per list.
+
+    Returns
+    -------
+    iterable of list
+        The lists of items.
+    """
+
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
@@ -0,0 +1,121 @@
+import dataclasses
+import sys
+import typing
+
+
+def _interned(values):
+    # intern the strings in a list (or a single string), leaving other values alone
+    if isinstance(values, str):
+        return sys.intern(values)
+    if isinstance(values, list):
+        return [sys.intern(v) if isinstance(v, str) else v for v in values]
+    return values
+
+
+@dataclasses.dataclass(slots=True)
+class Publication:
+    """A publication found in ADS, together with the details derived for it.
+
+    The fields returned by the ADS searches (see ADSQueries.fields) are filled in when a publication is created, the
+    derived details (such as the refereed status or the South African institutions) when the publication passes
+    through the later stages of a run. Details which aren't known (yet) are None.
+
+    As the same journals and affiliations occur in many publications, their strings are interned, so that all
+    publications share a single copy of each.
+
+    Publications may be accessed like dictionaries, with the field names as keys. Keys which aren't fields are
+    treated as missing, so that, for example, publication.get("issue", "") returns an empty string.
+    """
+
+    bibcode: str
+    abstract: str | None = None
+    aff: list | None = None
+    author: list | None = None
+    data: list | None = None
+    doi: list | None = None
+    keyword: list | None = None
+    page: list | None = None
+    property: list | None = None
+    pub: str | None = None
+    pubdate: str | None = None
+    title: list | None = None
+    volume: str | None = None
+    fulltext_keywords: list = dataclasses.field(default_factory=list)
+    refereed: bool | None = None
+    ads_url: str | None = None
+    no_of_authors_aff_to_SA_ins: int | None = None
+    institute_of_first_author: str | None = None
+    authors_affiliated_with_SAAO: str | None = None
+    SA_institutions: str | None = None
+    SALT_partners: str | None = None
+    doi_in_wos: str | None = None
+
+    def __post_init__(self):
+        self.pub = _interned(self.pub)
+        self.aff = _interned(self.aff)
+        self.property = _interned(self.property)
+
+    @classmethod
+    def from_dict(cls, details):
+        """Create a publication from a dictionary of details, such as an ADS search result.
+
+        Keys which aren't fields of a publication (such as the highlights of a search result) are ignored.
+
+        Params
+        ------
+        details : dict
+            Dictionary of details, which must include the bibcode.
+
+        Returns
+        -------
+        Publication
+            The publication.
+        """
+
+        return cls(**{f: details[f] for f in FIELDS if f in details})
+
+    def to_dict(self):
+        """Return the details of the publication as a dictionary, which can be serialized as JSON.
+
+        Returns
+        -------
+        dict
+            Dictionary of field names and values.
+        """
+
+        return {f: getattr(self, f) for f in FIELDS}
+
+    def __getitem__(self, key):
+        if key not in _FIELD_SET:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        if key not in _FIELD_SET:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __contains__(self, key):
+        return key in _FIELD_SET and getattr(self, key) is not None
+
+    def get(self, key, default=None):
+        value = getattr(self, key) if key in _FIELD_SET else None
+        return default if value is None else value
+
+    def setdefault(self, key, default=None):
+        if key not in _FIELD_SET:
+            raise KeyError(key)
+        if getattr(self, key) is None:
+            setattr(self, key, default)
+        return getattr(self, key)
+
+
+# names of the fields of a publication, in their order
+FIELDS = tuple(f.name for f in dataclasses.fields(Publication))
+_FIELD_SET = frozenset(FIELDS)
+
+# types of the fields of a publication, ignoring None
+FIELD_TYPES = {
+    f.name: next(t for t in typing.get_args(f.type) or (f.type,) if t is not type(None))
+    for f in dataclasses.fields(Publication)
+}
@@ -1,27 +1,48 @@
 import collections
 import datetime
-import io
+import functools
 import os
 import re
+import shutil
 import smtplib
+import tempfile
+import threading
 import time
 from typing import Annotated
 
-import xlsxwriter
 import requests
-import json
 
-from email import encoders
-from email.mime.base import MIMEBase
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
+from html import escape as html_escape, unescape
 from urllib.parse import urlencode, quote
 
-from bs4 import BeautifulSoup
 import typer
 
 from pubquery import config
 from pubquery.ads_queries import ADSQueries
+from pubquery.analytics import add_derived_columns
+from pubquery.bibcode_store import BibcodeStore
+from pubquery.cache import ADS_ENRICHMENT_TTL, ResponseCache
+from pubquery.checkpoint import Checkpoint
+from pubquery.delivery import plan_messages, send_message_file, write_message
+from pubquery.exporters import EXPORTERS, SPILL_SIZE, ExportFormat, XlsxExporter
+from pubquery.instrumentation import (
+    RequestStats,
+    StageTimes,
+    latest_run_report,
+    report_summary,
+    run_report,
+    save_run_report,
+)
+from pubquery.pipeline import batched, run_pipeline
+from pubquery.quota import (
+    ADSQuota,
+    QuotaExceededError,
+    estimate_enrichment_requests,
+    estimate_search_requests,
+)
+from pubquery.retry import RetryPolicy
 from pubquery.wos_queries import WoSQueries
 
 
@@ -43,41 +64,35 @@ def ignore_tmp_bibcodes(bibcodes):
 
 
 def previously_found_bibcodes():
-    """Return the list of bibcodes found in previous searches.
+    """Return the set of bibcodes found in previous searches.
 
-    The previously found publications are stored as bibcode in a file, whose path is set as PREVIOUS_BIBCODES_FILE in
-    the configuration file. If this file doesn't exist, it is created first. If it cannot be created, an exception is
-    raised.
+    The previously found publications are stored as bibcodes in a database, whose path is set as
+    PREVIOUS_BIBCODES_FILE in the configuration file. If this database doesn't exist, it is created first. If it
+    cannot be created, an exception is raised.
 
     Returns
     -------
-    list
-        List of publications found in a previous search.
+    set of str
+        Bibcodes of publications found in a previous search.
     """
 
-    # create the file for storing previously found bibcodes, if need be
-    _ensure_previously_recorded_file_exists()
+    with BibcodeStore(config.PREVIOUS_BIBCODES_FILE) as store:
+        return store.bibcodes()
 
-    with open(config.PREVIOUS_BIBCODES_FILE) as f:
-        return [line.strip() for line in f.readlines()]
 
+def record_found_bibcodes(bibcodes):
+    """Record bibcodes as found, so that they are recognised by later searches.
 
-def _ensure_previously_recorded_file_exists():
-    """Create the file for storing previously found bibcodes, if it doesn't exist yet.
+    All the bibcodes are recorded in a single transaction.
 
-    If the file cannot be created an exception is raised.
+    Params
+    ------
+    bibcodes : iterable of str
+        Bibcodes to record.
     """
 
-    if not os.path.isfile(config.PREVIOUS_BIBCODES_FILE):
-        with open(config.PREVIOUS_BIBCODES_FILE, "w") as f:
-            f.close()
-
-    # check whether the file could be created
-    if not os.path.isfile(config.PREVIOUS_BIBCODES_FILE):
-        raise IOError(
-            "The file for storing previously found bibcodes could not be created: "
-            + config.PREVIOUS_BIBCODES_FILE
-        )
+    with BibcodeStore(config.PREVIOUS_BIBCODES_FILE) as store:
+        store.add(bibcodes)
 
 
 def publications_spreadsheet(publications, columns):
@@ -87,29 +102,57 @@ def publications_spreadsheet(publications, columns):
     ------
     publications : list
         Publications.
-    columns : list of str
-        Columns to include in the spreadsheet.
+    columns : dict
+        Dictionary of the keys of the details to include and the column names, as returned by spreadsheet_columns.
 
     Returns
     -------
-    io.BytesIO
+    file object
         Spreadsheet with the publication details.
 
     """
-    out = io.BytesIO()
-    workbook = xlsxwriter.Workbook(out)
+    exporter = XlsxExporter(columns)
+    for p in publications:
+        exporter.write(p)
+    return exporter.close()
+
+
+def save_export(attachment, directory, from_date, to_date):
+    """Save an exported publication list in a directory.
 
-    worksheet = workbook.add_worksheet()
-    for row, p in enumerate(publications):
-        for col, c in enumerate(columns):
-            worksheet.write(row, col, p.get(c, ""))
+    The file is named after the queried date range, such as publications_2025-01_2025-03.xlsx, and an existing file
+    of the same name is replaced. The content of the attachment is rewound afterwards, so that it can still be sent.
 
-    workbook.close()
+    Params
+    ------
+    attachment : dict
+        The exported file, as a dictionary with the file name ("name") and content ("content").
+    directory : str
+        Directory for the file. It is created if need be.
+    from_date : datetime.date
+        Start date of the queried date range.
+    to_date : datetime.date
+        End date of the queried date range.
 
-    # rewind the buffer
-    out.seek(0)
+    Returns
+    -------
+    str
+        Path of the saved file.
+    """
 
-    return out
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(
+        directory,
+        "publications_{from_date}_{to_date}{extension}".format(
+            from_date=from_date.strftime("%Y-%m"),
+            to_date=to_date.strftime("%Y-%m"),
+            extension=os.path.splitext(attachment["name"])[1],
+        ),
+    )
+    with open(path, "wb") as f:
+        shutil.copyfileobj(attachment["content"], f)
+    attachment["content"].seek(0)
+    return path
 
 
 def spreadsheet_columns():
@@ -156,7 +199,24 @@ def spreadsheet_columns():
     return columns
 
 
-def send_mails(spreadsheets, columns):
+def send_mails(spreadsheets, columns, summary=None):
+    """Email the spreadsheets (or other exported files) to the librarians.
+
+    Large attachments are zipped, and the attachments are distributed over as many emails as the maximum email size
+    (MAX_EMAIL_SIZE in the configuration) requires. An attachment which is too large for an email even when zipped is
+    split by publication year (see delivery.plan_messages). All emails are sent over the same SMTP connection, and
+    every email is written to a temporary file and streamed to the server from there.
+
+    Params
+    ------
+    spreadsheets : list of dict
+        The attachments, as dictionaries with the file name ("name"), the content as a file object ("content") and,
+        optionally, the MIME type ("mime_type").
+    columns : dict
+        Dictionary of column keys and names, as returned by spreadsheet_columns.
+    summary : str
+        Summary of the run to include in the email. No summary is included if this is None.
+    """
     column_explanation = "\n".join(
         [
             chr(ord("A") + i) + " - " + columns[key] + "<br>"
@@ -164,197 +224,622 @@ def send_mails(spreadsheets, columns):
         ]
     )
 
-    outer = MIMEMultipart()
-    outer["Subject"] = "Publications Query Results"
-    outer["To"] = ", ".join(config.LIBRARIAN_EMAIL_ADDRESSES)
-    outer["From"] = config.FROM_EMAIL_ADDRESS
-    outer.preamble = "You will not see this in a MIME-aware mail reader.\n"
+    messages = plan_messages(spreadsheets, config.MAX_EMAIL_SIZE, columns=columns)
+    with smtplib.SMTP(config.SMTP_SERVER, config.SMTP_PORT) as s:
+        for i, attachments in enumerate(messages):
+            subject = "Publications Query Results"
+            parts = ""
+            if len(messages) > 1:
+                subject += " ({0} of {1})".format(i + 1, len(messages))
+                parts = (
+                    "\n<p>As the results are too large for a single email, they are sent in {0} emails. This is "
+                    "email {1}.</p>\n".format(len(messages), i + 1)
+                )
 
-    body = MIMEMultipart("alternative")
-    html = """<p>Dear Librarian,</p>
+            body = MIMEMultipart("alternative")
+            html = """<p>Dear Librarian,</p>
 
 <p>Please find attached the results for the publications query.</p>
-
+{parts}
 <p>{column_explanation}</p>
-
+{summary}
 <p>Kind regards,</p>
 
 <p>Your Friendly Publications Query Script</p>""".format(
-        column_explanation=column_explanation
-    )
-    text = re.sub("<[^>]+>", "", html)
+                parts=parts,
+                column_explanation=column_explanation,
+                summary=(
+                    "\n<h3>Run summary</h3>\n\n<pre>{0}</pre>\n".format(
+                        html_escape(summary)
+                    )
+                    if summary
+                    else ""
+                ),
+            )
+            text = unescape(re.sub("<[^>]+>", "", html))
+
+            body.attach(MIMEText(text, "plain"))
+            body.attach(MIMEText(html, "html"))
+
+            headers = {
+                "Subject": subject,
+                "To": ", ".join(config.LIBRARIAN_EMAIL_ADDRESSES),
+                "From": config.FROM_EMAIL_ADDRESS,
+            }
+            with tempfile.SpooledTemporaryFile(max_size=SPILL_SIZE) as message:
+                size = write_message(message, headers, body, attachments)
+                print(
+                    "Sending email {0} of {1} ({2:.2f} MB) with {3}".format(
+                        i + 1,
+                        len(messages),
+                        size / 1e6,
+                        ", ".join(a["name"] for a in attachments) or "no attachments",
+                    )
+                )
+                send_message_file(
+                    s,
+                    config.FROM_EMAIL_ADDRESS,
+                    config.LIBRARIAN_EMAIL_ADDRESSES,
+                    message,
+                )
 
-    body.attach(MIMEText(text, "plain"))
-    body.attach(MIMEText(html, "html"))
 
-    outer.attach(body)
+# maximum number of retries of raw requests to the ADS API
+ADS_MAX_RETRIES = 3
 
-    for spreadsheet in spreadsheets:
-        msg = MIMEBase("application", "application/vnd.ms-excel")
-        read = spreadsheet["content"].read()
-        msg.set_payload(read)
-        encoders.encode_base64(msg)
-        msg.add_header(
-            "Content-Disposition", "attachment", filename=spreadsheet["name"]
-        )
-        outer.attach(msg)
 
-    with smtplib.SMTP(config.SMTP_SERVER, config.SMTP_PORT) as s:
-        s.sendmail(
-            config.FROM_EMAIL_ADDRESS,
-            config.LIBRARIAN_EMAIL_ADDRESSES,
-            outer.as_string(),
-        )
+def _get(url, headers, request_stats=None):
+    # make a GET request, raising an exception if it fails
+    start = time.perf_counter()
+    response = requests.get(url, headers=headers)
+    if request_stats is not None:
+        request_stats.add(len(response.content), time.perf_counter() - start)
+    response.raise_for_status()
+    return response
 
 
-def get_authors_and_affiliations(publication):
-    """Return lists of authors and affiliations of a given publication.
+def get_authors_and_affiliations(
+    publications,
+    batch_size=50,
+    cache=None,
+    quota=None,
+    request_stats=None,
+    retry_policy=None,
+):
+    """Query the lists of authors and affiliations of publications.
+
+    The publications are queried in batches, with one ADS request per batch. Publications whose details are in the
+    cache are not queried. The author and affiliation details of every publication dictionary are updated in place.
 
     Params
     ------
-    publication: publication dictionary
+    publications : list of publication dictionaries
+    batch_size : int
+        Maximum number of publications to query per request.
+    cache : ResponseCache
+        Cache for the query results. No cache is used if this is None.
+    quota : ADSQuota
+        Tracker for the ADS API quota. The quota is not tracked if this is None.
+    request_stats : RequestStats
+        Statistics to which the requests are added. No statistics are kept if this is None.
+    retry_policy : RetryPolicy
+        Retry policy for the requests, which counts the retries. A new policy with ADS_MAX_RETRIES retries is used if
+        this is None.
 
     Returns
     -------
-    lists
-        Lists of authors and affiliations.
+    dict
+        Dictionary of bibcodes and tuples of the corresponding lists of authors and affiliations.
     """
-    # query authors and affiliations
+    if retry_policy is None:
+        retry_policy = RetryPolicy(max_retries=ADS_MAX_RETRIES)
     url_template = "https://ui.adsabs.harvard.edu/v1/search/query?{}"
-    query_params = {
-        "fl": "aff, author",
-        "q": "identifier:{0}".format(publication["bibcode"]),
-        "rows": 1,
-    }
-    query_url = url_template.format(urlencode(query_params, quote_via=quote))
-
-    max_retries = 3
-    retries = 0
-    while retries <= max_retries:
-        try:
-            response = requests.get(
-                query_url, headers={"Authorization": "Bearer " + config.ADS_API_KEY}
+
+    authors_and_affiliations = dict()
+    if cache is not None:
+        uncached = []
+        for p in publications:
+            cached = cache.get("ads_enrichment", p["bibcode"])
+            if cached is None:
+                uncached.append(p)
+                continue
+            authors, affiliations = cached
+            p["author"] = authors
+            p["aff"] = affiliations
+            authors_and_affiliations[p["bibcode"]] = (authors, affiliations)
+        publications = uncached
+
+    # make sure the quota suffices before starting
+    if quota is not None:
+        quota.check(-(-len(publications) // batch_size))
+
+    for i in range(0, len(publications), batch_size):
+        batch = publications[i : i + batch_size]
+        print(
+            f"Querying authors and affiliations for publications {i + 1} to {i + len(batch)} of {len(publications)}"
+        )
+
+        # query authors and affiliations
+        identifiers = " OR ".join('"{0}"'.format(p["bibcode"]) for p in batch)
+        query_params = {
+            "fl": "aff, author, bibcode, identifier",
+            "q": "identifier:({0})".format(identifiers),
+            "rows": len(batch),
+        }
+        query_url = url_template.format(urlencode(query_params, quote_via=quote))
+
+        if quota is not None:
+            quota.acquire()
+        response = retry_policy.call(
+            _get,
+            query_url,
+            headers={"Authorization": "Bearer " + config.ADS_API_KEY},
+            request_stats=request_stats,
+        )
+        if quota is not None:
+            quota.update(response.headers)
+
+        content = response.json()
+
+        # a publication may have been requested by an alternative bibcode
+        query_results = dict()
+        for doc in content["response"]["docs"]:
+            for identifier in [doc["bibcode"], *doc.get("identifier", [])]:
+                query_results[identifier] = doc
+
+        for p in batch:
+            if p["bibcode"] not in query_results:
+                raise ValueError(
+                    "No authors and affiliations found for publication " + p["bibcode"]
+                )
+            query_result = query_results[p["bibcode"]]
+
+            p["author"] = query_result["author"]
+            p["aff"] = query_result["aff"]
+
+            authors_and_affiliations[p["bibcode"]] = (
+                query_result["author"],
+                query_result["aff"],
             )
-            response.raise_for_status()
-            break
-        except requests.exceptions.HTTPError:
-            print("Retrying...")
-            retries += 1
-            if retries > max_retries:
-                raise
-
-    soup = BeautifulSoup(response.text, "html.parser")
-    content = json.loads(soup.text)
-    query_result = content["response"]["docs"][0]
-
-    publication["author"] = ", ".join(query_result["author"])
-    publication["aff"] = "| ".join(query_result["aff"])
-
-    return query_result["author"], query_result["aff"]
-
-
-def check_doi_indexed_in_wos(publication, wos_queries):
-    # check whether the DOI is indexed in the Web of Science (WoS)
-    doi = (
-        publication["doi"][0]
-        if publication["doi"] and len(publication["doi"]) > 0
-        else None
+            if cache is not None:
+                cache.set(
+                    "ads_enrichment",
+                    p["bibcode"],
+                    [query_result["author"], query_result["aff"]],
+                    ADS_ENRICHMENT_TTL,
+                )
+
+    return authors_and_affiliations
+
+
+def enrich_authors_and_affiliations(
+    publications,
+    batch_size=50,
+    refetch=False,
+    cache=None,
+    quota=None,
+    request_stats=None,
+    reused=None,
+    retry_policy=None,
+):
+    """Return lists of authors and affiliations of publications, querying ADS only where necessary.
+
+    The author and affiliation lists already retrieved by ADSQueries are used as they are, unless either of them is
+    missing or they differ in length. The remaining publications are queried in batches (see
+    get_authors_and_affiliations). The author and affiliation details of every publication dictionary are updated in
+    place.
+
+    Params
+    ------
+    publications : list of publication dictionaries
+    batch_size : int
+        Maximum number of publications to query per request.
+    refetch : bool
+        Whether to query ADS for all publications, irrespective of the details already retrieved.
+    cache : ResponseCache
+        Cache for the query results. No cache is used if this is None.
+    quota : ADSQuota
+        Tracker for the ADS API quota. The quota is not tracked if this is None.
+    request_stats : RequestStats
+        Statistics to which the requests are added. No statistics are kept if this is None.
+    reused : set
+        Set to which the bibcodes of the publications whose authors and affiliations are reused are added.
+    retry_policy : RetryPolicy
+        Retry policy for the requests (see get_authors_and_affiliations).
+
+    Returns
+    -------
+    dict
+        Dictionary of bibcodes and tuples of the corresponding lists of authors and affiliations.
+    """
+    authors_and_affiliations = dict()
+    incomplete = []
+    for p in publications:
+        authors = p.get("author")
+        affiliations = p.get("aff")
+        if (
+            refetch
+            or not authors
+            or not affiliations
+            or len(authors) != len(affiliations)
+        ):
+            incomplete.append(p)
+            continue
+
+        authors_and_affiliations[p["bibcode"]] = (authors, affiliations)
+
+    if reused is not None:
+        reused.update(authors_and_affiliations)
+    authors_and_affiliations.update(
+        get_authors_and_affiliations(
+            incomplete,
+            batch_size=batch_size,
+            cache=cache,
+            quota=quota,
+            request_stats=request_stats,
+            retry_policy=retry_policy,
+        )
     )
-    publication["doi_in_wos"] = wos_queries.is_doi_indexed(doi).value
 
+    return authors_and_affiliations
 
-def get_south_african_affiliations(affiliations):
-    """Return string of South African institutions in a publication.
+
+def check_dois_indexed_in_wos(publications, wos_queries, batch_size=50):
+    """Add whether the DOIs of publications are indexed in the Web of Science (WoS).
+
+    The (first) DOI of every publication is checked, and the result is stored as "doi_in_wos" in the publication
+    dictionary.
 
     Params
     ------
-    affiliations : list of affiliations in a publication separated by a semicolon
+    publications : list of publication dictionaries
+    wos_queries : WoSQueries
+        The queries to use for checking the DOIs.
+    batch_size : int
+        Maximum number of DOIs to check per WoS request.
+    """
+    dois = [p["doi"][0] if p["doi"] and len(p["doi"]) > 0 else None for p in publications]
+    statuses = wos_queries.are_dois_indexed(dois, batch_size=batch_size)
+    for p, doi in zip(publications, dois):
+        p["doi_in_wos"] = statuses[doi].value
+
+
+# number of publications to process between saving checkpoints
+CHECKPOINT_INTERVAL = 100
+
+
+def ads_searches():
+    """Return the ADS searches for publications.
 
     Returns
     -------
-    str
-        South African institutions separated by '|'.
+    list of tuple
+        Tuples of an ADS field and the list of terms to search for in that field.
     """
-    south_african_affiliations = []
-    for k, affiliation in enumerate(affiliations.split("; ")):
-        # add South African institutions
-        if "South Africa" in affiliation:
-            south_african_affiliations.append(affiliation)
-    return south_african_affiliations
 
+    return [
+        ("full", config.KEYWORDS),
+        ("author", list(config.AUTHORS.keys())),
+        ("aff", config.AFFILIATIONS),
+        ("aff", config.INSTITUTIONS),
+    ]
 
-def get_salt_partners(affiliations):
-    """Return string of South African Large Telescope (SALT) partner institutions in a publication.
+
+def expected_publications(months):
+    """Estimate the number of publications a run will find.
+
+    The estimate is based on the number of publications per month found by the latest run (whose report is in the
+    report directory set as REPORT_DIR in the configuration file). All the publications found are counted, including
+    those which an incremental run didn't report as they had been reported already.
 
     Params
     ------
-    affiliations : list of affiliations in a publication separated by a semicolon
+    months : int
+        Number of months in the queried date range.
 
     Returns
     -------
-    str
-        SALT partner institutions separated by '|'.
+    int
+        The estimated number of publications, or None if there is no report of a previous run.
+    """
+
+    report = latest_run_report(config.REPORT_DIR)
+    if report is None:
+        return None
+    from_date = datetime.date.fromisoformat(report["from_date"])
+    to_date = datetime.date.fromisoformat(report["to_date"])
+    report_months = 12 * (to_date.year - from_date.year) + to_date.month - from_date.month + 1
+    found = report.get("found", report["publications"])
+    return round(found / max(report_months, 1) * months)
+
+
+def check_ads_quota(
+    quota, queries, enrichment_batch_size=50, refetch=False, searches=None
+):
+    """Check whether the ADS API quota suffices for the searches and the queries for authors and affiliations.
+
+    The current quota is queried from ADS (which uses up one request), and the number of requests needed is
+    estimated. For the authors and affiliations, the number of publications is estimated from the latest run (see
+    expected_publications). As their authors and affiliations are usually reused from the search results, the queries
+    for them only count towards the minimum number of requests if they are refetched. A QuotaExceededError is raised
+    if the quota is insufficient for the minimum number of requests.
+
+    Params
+    ------
+    quota : ADSQuota
+        Tracker for the ADS API quota.
+    queries : ADSQueries
+        The queries to use for the searches.
+    enrichment_batch_size : int
+        Maximum number of publications whose authors and affiliations are queried per request.
+    refetch : bool
+        Whether the authors and affiliations of all publications are queried.
+    searches : int
+        Number of searches to run. All the searches are run if this is None.
     """
-    salt_partners = set()
-    for k, affiliation in enumerate(affiliations.split("; ")):
-        # add SALT partner institutions
-        if any(partner in affiliation for partner in config.SALT_PARTNERS):
-            salt_partners.add(affiliation)
+    quota.refresh()
+    if searches is None:
+        searches = len(queries.search_keys(ads_searches()))
+    minimum, maximum = estimate_search_requests(searches, queries.max_pages)
+    print(
+        f"The searches need between {minimum} and {maximum} ADS requests, "
+        f"and {quota.remaining} of {quota.limit} requests are left"
+    )
 
-    return salt_partners
+    publications = expected_publications(queries.last_month - queries.first_month + 1)
+    if publications is None:
+        print(
+            "The number of ADS requests for the authors and affiliations cannot be estimated, as there is no "
+            "report of a previous run"
+        )
+    else:
+        enrichment = estimate_enrichment_requests(publications, enrichment_batch_size)
+        print(
+            f"Querying the authors and affiliations of about {publications} publications needs up to "
+            f"{enrichment} more ADS requests"
+        )
+        maximum += enrichment
+        if refetch:
+            minimum += enrichment
+
+    quota.check(minimum)
+    if quota.remaining is not None and quota.remaining - maximum < quota.reserve:
+        print(
+            "Warning: The ADS API quota may run out if the searches find many results. The run will be stopped "
+            "if it does."
+        )
 
 
-def get_saao_authors(affiliations, authors):
-    """Return string of authors affiliated South African institutions.
+def select_publications(found, reported_bibcodes, counts, fulltext_done):
+    """Pipeline stage passing on every relevant publication found by the searches once.
+
+    Publications found by more than one search are passed on when they are found first. The keywords of later full
+    text search results for the same publication are added to the passed on publication, so that it may have to wait
+    for the full text searches to finish (see export_publications) before it is complete. ArXiv preprints,
+    publications in excluded journals and previously reported publications are not passed on.
 
     Params
     ------
-    affiliations : list of affiliations in a publication separated by a semicolon
+    found : iterable of tuple
+        Tuples of a publication and the list of keywords found in its full text, as yielded by ADSQueries.stream.
+    reported_bibcodes : set of str
+        Bibcodes of the publications which have been reported already.
+    counts : collections.Counter
+        Counter for the number of new ("new") and previously reported ("reported") publications.
+    fulltext_done : threading.Event
+        Event which is set once the results of all full text searches have been received.
 
     Returns
     -------
-    str
-        authors affiliated South African institutions separated by '|'.
+    iterable of Publication
+        The publications.
     """
-    saao_authors = set()
-    for k, affiliation in enumerate(affiliations.split("; ")):
-        # only authors within the SAOO would have SALT as an affiliation
-        saao_ins = ["SAAO", "South African Astronomical Observatory"]
-        if any(institution in affiliation for institution in saao_ins):
-            k = min(k, len(authors) - 1)
-            saao_authors.add(authors[k])
-    return saao_authors
+    excluded_journals = [journal.lower() for journal in config.EXCLUDED_JOURNALS]
+    seen = set()
+    # the lists of full text keywords of the passed on publications, by bibcode
+    fulltext_keywords = dict()
+    try:
+        for p, keywords in found:
+            if keywords is None and not fulltext_done.is_set():
+                fulltext_keywords.clear()
+                fulltext_done.set()
+            if p.bibcode in seen:
+                if keywords and p.bibcode in fulltext_keywords:
+                    known = fulltext_keywords[p.bibcode]
+                    known.extend(k for k in keywords if k not in known)
+                continue
+            seen.add(p.bibcode)
+            if keywords:
+                p.fulltext_keywords.extend(keywords)
+
+            # exclude arXiv preprints and certain journals
+            if "arXiv" in p.bibcode or p.pub.lower() in excluded_journals:
+                continue
+
+            if p.bibcode in reported_bibcodes:
+                counts["reported"] += 1
+                continue
+
+            counts["new"] += 1
+            if not fulltext_done.is_set():
+                fulltext_keywords[p.bibcode] = p.fulltext_keywords
+            yield p
+    finally:
+        fulltext_done.set()
+
+
+def enrich_publications(
+    publications,
+    authors_and_affiliations,
+    checkpoint,
+    batch_size=50,
+    reused=None,
+    **kwargs,
+):
+    """Pipeline stage adding the lists of authors and affiliations to publications.
 
+    The publications are enriched in batches (see enrich_authors_and_affiliations), and the progress is saved in
+    the checkpoint. Publications whose authors and affiliations are known already are not queried again.
 
-def count_authors_affiliated_to_sa_ins(affiliations, authors):
-    """Return counts of authors affiliated South African institutions.
+    Only the authors and affiliations queried from ADS are saved, as those reused from the search results are saved
+    with the search results anyway.
 
     Params
     ------
-    affiliations : list of affiliations in a publication separated by a semicolon
-    authors : list of authors in a publication
+    publications : iterable of publication dictionaries
+    authors_and_affiliations : dict
+        Dictionary of bibcodes and the known lists of authors and affiliations. It is updated with the new results.
+    checkpoint : Checkpoint
+        Checkpoint for saving the progress.
+    batch_size : int
+        Maximum number of publications to query per request.
+    reused : set
+        Set to which the bibcodes of the publications whose authors and affiliations are reused from the search
+        results are added.
+    kwargs : dict
+        Further arguments for enrich_authors_and_affiliations.
 
     Returns
     -------
-    int
-        counts of authors affiliated South African institutions
+    iterable of publication dictionaries
+        The enriched publications.
+    """
+    unsaved = dict()
+    for batch in batched(publications, batch_size):
+        remaining = [p for p in batch if p["bibcode"] not in authors_and_affiliations]
+        if remaining:
+            batch_reused = set()
+            enriched = enrich_authors_and_affiliations(
+                remaining, batch_size=batch_size, reused=batch_reused, **kwargs
+            )
+            authors_and_affiliations.update(enriched)
+            unsaved.update(
+                (bibcode, details)
+                for bibcode, details in enriched.items()
+                if bibcode not in batch_reused
+            )
+            if reused is not None:
+                reused.update(batch_reused)
+            if len(unsaved) >= CHECKPOINT_INTERVAL:
+                checkpoint.update("enrichment", unsaved)
+                unsaved = dict()
+        for p in batch:
+            p["author"], p["aff"] = authors_and_affiliations[p["bibcode"]]
+            yield p
+    if unsaved:
+        checkpoint.update("enrichment", unsaved)
+
+
+# number of publications whose derived details are computed together
+CLASSIFICATION_BATCH_SIZE = 1000
+
+
+def classify_publications(publications, batch_size=CLASSIFICATION_BATCH_SIZE):
+    """Pipeline stage adding the derived details to publications.
+
+    The details are computed for batches of publications at a time (see analytics.add_derived_columns).
+
+    Params
+    ------
+    publications : iterable of publication dictionaries
+    batch_size : int
+        Number of publications per batch.
+
+    Returns
+    -------
+    iterable of publication dictionaries
+        The classified publications.
     """
-    authors_aff_to_sa_inst = set()
-    for affiliation in affiliations:
-        for k, ins in enumerate(affiliation.split("; ")):
-            if "South Africa" in affiliation:
-                k = min(k, len(authors) - 1)
-                authors_aff_to_sa_inst.add(authors[k])
+    for batch in batched(publications, batch_size):
+        add_derived_columns(batch)
+        yield from batch
+
+
+def check_publications_in_wos(
+    publications, wos_queries, doi_in_wos, checkpoint, batch_size=50
+):
+    """Pipeline stage adding whether the DOIs of publications are indexed in the Web of Science (WoS).
 
-    return len(authors_aff_to_sa_inst)
+    The DOIs are checked in groups of as many batches as the WoS queries can run concurrently, and the progress is
+    saved in the checkpoint. Publications whose status is known already are not checked again.
 
+    Params
+    ------
+    publications : iterable of publication dictionaries
+    wos_queries : WoSQueries
+        The queries to use for checking the DOIs.
+    doi_in_wos : dict
+        Dictionary of bibcodes and known WoS statuses. It is updated with the new results.
+    checkpoint : Checkpoint
+        Checkpoint for saving the progress.
+    batch_size : int
+        Maximum number of DOIs to check per WoS request.
+
+    Returns
+    -------
+    iterable of publication dictionaries
+        The publications.
+    """
+    unsaved = dict()
+    for group in batched(publications, batch_size * wos_queries.max_workers):
+        remaining = [p for p in group if p["bibcode"] not in doi_in_wos]
+        if remaining:
+            print(f"Querying WoS for {len(remaining)} publications")
+            check_dois_indexed_in_wos(remaining, wos_queries, batch_size=batch_size)
+            statuses = {p["bibcode"]: p["doi_in_wos"] for p in remaining}
+            doi_in_wos.update(statuses)
+            unsaved.update(statuses)
+            if len(unsaved) >= CHECKPOINT_INTERVAL:
+                checkpoint.update("wos", unsaved)
+                unsaved = dict()
+        for p in group:
+            p["doi_in_wos"] = doi_in_wos[p["bibcode"]]
+            yield p
+    if unsaved:
+        checkpoint.update("wos", unsaved)
+
+
+def export_publications(publications, exporters, fulltext_done):
+    """Pipeline stage writing publications to the exported files (such as a spreadsheet).
+
+    As a publication may still be found by another full text search, the publications are held back until the results
+    of all full text searches have been received (see select_publications). After that every publication is written
+    as soon as it arrives, so that the exported files are complete once the last publication has passed. The rows are
+    in the order in which the publications are found.
+
+    Only the bibcodes of the publications are passed on, so that the publications needn't be kept in memory once they
+    have been written.
 
-def modify_list_contents(publication):
-    # make some content more amenable to humans and xslxwriter alike
-    list_value_columns = ["title", "doi", "fulltext_keywords", "keyword", "page"]
-    for c in list_value_columns:
-        if c in publication and publication[c]:
-            publication[c] = ", ".join(publication[c])
+    Params
+    ------
+    publications : iterable of Publication
+    exporters : list of Exporter
+        The exporters for the files.
+    fulltext_done : threading.Event
+        Event which is set once the results of all full text searches have been received.
+
+    Returns
+    -------
+    iterable of str
+        The bibcodes of the publications.
+    """
+
+    def write(p):
+        for exporter in exporters:
+            exporter.write(p)
+        return p["bibcode"]
+
+    held = []
+    for p in publications:
+        if not fulltext_done.is_set():
+            held.append(p)
+            continue
+        for q in held:
+            yield write(q)
+        held = []
+        yield write(p)
+    for p in held:
+        yield write(p)
 
 
 def main(
@@ -374,107 +859,318 @@ def main(
             help="End date (yyyy-mm-dd, inclusive). While a full date must be specified, only the year and month are used.",
         ),
     ],
+    workers: Annotated[
+        int,
+        typer.Option(
+            "--workers",
+            "-w",
+            min=1,
+            help="Maximum number of ADS searches to run concurrently.",
+        ),
+    ] = 4,
+    rows: Annotated[
+        int,
+        typer.Option(
+            "--rows",
+            min=1,
+            max=2000,
+            help="Number of results per page of an ADS search.",
+        ),
+    ] = 500,
+    enrichment_batch_size: Annotated[
+        int,
+        typer.Option(
+            "--enrichment-batch-size",
+            min=1,
+            max=2000,
+            help="Number of publications whose authors and affiliations are queried per ADS request.",
+        ),
+    ] = 50,
+    wos_batch_size: Annotated[
+        int,
+        typer.Option(
+            "--wos-batch-size",
+            min=1,
+            max=100,
+            help="Number of DOIs checked per Web of Science request. Use 1 to check every DOI individually.",
+        ),
+    ] = 50,
+    refetch_authors: Annotated[
+        bool,
+        typer.Option(
+            "--refetch-authors",
+            help="Query the authors and affiliations of every publication again, rather than reusing those found by the search.",
+        ),
+    ] = False,
+    no_cache: Annotated[
+        bool,
+        typer.Option(
+            "--no-cache",
+            help="Neither read nor store cached ADS and Web of Science results.",
+        ),
+    ] = False,
+    refresh: Annotated[
+        bool,
+        typer.Option(
+            "--refresh",
+            help="Ignore cached ADS and Web of Science results, but store the new results in the cache.",
+        ),
+    ] = False,
+    incremental: Annotated[
+        bool,
+        typer.Option(
+            "--incremental",
+            "-i",
+            help="Only report publications which have not been reported by a previous run.",
+        ),
+    ] = False,
+    combine_queries: Annotated[
+        bool,
+        typer.Option(
+            "--combine-queries",
+            help="Combine the search terms into a few OR-combined ADS queries rather than searching for every term separately.",
+        ),
+    ] = False,
+    verify_keywords: Annotated[
+        bool,
+        typer.Option(
+            "--verify-keywords",
+            help="With combined queries, search for the keywords which aren't in the highlighted text of a publication, so that all its keywords are found.",
+        ),
+    ] = False,
+    quota_check: Annotated[
+        bool,
+        typer.Option(
+            "--quota-check/--no-quota-check",
+            help="Check before starting whether the ADS API quota suffices for the searches.",
+        ),
+    ] = True,
+    resume: Annotated[
+        bool,
+        typer.Option(
+            "--resume",
+            help="Resume a previous run for the same date range which failed, reusing its saved progress.",
+        ),
+    ] = False,
+    backfill: Annotated[
+        bool,
+        typer.Option(
+            "--backfill",
+            help="Search the date range in shards, so that searches over long date ranges aren't truncated.",
+        ),
+    ] = False,
+    shard_months: Annotated[
+        int,
+        typer.Option(
+            "--shard-months",
+            min=1,
+            help="Number of months per shard when backfilling. Shards with too many results are split further.",
+        ),
+    ] = 12,
+    formats: Annotated[
+        list[ExportFormat],
+        typer.Option(
+            "--format",
+            "-f",
+            help="Format of the publication list attached to the email. Use the option repeatedly for several formats.",
+        ),
+    ] = [ExportFormat.XLSX],
+    export_dir: Annotated[
+        str,
+        typer.Option(
+            "--export-dir",
+            help="Directory in which to save the publication lists, in addition to attaching them to the email.",
+        ),
+    ] = None,
+    summary: Annotated[
+        bool,
+        typer.Option(
+            "--report-summary",
+            help="Include a summary of the run report (timings, requests and slowest searches) in the email.",
+        ),
+    ] = False,
 ):
     """
     Search for SAAO and SALT publications.
     """
-    queries = ADSQueries(from_date=start.date(), to_date=end.date())
-    wos_queries = WoSQueries()
-
-    by_fulltext_keywords = queries.by_fulltext_keywords(config.KEYWORDS)
-    by_authors = queries.by_authors(config.AUTHORS.keys())
-    by_affiliations = queries.by_affiliations(config.AFFILIATIONS)
-    by_institutions = queries.by_affiliations(config.INSTITUTIONS)
-
-    all_queries = {
-        **by_fulltext_keywords,
-        **by_authors,
-        **by_affiliations,
-        **by_institutions,
-    }
-
-    # make sure the keywords are present
-    for b in by_fulltext_keywords:
-        all_queries[b]["fulltext_keywords"] = by_fulltext_keywords[b][
-            "fulltext_keywords"
-        ]
-
-    # now that we have collected everything, we can flatten our map to a list
-    publications = [all_queries[b] for b in all_queries.keys()]
-    publications.sort(key=lambda p: p["bibcode"])
-
-    # exclude arXiv preprints
-    publications = [p for p in publications if "arXiv" not in p["bibcode"]]
-
-    # exclude certain journals
-    excluded_journals = [journal.lower() for journal in config.EXCLUDED_JOURNALS]
-    publications = [
-        p for p in publications if p["pub"].lower() not in excluded_journals
-    ]
+    started = datetime.datetime.now().astimezone()
+    stage_times = StageTimes()
+    enrichment_stats = RequestStats()
+    enrichment_retry_policy = RetryPolicy(max_retries=ADS_MAX_RETRIES)
+    enrichment_reused = set()
+    cache = None if no_cache else ResponseCache(config.CACHE_FILE, refresh=refresh)
+
+    checkpoint = Checkpoint(config.CHECKPOINT_DIR, start.date(), end.date())
+    if not resume:
+        checkpoint.clear()
+
+    quota = ADSQuota()
+    queries = ADSQueries(
+        from_date=start.date(),
+        to_date=end.date(),
+        rows=rows,
+        max_workers=workers,
+        cache=cache,
+        quota=quota,
+        combine_terms=combine_queries,
+        verify_keywords=verify_keywords,
+        shard_months=shard_months if backfill else None,
+    )
+    wos_queries = WoSQueries(cache=cache)
+
+    def report(bibcodes):
+        return run_report(
+            from_date=start.date(),
+            to_date=end.date(),
+            started=started,
+            publications=len(bibcodes),
+            stage_times=stage_times,
+            queries=queries,
+            enrichment_stats=enrichment_stats,
+            enrichment_retries=enrichment_retry_policy.retries,
+            enrichment_reused=len(enrichment_reused),
+            found=counts["new"] + counts["reported"],
+            wos_queries=wos_queries,
+            cache=cache,
+        )
 
     try:
-        for i, p in enumerate(publications):
-            # add refereed status
-            p["refereed"] = p["property"] and "REFEREED" in p["property"]
-
-            # add ADS url
-            p["ads_url"] = "https://ui.adsabs.harvard.edu/#abs/{0}/abstract".format(
-                p["bibcode"]
+        # searches which finished in a previous run aren't run again
+        searches = ads_searches()
+        finished = checkpoint.get("search", dict())
+        remaining = [k for k in queries.search_keys(searches) if k not in finished]
+        if finished:
+            print(
+                f"Resuming with the results of {len(finished)} searches of the previous run"
             )
+        if quota_check and remaining:
+            check_ads_quota(
+                quota,
+                queries,
+                enrichment_batch_size=enrichment_batch_size,
+                refetch=refetch_authors,
+                searches=len(remaining),
+            )
+        found = queries.stream(
+            searches,
+            finished=finished,
+            on_finished=lambda key, results: checkpoint.update("search", {key: results}),
+        )
+        found = stage_times.source("search", found)
 
+        # stream the publications from the searches through the various stages
+        reported_bibcodes = previously_found_bibcodes() if incremental else set()
+        counts = collections.Counter()
+        fulltext_done = threading.Event()
+        columns = spreadsheet_columns()
+        exporters = [EXPORTERS[f](columns) for f in dict.fromkeys(formats)]
+        # the publications are written to the exported files as they pass, so only their bibcodes are kept
+        bibcodes = list(
+            run_pipeline(
+                found,
+                stage_times.stage(
+                    "selection",
+                    functools.partial(
+                        select_publications,
+                        reported_bibcodes=reported_bibcodes,
+                        counts=counts,
+                        fulltext_done=fulltext_done,
+                    ),
+                ),
+                stage_times.stage(
+                    "enrichment",
+                    functools.partial(
+                        enrich_publications,
+                        authors_and_affiliations=checkpoint.get("enrichment", dict()),
+                        checkpoint=checkpoint,
+                        batch_size=enrichment_batch_size,
+                        reused=enrichment_reused,
+                        refetch=refetch_authors,
+                        cache=cache,
+                        quota=quota,
+                        request_stats=enrichment_stats,
+                        retry_policy=enrichment_retry_policy,
+                    ),
+                ),
+                stage_times.stage("classification", classify_publications),
+                stage_times.stage(
+                    "wos",
+                    functools.partial(
+                        check_publications_in_wos,
+                        wos_queries=wos_queries,
+                        doi_in_wos=checkpoint.get("wos", dict()),
+                        checkpoint=checkpoint,
+                        batch_size=wos_batch_size,
+                    ),
+                ),
+                stage_times.stage(
+                    "export",
+                    functools.partial(
+                        export_publications,
+                        exporters=exporters,
+                        fulltext_done=fulltext_done,
+                    ),
+                ),
+            )
+        )
+        print(
+            f"Ran {len(queries.search_stats)} ADS searches, which found "
+            f"{sum(s['found'] for s in queries.search_stats)} and returned "
+            f"{sum(s['returned'] for s in queries.search_stats)} results"
+        )
+        print(
+            f"Reused authors and affiliations for {len(enrichment_reused)} publications "
+            f"({len(enrichment_reused)} refetches avoided)"
+        )
+        if queries.truncated:
             print(
-                f"Querying authors and affiliations for publication {i + 1} of {len(publications)}"
+                f"Warning: The results of {len(queries.truncated)} searches were truncated, so some publications may "
+                f"be missing:"
             )
-            authors, affiliations = get_authors_and_affiliations(p)
+            for q in queries.truncated:
+                print(f"    {q}")
 
-            # No. of authors on paper affiliated to a SA institution
-            p["no_of_authors_aff_to_SA_ins"] = count_authors_affiliated_to_sa_ins(
-                affiliations, authors
+        if incremental:
+            print(
+                f"Found {counts['new']} new and {counts['reported']} previously reported publications"
             )
-
-            # First author institution and SALT partner institutions
-            p["institute_of_first_author"] = affiliations[0]
-
-            saao_authors = set()
-            south_african_affiliations = set()
-            salt_partners = set()
-            for j, affiliation in enumerate(affiliations):
-
-                if len(get_south_african_affiliations(affiliation)) > 0:
-                    for aff in get_south_african_affiliations(affiliation):
-                        south_african_affiliations.add(aff)
-                if len(get_saao_authors(affiliation, authors)) > 0:
-                    for author in get_saao_authors(affiliation, authors):
-                        saao_authors.add(author)
-                if len(get_salt_partners(affiliation)) > 0:
-                    for partner in get_salt_partners(affiliation):
-                        salt_partners.add(partner)
-
-            # removes all empty elements from the list
-            p["authors_affiliated_with_SAAO"] = "; ".join(saao_authors)
-
-            p["SA_institutions"] = "; ".join(south_african_affiliations)
-
-            p["SALT_partners"] = "; ".join(salt_partners)
-
-            print(f"Querying WoS for publication {i + 1} of {len(publications)}")
-            check_doi_indexed_in_wos(p, wos_queries)
-            # avoid HTTP 429 Too Many Requests errors
-            time.sleep(1)
-
-            modify_list_contents(p)
+            if not bibcodes:
+                print("There are no new publications to report.")
+                checkpoint.clear()
+                report_file = save_run_report(report(bibcodes), config.REPORT_DIR)
+                print(f"Saved the run report as {report_file}")
+                return
+
+        attachments = [
+            dict(
+                name="all." + exporter.extension,
+                content=exporter.close(),
+                mime_type=exporter.mime_type,
+            )
+            for exporter in exporters
+        ]
+        if export_dir:
+            for attachment in attachments:
+                path = save_export(attachment, export_dir, start.date(), end.date())
+                print(f"Saved {path}")
 
         print(f"Sending email to librarians...")
-        columns = spreadsheet_columns()
-        send_mails(
-            [
-                dict(
-                    name="all.xlsx",
-                    content=publications_spreadsheet(publications, columns.keys()),
-                )
-            ],
-            columns,
-        )
+        with stage_times.timed("email"):
+            send_mails(
+                attachments,
+                columns,
+                summary=report_summary(report(bibcodes)) if summary else None,
+            )
+
+        # only now that the librarians have been sent the publications can they be considered reported
+        record_found_bibcodes(bibcodes)
+        checkpoint.clear()
+        report_file = save_run_report(report(bibcodes), config.REPORT_DIR)
+        print(f"Saved the run report as {report_file}")
+    except QuotaExceededError as err:
+        typer.echo(str(err), err=True)
+        typer.echo("Use the --resume option to continue the run later.", err=True)
+        raise typer.Exit(code=1)
     except requests.exceptions.HTTPError as err:
         # print(err)
         raise
@@ -0,0 +1,180 @@
+import datetime
+import threading
+
+import ads
+import requests
+
+from pubquery import config
+
+
+class QuotaExceededError(Exception):
+    """Raised if a run would exceed the ADS API quota."""
+
+    pass
+
+
+class ADSQuota:
+    """Tracker for the daily ADS API quota.
+
+    The remaining quota is read from the X-RateLimit-* headers of ADS responses, both for requests made with the ads
+    library and for raw requests. Between responses, every request is assumed to use up one unit of the quota.
+
+    Before a request is made, acquire should be called. It raises a QuotaExceededError if the remaining quota has
+    dropped to the reserve, so that a run is stopped with a clear message rather than by a failing request.
+
+    The tracker may be used from multiple threads.
+
+    Params
+    ------
+    reserve : int
+        Number of requests to keep in reserve.
+    """
+
+    SEARCH_URL = "https://ui.adsabs.harvard.edu/v1/search/query"
+
+    def __init__(self, reserve=10):
+        self.reserve = reserve
+        self.limit = None
+        self.remaining = None
+        self.reset = None
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        """Query ADS for the current quota.
+
+        This makes a minimal search request, which uses up one unit of the quota.
+        """
+
+        response = requests.get(
+            ADSQuota.SEARCH_URL,
+            params={"q": "bibstem:ApJ", "fl": "bibcode", "rows": 1},
+            headers={"Authorization": "Bearer " + config.ADS_API_KEY},
+        )
+        response.raise_for_status()
+        self.update(response.headers)
+
+    def update(self, headers):
+        """Update the quota from response headers.
+
+        Params
+        ------
+        headers : dict-like
+            Response headers. Header names are case-insensitive.
+        """
+
+        headers = {name.lower(): value for name, value in headers.items()}
+        try:
+            limit = int(headers.get("x-ratelimit-limit", ""))
+            remaining = int(headers.get("x-ratelimit-remaining", ""))
+            reset = int(headers.get("x-ratelimit-reset", ""))
+        except ValueError:
+            return
+        with self._lock:
+            self.limit = limit
+            self.remaining = remaining
+            self.reset = reset
+
+    def update_from_ads(self):
+        """Update the quota from the last response received by the ads library."""
+
+        limits = ads.base.RateLimits.getRateLimits("SearchQuery").to_dict()
+        self.update(
+            {
+                "X-RateLimit-Limit": limits.get("limit", ""),
+                "X-RateLimit-Remaining": limits.get("remaining", ""),
+                "X-RateLimit-Reset": limits.get("reset", ""),
+            }
+        )
+
+    def acquire(self, cost=1):
+        """Reserve quota for requests which are about to be made.
+
+        Params
+        ------
+        cost : int
+            Number of requests.
+        """
+
+        with self._lock:
+            if self.remaining is None:
+                return
+            self.check(cost)
+            self.remaining -= cost
+
+    def check(self, cost):
+        """Check whether there is enough quota left for a number of requests.
+
+        A QuotaExceededError is raised if there isn't. Nothing is checked if the quota is unknown.
+
+        Params
+        ------
+        cost : int
+            Number of requests.
+        """
+
+        if self.remaining is None:
+            return
+        if self.remaining - cost < self.reserve:
+            raise QuotaExceededError(
+                "The ADS API quota is insufficient: {cost} more requests are needed, but only {remaining} of the "
+                "daily {limit} requests are left (with {reserve} kept in reserve). The quota is reset at {reset}.".format(
+                    cost=cost,
+                    remaining=self.remaining,
+                    limit=self.limit,
+                    reserve=self.reserve,
+                    reset=self.reset_time(),
+                )
+            )
+
+    def reset_time(self):
+        """Return the time when the quota is reset, or None if it is unknown.
+
+        Returns
+        -------
+        datetime.datetime
+            The reset time, in the local timezone.
+        """
+
+        if self.reset is None:
+            return None
+        return datetime.datetime.fromtimestamp(self.reset).astimezone()
+
+
+def estimate_search_requests(searches, max_pages):
+    """Estimate the number of ADS requests needed for a number of searches.
+
+    Every search needs at least one request, and at most one request per result page.
+
+    Params
+    ------
+    searches : int
+        Number of searches.
+    max_pages : int
+        Maximum number of result pages per search.
+
+    Returns
+    -------
+    tuple of int
+        The minimum and maximum number of requests.
+    """
+
+    return searches, searches * max_pages
+
+
+def estimate_enrichment_requests(publications, batch_size):
+    """Estimate the number of ADS requests needed for querying the authors and affiliations of publications.
+
+    Params
+    ------
+    publications : int
+        Number of publications.
+    batch_size : int
+        Maximum number of publications to query per request.
+
+    Returns
+    -------
+    int
+        The number of requests.
+    """
+
+    return -(-publications // batch_size)
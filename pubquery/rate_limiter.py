@@ -0,0 +1,43 @@
+import threading
+import time
+
+
+class RateLimiter:
+    """A thread-safe token bucket limiting the rate at which requests are made.
+
+    Every call of acquire takes a token from the bucket, blocking until one is available. Tokens are refilled
+    continuously at the given rate, and at most capacity tokens are kept in the bucket.
+
+    Params
+    ------
+    rate : float
+        Number of requests allowed per second. A non-positive rate disables the limit.
+    capacity : int
+        Maximum number of requests which may be made in a burst. By default this is the rate (rounded up), but at
+        least 1.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1, int(-(-rate // 1)))
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Take a token from the bucket, waiting until one is available."""
+
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.capacity, self._tokens + (now - self._updated) * self.rate
+                )
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
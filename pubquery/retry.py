@@ -0,0 +1,206 @@
+import email.utils
+import random
+import threading
+import time
+
+import requests
+
+
+def is_retryable_http_error(error):
+    """Return whether a failed HTTP request should be retried.
+
+    Connection errors, timeouts, rate limit errors (HTTP 429) and server errors (HTTP 5xx) are retried. Other client
+    errors are not, as retrying them would just fail again.
+
+    Params
+    ------
+    error : Exception
+        The error raised by the request.
+
+    Returns
+    -------
+    bool
+        Whether the request should be retried.
+    """
+
+    if isinstance(error, requests.exceptions.HTTPError):
+        status_code = error.response.status_code if error.response is not None else 0
+        return status_code == 429 or status_code >= 500
+    return isinstance(
+        error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)
+    )
+
+
+def response_headers(error):
+    """Return the HTTP response headers of a failed request, or an empty dictionary if there is no response.
+
+    Params
+    ------
+    error : Exception
+        The error raised by the request.
+
+    Returns
+    -------
+    dict-like
+        The response headers.
+    """
+
+    response = getattr(error, "response", None)
+    return response.headers if response is not None else {}
+
+
+def server_delay(headers, now=None):
+    """Return the delay (in seconds) requested by a server through its response headers.
+
+    A Retry-After header (in seconds or as an HTTP date) takes precedence. Otherwise, if an X-RateLimit-Remaining
+    header indicates that the rate limit is exhausted, the delay lasts until the time given by the X-RateLimit-Reset
+    header (in seconds since the epoch). The header names are case-insensitive.
+
+    Params
+    ------
+    headers : dict-like
+        Response headers.
+    now : float
+        Current time, in seconds since the epoch. The current system time is used if this is None.
+
+    Returns
+    -------
+    float or None
+        The delay, or None if the server did not request one.
+    """
+
+    now = now if now is not None else time.time()
+    headers = {name.lower(): value for name, value in headers.items()}
+
+    retry_after = headers.get("retry-after")
+    if retry_after:
+        try:
+            return max(0.0, float(retry_after))
+        except ValueError:
+            try:
+                retry_at = email.utils.parsedate_to_datetime(retry_after)
+                return max(0.0, retry_at.timestamp() - now)
+            except (TypeError, ValueError):
+                pass
+
+    remaining = headers.get("x-ratelimit-remaining")
+    reset = headers.get("x-ratelimit-reset")
+    if remaining not in (None, "") and reset not in (None, ""):
+        try:
+            if int(remaining) <= 0:
+                return max(0.0, float(reset) - now)
+        except ValueError:
+            pass
+
+    return None
+
+
+class RetryPolicy:
+    """Policy for retrying failing calls with exponential backoff and jitter.
+
+    The n-th retry (starting from 0) is delayed by a random time between half and all of min(base_delay * 2^n,
+    max_delay) seconds. If the server requests a longer delay, through a Retry-After header or rate limit headers,
+    that delay is used instead. If the server requests a delay longer than max_server_delay, the call is not retried
+    at all, as there is no point in blocking for hours until a daily quota is reset.
+
+    Params
+    ------
+    max_retries : int
+        Maximum number of retries.
+    base_delay : float
+        Delay (in seconds) before the first retry.
+    max_delay : float
+        Maximum backoff delay (in seconds).
+    max_server_delay : float
+        Maximum delay (in seconds) requested by the server which is honoured.
+    retryable : function
+        Function which takes an exception and returns whether the failed call should be retried.
+    headers : function
+        Function which takes an exception and returns the HTTP response headers of the failed call.
+
+    Attributes
+    ----------
+    retries : int
+        Total number of retries made with this policy.
+    """
+
+    def __init__(
+        self,
+        max_retries=5,
+        base_delay=1,
+        max_delay=60,
+        max_server_delay=300,
+        retryable=is_retryable_http_error,
+        headers=response_headers,
+    ):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_server_delay = max_server_delay
+        self.retryable = retryable
+        self.headers = headers
+        self.retries = 0
+        self._lock = threading.Lock()
+
+    def delay(self, retry, error):
+        """Return the delay (in seconds) before a retry, or None if the call should not be retried.
+
+        Params
+        ------
+        retry : int
+            Number of the retry, starting from 0.
+        error : Exception
+            The error raised by the failed call.
+
+        Returns
+        -------
+        float or None
+            The delay.
+        """
+
+        backoff = min(self.base_delay * 2**retry, self.max_delay)
+        backoff *= random.uniform(0.5, 1)
+        requested = server_delay(self.headers(error))
+        if requested is None:
+            return backoff
+        if requested > self.max_server_delay:
+            return None
+        return max(backoff, requested)
+
+    def call(self, func, *args, **kwargs):
+        """Call a function, retrying it according to this policy if it fails.
+
+        Params
+        ------
+        func : function
+            Function to call.
+        args : list
+            Positional arguments for the function.
+        kwargs : dict
+            Keyword arguments for the function.
+
+        Returns
+        -------
+        object
+            The value returned by the function.
+        """
+
+        retry = 0
+        while True:
+            try:
+                return func(*args, **kwargs)
+            except Exception as error:
+                if retry >= self.max_retries or not self.retryable(error):
+                    raise
+                delay = self.delay(retry, error)
+                if delay is None:
+                    raise
+                print(
+                    "Retrying in {delay:.1f} seconds ({error})...".format(
+                        delay=delay, error=type(error).__name__
+                    )
+                )
+                with self._lock:
+                    self.retries += 1
+                time.sleep(delay)
+                retry += 1
@@ -1,8 +1,15 @@
+import datetime
+import time
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum
 
 import requests
+from requests.adapters import HTTPAdapter
 
-import config
+from pubquery import config
+from pubquery.instrumentation import RequestStats
+from pubquery.rate_limiter import RateLimiter
+from pubquery.retry import RetryPolicy
 
 
 class WoSIndexedStatus(Enum):
@@ -11,12 +18,88 @@ class WoSIndexedStatus(Enum):
     UNKNOWN = "Unknown"
 
 class WoSQueries:
+    """
+    Queries for the Web of Science (WoS).
+
+    Params
+    ------
+    cache : ResponseCache
+        Cache for the indexing status of DOIs. No cache is used if this is None.
+    max_workers : int
+        Maximum number of concurrent requests (and pooled connections) used by are_dois_indexed.
+    requests_per_second : float
+        Maximum number of requests per second, as allowed by the WoS Lite API.
+
+    """
+
     BASE_URL = 'https://wos-api.clarivate.com/api/woslite'
 
-    def __init__(self):
+    # How long an indexing status is cached. A DOI which is not indexed yet may well be indexed soon, whereas an
+    # indexed DOI remains indexed. An unknown status is never cached.
+    CACHE_TTLS = {
+        'INDEXED': datetime.timedelta(days=180),
+        'NOT_INDEXED': datetime.timedelta(days=1),
+    }
+
+    def __init__(self, cache=None, max_workers=4, requests_per_second=2):
         wos_api_key = config.WOS_API_KEY
         self.session = requests.Session()
         self.session.headers.update({'X-ApiKey': wos_api_key})
+        self.session.mount('https://', HTTPAdapter(pool_maxsize=max_workers))
+        self.cache = cache
+        self.max_workers = max_workers
+        self.rate_limiter = RateLimiter(requests_per_second)
+        self.retry_policy = RetryPolicy(max_retries=3)
+        self.request_stats = RequestStats()
+
+    def are_dois_indexed(self, dois, batch_size=50):
+        """
+        Check whether DOIs are indexed on the Web of Science.
+
+        Unless the batch size is 1, the DOIs are combined into queries of the form do=("a" OR "b" OR ...), so that a
+        single request checks a whole batch. The requests are made concurrently, but no faster than the rate limit
+        allows.
+
+        Params
+        ------
+        dois : iterable of str
+            Document object identifiers (DOIs). A DOI may be None.
+        batch_size : int
+            Maximum number of DOIs to check per request. This must not be greater than 100, the maximum number of
+            records returned by a WoS Lite query.
+
+        Returns
+        -------
+        dict
+            Dictionary of the DOIs and their WoSIndexedStatus.
+
+        """
+
+        dois = list(dict.fromkeys(dois))
+        if batch_size <= 1:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                return dict(zip(dois, executor.map(self.is_doi_indexed, dois)))
+
+        statuses = dict()
+        uncached_dois = []
+        for doi in dois:
+            status = self._cached_status(doi) if doi else WoSIndexedStatus.NOT_INDEXED
+            if status is not None:
+                statuses[doi] = status
+            else:
+                uncached_dois.append(doi)
+
+        batches = [
+            uncached_dois[i : i + batch_size]
+            for i in range(0, len(uncached_dois), batch_size)
+        ]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for batch_statuses in executor.map(self._query_dois, batches):
+                for doi, status in batch_statuses.items():
+                    self._cache_status(doi, status)
+                statuses.update(batch_statuses)
+
+        return statuses
 
     def is_doi_indexed(self, doi):
         """
@@ -38,6 +121,43 @@ class WoSQueries:
         if not doi:
             return WoSIndexedStatus.NOT_INDEXED
 
+        cached = self._cached_status(doi)
+        if cached is not None:
+            return cached
+
+        status = self._query_doi(doi)
+        self._cache_status(doi, status)
+        return status
+
+    def _cached_status(self, doi):
+        if self.cache is None:
+            return None
+        cached = self.cache.get('wos_doi', doi.lower())
+        return WoSIndexedStatus[cached] if cached is not None else None
+
+    def _cache_status(self, doi, status):
+        if self.cache is not None and status.name in WoSQueries.CACHE_TTLS:
+            self.cache.set(
+                'wos_doi', doi.lower(), status.name, WoSQueries.CACHE_TTLS[status.name]
+            )
+
+    def _get(self, params):
+        # Query the WoS, retrying rate limited and failed requests. None is returned if all attempts fail.
+        def get():
+            self.rate_limiter.acquire()
+            start = time.perf_counter()
+            res = self.session.get(WoSQueries.BASE_URL, params=params)
+            self.request_stats.add(len(res.content), time.perf_counter() - start)
+            if res.status_code == 429 or res.status_code >= 500:
+                res.raise_for_status()
+            return res
+
+        try:
+            return self.retry_policy.call(get)
+        except requests.exceptions.RequestException:
+            return None
+
+    def _query_doi(self, doi):
         # Query the WoS for the DOI.
         params = {
             'databaseId': 'WOS',
@@ -45,10 +165,10 @@ class WoSQueries:
             'firstRecord': 1,
             'count': 1
         }
-        res = self.session.get(WoSQueries.BASE_URL, params=params)
+        res = self._get(params)
 
         # If the query fails, we don't know whether the DOI is indexed.
-        if res.status_code != 200:
+        if res is None or res.status_code != 200:
             return WoSIndexedStatus.UNKNOWN
 
         # Check whether a publication was found for the DOI.
@@ -63,6 +183,43 @@ class WoSQueries:
         else:
             return WoSIndexedStatus.UNKNOWN
 
+    def _query_dois(self, dois):
+        # Query the WoS for all the DOIs at once.
+        params = {
+            'databaseId': 'WOS',
+            'usrQuery': 'do=({})'.format(' OR '.join(f'"{doi}"' for doi in dois)),
+            'firstRecord': 1,
+            'count': 100
+        }
+        res = self._get(params)
+
+        # If the query fails, we don't know whether the DOIs are indexed.
+        if res is None or res.status_code != 200:
+            return {doi: WoSIndexedStatus.UNKNOWN for doi in dois}
+
+        # Map the DOIs of the search results back to the queried DOIs. DOIs are case-insensitive.
+        found_dois = set()
+        all_records_have_doi = True
+        for publication_data in res.json()['Data']:
+            record_dois = publication_data['Other'].get('Identifier.Doi')
+            if not record_dois:
+                all_records_have_doi = False
+                continue
+            if isinstance(record_dois, str):
+                record_dois = [record_dois]
+            found_dois.update(record_doi.lower() for record_doi in record_dois)
+
+        # If a search result has no DOI, it might belong to any of the DOIs not found.
+        not_found_status = (
+            WoSIndexedStatus.NOT_INDEXED
+            if all_records_have_doi
+            else WoSIndexedStatus.UNKNOWN
+        )
+        return {
+            doi: WoSIndexedStatus.INDEXED if doi.lower() in found_dois else not_found_status
+            for doi in dois
+        }
+
 
 if __name__ == '__main__':
     wos = WoSQueries()
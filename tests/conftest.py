@@ -0,0 +1,124 @@
+import os
+
+# The configuration is read from the environment when pubquery.config is imported, and it requires the librarians'
+# email addresses.
+os.environ.setdefault(
+    "LIBRARIAN_EMAIL_ADDRESSES", '["Librarian <librarian@example.com>"]'
+)
+os.environ.setdefault("FROM_EMAIL_ADDRESS", "query@example.com")
+os.environ.setdefault("ADS_API_KEY", "test")
+os.environ.setdefault("WOS_API_KEY", "test")
+
+import email
+
+import pytest
+import typer
+from typer.testing import CliRunner
+
+from pubquery import config, publications_query
+from pubquery.rate_limiter import RateLimiter
+
+from benchmarks.fixtures import SyntheticServices
+
+
+class FakeSMTP:
+    """SMTP connection recording the sent emails rather than sending them."""
+
+    sent = []
+
+    def __init__(self, *args, **kwargs):
+        self._lines = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def ehlo_or_helo_if_needed(self):
+        pass
+
+    def mail(self, sender):
+        self._lines = []
+        return 250, b"OK"
+
+    def rcpt(self, recipient):
+        return 250, b"OK"
+
+    def docmd(self, command):
+        return 354, b"Go ahead"
+
+    def send(self, line):
+        self._lines.append(line)
+
+    def getreply(self):
+        # remove the terminating line and the periods prepended to lines starting with a period
+        lines = b"".join(self._lines)[: -len(b".\r\n")].split(b"\r\n")
+        message = b"\r\n".join(line[1:] if line.startswith(b"..") else line for line in lines)
+        FakeSMTP.sent.append(email.message_from_bytes(message))
+        return 250, b"OK"
+
+    @staticmethod
+    def attachments():
+        """Return the attachments of all sent emails, as a dictionary of file names and contents."""
+
+        return {
+            part.get_filename(): part.get_payload(decode=True)
+            for message in FakeSMTP.sent
+            for part in message.walk()
+            if part.get_filename()
+        }
+
+
+@pytest.fixture(autouse=True)
+def no_rate_limit(monkeypatch):
+    monkeypatch.setattr(RateLimiter, "acquire", lambda self: None)
+
+
+@pytest.fixture
+def run_dirs(tmp_path, monkeypatch):
+    """Keep the cache, the bibcode store, the checkpoints and the run reports in a temporary directory."""
+
+    monkeypatch.setattr(config, "CACHE_FILE", str(tmp_path / "cache.sqlite"))
+    monkeypatch.setattr(
+        config, "PREVIOUS_BIBCODES_FILE", str(tmp_path / "bibcodes.sqlite")
+    )
+    monkeypatch.setattr(config, "CHECKPOINT_DIR", str(tmp_path / "checkpoints"))
+    monkeypatch.setattr(config, "REPORT_DIR", str(tmp_path / "reports"))
+    return tmp_path
+
+
+@pytest.fixture
+def smtp(monkeypatch):
+    """Record the sent emails in FakeSMTP.sent."""
+
+    FakeSMTP.sent = []
+    monkeypatch.setattr(publications_query.smtplib, "SMTP", FakeSMTP)
+    return FakeSMTP
+
+
+@pytest.fixture
+def services(monkeypatch):
+    """Answer all ADS and Web of Science requests with synthetic responses for a few searches."""
+
+    monkeypatch.setattr(config, "KEYWORDS", ["SAAO", "SALT", "KELT"])
+    monkeypatch.setattr(config, "AUTHORS", {"Doe, Jane": "Jane Doe <doe@example.com>"})
+    monkeypatch.setattr(config, "AFFILIATIONS", ["SAAO"])
+    monkeypatch.setattr(config, "INSTITUTIONS", ["SAAO"])
+    synthetic = SyntheticServices(200, 6)
+    with synthetic.serve():
+        yield synthetic
+
+
+@pytest.fixture
+def run_main(run_dirs, smtp, services):
+    """Return a function running the publications query for January 2025 with the given options."""
+
+    def run(*args):
+        app = typer.Typer()
+        app.command()(publications_query.main)
+        return CliRunner().invoke(
+            app, ["--start", "2025-01-01", "--end", "2025-01-31", *args]
+        )
+
+    return run
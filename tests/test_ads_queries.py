@@ -0,0 +1,159 @@
+import datetime
+import re
+
+import pytest
+
+from pubquery.ads_queries import ADSQueries
+
+
+class VerifyingQueries(ADSQueries):
+    """ADS queries whose verification searches are answered from a dictionary of bibcodes and their keywords."""
+
+    def __init__(self, contents, verify_keywords=True):
+        super().__init__(
+            datetime.date(2025, 1, 1),
+            datetime.date(2025, 1, 31),
+            max_workers=1,
+            combine_terms=True,
+            verify_keywords=verify_keywords,
+        )
+        self.contents = contents
+        self.queries = []
+
+    def _search(self, q, fl, fq=None, hl=None):
+        self.queries.append(q)
+        keyword, bibcodes = re.fullmatch(r'full:"([^"]+)" AND bibcode:\((.*)\)', q).groups()
+        return [
+            dict(bibcode=bibcode)
+            for bibcode in re.findall(r'"([^"]+)"', bibcodes)
+            if keyword in self.contents[bibcode]
+        ]
+
+
+def record(bibcode, *snippets):
+    return dict(bibcode=bibcode, highlights=dict(body=list(snippets)))
+
+
+def test_keywords_missing_from_highlights_are_verified():
+    queries = VerifyingQueries(
+        {
+            "2025A": ["SALT", "KELT"],
+            "2025B": ["SALT"],
+            "2025C": ["SAAO"],
+        }
+    )
+    attributions = queries._attribute(
+        ["SAAO", "SALT", "KELT"],
+        [
+            # the snippets show SALT only, but the publication mentions KELT as well
+            record("2025A", "observed with <em>SALT</em>"),
+            record("2025B", "the <em>SALT</em> spectrum"),
+            # ADS matched a synonym
+            record("2025C", "the <em>South African Astronomical Observatory</em>"),
+        ],
+    )
+    assert attributions == {
+        "2025A": ["SALT", "KELT"],
+        "2025B": ["SALT"],
+        "2025C": ["SAAO"],
+    }
+    # SALT is confirmed by the highlights where it is found, and not searched for again there
+    salt = [q for q in queries.queries if q.startswith('full:"SALT"')]
+    assert salt == ['full:"SALT" AND bibcode:("2025C")']
+
+
+def test_keywords_confirmed_for_all_results_are_not_verified():
+    queries = VerifyingQueries({"2025A": ["SALT"], "2025B": ["SALT"]})
+    attributions = queries._attribute(
+        ["SALT", "KELT"],
+        [record("2025A", "<em>SALT</em>"), record("2025B", "<em>SALT</em>")],
+    )
+    assert attributions == {"2025A": ["SALT"], "2025B": ["SALT"]}
+    assert all(q.startswith('full:"KELT"') for q in queries.queries)
+
+
+def test_keywords_are_only_verified_on_request():
+    queries = VerifyingQueries(
+        {"2025A": ["SALT", "KELT"], "2025B": ["SAAO"]}, verify_keywords=False
+    )
+    attributions = queries._attribute(
+        ["SAAO", "SALT", "KELT"],
+        [
+            record("2025A", "observed with <em>SALT</em>"),
+            record("2025B", "the <em>South African Astronomical Observatory</em>"),
+        ],
+    )
+    # only the highlights are used
+    assert attributions == {"2025A": ["SALT"], "2025B": []}
+    assert queries.queries == []
+
+
+@pytest.mark.parametrize("results", [1, 100, 101, 250])
+def test_verification_searches_are_batched(results):
+    contents = {"2025{0:05d}".format(i): ["KELT"] if i % 3 else [] for i in range(results)}
+    queries = VerifyingQueries(contents)
+    attributions = queries._attribute(
+        ["SALT", "KELT"], [record(bibcode) for bibcode in contents]
+    )
+    assert attributions == {
+        bibcode: ["KELT"] if keywords else [] for bibcode, keywords in contents.items()
+    }
+    batches = -(-results // ADSQueries.VERIFICATION_BATCH_SIZE)
+    assert len(queries.queries) == 2 * batches
+    assert all(
+        q.count(" OR ") < ADSQueries.VERIFICATION_BATCH_SIZE for q in queries.queries
+    )
+
+
+class ShardedQueries(ADSQueries):
+    """ADS queries which record their searches and find one publication per term and month."""
+
+    def __init__(self, **kwargs):
+        super().__init__(
+            datetime.date(2024, 1, 1),
+            datetime.date(2025, 6, 30),
+            max_workers=1,
+            **kwargs,
+        )
+        self.queries = []
+
+    def _search_with_count(self, q, fl, fq=None, hl=None):
+        self.queries.append(q)
+        terms = re.findall(r'"([^"]+)"', q.split(" AND ")[0])
+        first, last = re.search(r"pubdate:\[(\S+) TO (\S+)\]", q).groups()
+        months = [
+            "{0}-{1:02d}".format(year, month)
+            for year in (2024, 2025)
+            for month in range(1, 13)
+            if first <= "{0}-{1:02d}".format(year, month) <= last
+        ]
+        records = [
+            dict(bibcode="{0} {1}".format(term, month), aff=[], author=[])
+            for term in terms
+            for month in months
+        ]
+        return records, len(records)
+
+
+@pytest.mark.parametrize(
+    "method, field",
+    [
+        ("by_fulltext_keywords", "full"),
+        ("by_authors", "author"),
+        ("by_affiliations", "aff"),
+        ("by_institutions", "institution"),
+    ],
+)
+def test_searches_are_sharded(method, field):
+    unsharded = ShardedQueries()
+    sharded = ShardedQueries(shard_months=12)
+    terms = ["SALT", "KELT"]
+    publications = getattr(sharded, method)(terms)
+    assert list(publications) == list(getattr(unsharded, method)(terms))
+    assert len(publications) == 2 * 18
+    assert len(unsharded.queries) == 2
+    assert [q.split(" AND ")[1] for q in sharded.queries] == [
+        "pubdate:[2024-01 TO 2024-12]",
+        "pubdate:[2025-01 TO 2025-06]",
+    ] * 2
+    assert all(q.startswith(field + ':"') for q in sharded.queries)
@@ -0,0 +1,162 @@
+import datetime
+import io
+import json
+import os
+
+import openpyxl
+import pytest
+
+from pubquery import config
+from pubquery.ads_queries import ADSQueries
+from pubquery.checkpoint import Checkpoint
+from pubquery.publication import Publication
+from pubquery.publications_query import enrich_publications
+
+
+@pytest.fixture
+def checkpoint(tmp_path):
+    return Checkpoint(tmp_path, datetime.date(2025, 1, 1), datetime.date(2025, 3, 31))
+
+
+def test_saved_results_are_reloaded(tmp_path, checkpoint):
+    results = {"2025MNRAS": "Indexed"}
+    checkpoint.save("wos", results)
+    checkpoint.save("enrichment", {"2025MNRAS": [["Doe, J."], ["SAAO"]]})
+
+    # later changes are not saved
+    results["2025ApJ"] = "Not indexed"
+
+    reloaded = Checkpoint(tmp_path, datetime.date(2025, 1, 1), datetime.date(2025, 3, 31))
+    assert reloaded.has("wos")
+    assert not reloaded.has("search")
+    assert reloaded.get("wos") == {"2025MNRAS": "Indexed"}
+    assert reloaded.get("enrichment") == {"2025MNRAS": [["Doe, J."], ["SAAO"]]}
+    assert reloaded.get("search", []) == []
+    with open(checkpoint.path) as f:
+        assert json.load(f) == reloaded._stages
+
+
+def test_checkpoint_is_keyed_by_date_range(tmp_path, checkpoint):
+    checkpoint.save("wos", {"2025MNRAS": "Indexed"})
+    other = Checkpoint(tmp_path, datetime.date(2025, 1, 1), datetime.date(2025, 2, 28))
+    assert not other.has("wos")
+
+
+def test_clear_removes_results(tmp_path, checkpoint):
+    checkpoint.save("wos", {"2025MNRAS": "Indexed"})
+    checkpoint.clear()
+    assert not checkpoint.has("wos")
+    assert not Checkpoint(
+        tmp_path, datetime.date(2025, 1, 1), datetime.date(2025, 3, 31)
+    ).has("wos")
+
+
+def test_updates_are_appended(tmp_path, checkpoint):
+    checkpoint.update("wos", {"2025MNRAS": "Indexed"})
+    checkpoint.update("wos", {"2025ApJ": "Not indexed", "2025MNRAS": "Not indexed"})
+    checkpoint.update("search", {"q": [[{"bibcode": "2025MNRAS"}, ["SALT"]]]})
+    assert checkpoint.has("wos")
+    with open(checkpoint.journal_path) as f:
+        assert len(f.readlines()) == 3
+
+    reloaded = Checkpoint(tmp_path, datetime.date(2025, 1, 1), datetime.date(2025, 3, 31))
+    assert reloaded.get("wos") == {"2025MNRAS": "Not indexed", "2025ApJ": "Not indexed"}
+    assert reloaded.get("search") == {"q": [[{"bibcode": "2025MNRAS"}, ["SALT"]]]}
+
+    reloaded.clear()
+    assert not os.path.exists(checkpoint.journal_path)
+
+
+def test_incomplete_update_is_discarded(tmp_path, checkpoint):
+    checkpoint.update("wos", {"2025MNRAS": "Indexed"})
+    with open(checkpoint.journal_path, "a") as f:
+        f.write('{"stage": "wos", "results": {"2025Ap')
+
+    reloaded = Checkpoint(tmp_path, datetime.date(2025, 1, 1), datetime.date(2025, 3, 31))
+    assert reloaded.get("wos") == {"2025MNRAS": "Indexed"}
+    reloaded.update("wos", {"2025ApJ": "Indexed"})
+    assert Checkpoint(
+        tmp_path, datetime.date(2025, 1, 1), datetime.date(2025, 3, 31)
+    ).get("wos") == {"2025MNRAS": "Indexed", "2025ApJ": "Indexed"}
+
+
+def spreadsheet_rows(content):
+    return list(openpyxl.load_workbook(io.BytesIO(content)).active.values)
+
+
+def test_failed_run_is_resumed(run_main, smtp, services, monkeypatch):
+    mail = smtp.mail
+    monkeypatch.setattr(smtp, "mail", lambda self, sender: (421, b"Not available"))
+    result = run_main("--no-cache")
+    assert result.exit_code != 0
+    assert not smtp.sent
+
+    # the resumed run neither searches again nor queries authors, affiliations or Web of Science statuses
+    monkeypatch.setattr(smtp, "mail", mail)
+    requests = services.requests
+    result = run_main("--no-cache", "--resume")
+    assert result.exit_code == 0, result.output
+    assert services.requests == requests
+    assert len(smtp.sent) == 1
+    resumed = spreadsheet_rows(smtp.attachments()["all.xlsx"])
+
+    # the results are those of a run without failure, and the checkpoint is removed
+    assert not os.listdir(config.CHECKPOINT_DIR)
+    smtp.sent.clear()
+    result = run_main("--no-cache")
+    assert result.exit_code == 0, result.output
+    assert resumed == spreadsheet_rows(smtp.attachments()["all.xlsx"])
+    assert len(resumed) > 1
+
+
+def test_searches_finished_before_a_crash_are_not_repeated(run_main, smtp, monkeypatch):
+    by_terms = ADSQueries._by_terms
+    searched = []
+
+    def search(self, field, terms, hl=None, shard=None):
+        searched.append(field)
+        return by_terms(self, field, terms, hl, shard)
+
+    def fail_for_affiliations(self, field, terms, hl=None, shard=None):
+        if field == "aff":
+            raise RuntimeError("The search failed")
+        return search(self, field, terms, hl, shard)
+
+    monkeypatch.setattr(ADSQueries, "_by_terms", fail_for_affiliations)
+    result = run_main("--no-cache")
+    assert isinstance(result.exception, RuntimeError)
+    assert "full" in searched and "author" in searched
+
+    # only the affiliation and institution searches are run again
+    searched.clear()
+    monkeypatch.setattr(ADSQueries, "_by_terms", search)
+    result = run_main("--no-cache", "--resume")
+    assert result.exit_code == 0, result.output
+    assert searched == ["aff", "aff"]
+    resumed = spreadsheet_rows(smtp.attachments()["all.xlsx"])
+
+    smtp.sent.clear()
+    result = run_main("--no-cache")
+    assert result.exit_code == 0, result.output
+    assert resumed == spreadsheet_rows(smtp.attachments()["all.xlsx"])
+
+
+def test_only_queried_authors_and_affiliations_are_saved(tmp_path, services, checkpoint):
+    publications = []
+    for i in range(250):
+        p = Publication.from_dict(services.document(i))
+        if i % 2:
+            p.aff = None
+        publications.append(p)
+
+    reused = set()
+    enriched = list(enrich_publications(publications, dict(), checkpoint, reused=reused))
+    assert enriched == publications
+    assert reused == {p.bibcode for p in publications[::2]}
+    assert all(p.aff and len(p.aff) == len(p.author) for p in enriched)
+
+    # every update only contains new results
+    with open(checkpoint.journal_path) as f:
+        updates = [json.loads(line)["results"] for line in f]
+    saved = [bibcode for update in updates for bibcode in update]
+    assert sorted(saved) == sorted(p.bibcode for p in publications[1::2])
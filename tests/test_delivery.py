@@ -0,0 +1,71 @@
+import io
+
+import pytest
+
+from pubquery.delivery import (
+    MESSAGE_OVERHEAD,
+    by_year,
+    encoded_size,
+    plan_messages,
+)
+from pubquery.exporters import CsvExporter, ParquetExporter, XlsxExporter
+
+COLUMNS = {"bibcode": "Bibcode", "pubdate": "Publication date", "author": "Authors"}
+
+
+def publication(bibcode, pubdate):
+    return dict(bibcode=bibcode, pubdate=pubdate, author=["Doe, J.", "Roe, R."])
+
+
+PUBLICATIONS = [
+    publication("2025MNRAS.001", "2025-01-00"),
+    publication("2024ApJ...002", "2024-12-00"),
+    publication("2025A&A...003", "2025-02-00"),
+    publication("XXXXX", ""),
+]
+
+
+def attachment(exporter_class):
+    exporter = exporter_class(COLUMNS)
+    for p in PUBLICATIONS:
+        exporter.write(p)
+    return dict(name="all." + exporter.extension, content=exporter.close())
+
+
+@pytest.mark.parametrize("exporter_class", [XlsxExporter, CsvExporter, ParquetExporter])
+def test_attachments_are_split_by_year(exporter_class):
+    if exporter_class is ParquetExporter:
+        pytest.importorskip("pyarrow")
+    years = by_year(attachment(exporter_class), COLUMNS)
+    extension = exporter_class.extension
+    assert [a["name"] for a in years] == [
+        "all_{0}.{1}".format(year, extension) for year in ("2024", "2025", "unknown")
+    ]
+    bibcodes = [
+        [row["bibcode"] for row in exporter_class.read(a["content"], COLUMNS)]
+        for a in years
+    ]
+    assert bibcodes == [
+        ["2024ApJ...002"],
+        ["2025MNRAS.001", "2025A&A...003"],
+        ["XXXXX"],
+    ]
+
+
+def test_only_attachments_too_large_for_an_email_are_split():
+    large = attachment(CsvExporter)
+    small = dict(name="notes.txt", content=io.BytesIO(b"notes"))
+    max_size = MESSAGE_OVERHEAD + encoded_size(large) - 1
+    messages = plan_messages([large, small], max_size, columns=COLUMNS)
+    assert [a["name"] for attachments in messages for a in attachments] == [
+        "all_2024.csv",
+        "all_2025.csv",
+        "all_unknown.csv",
+        "notes.txt",
+    ]
+    # without the columns the attachments are sent as they are
+    messages = plan_messages([large, small], max_size)
+    assert [[a["name"] for a in attachments] for attachments in messages] == [
+        ["all.csv"],
+        ["notes.txt"],
+    ]
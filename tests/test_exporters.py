@@ -0,0 +1,157 @@
+import csv
+import io
+
+import openpyxl
+import pytest
+
+from pubquery.exporters import CsvExporter, ParquetExporter, XlsxExporter
+from pubquery.publication import Publication
+
+COLUMNS = {
+    "bibcode": "Bibcode",
+    "author": "Authors",
+    "aff": "Affiliations",
+    "refereed": "Refereed",
+    "no_of_authors_aff_to_SA_ins": "No. of SA authors",
+    "ads_url": "ADS URL",
+    "SA_institutions": "SA institutions",
+}
+
+
+def publications():
+    return [
+        Publication(
+            bibcode="2025MNRAS.001",
+            author=["Doe, J.", "Roe, R."],
+            aff=["SAAO, Cape Town, South Africa", "Durham University, UK"],
+            refereed=True,
+            no_of_authors_aff_to_SA_ins=1,
+            ads_url="https://ui.adsabs.harvard.edu/#abs/2025MNRAS.001/abstract",
+            SA_institutions="SAAO, Cape Town, South Africa",
+        ),
+        Publication(
+            bibcode="2025ApJ...002",
+            author=["Poe, E."],
+            aff=["MIT, USA"],
+            refereed=False,
+            no_of_authors_aff_to_SA_ins=0,
+            ads_url="https://ui.adsabs.harvard.edu/#abs/2025ApJ...002/abstract",
+            SA_institutions="",
+        ),
+    ]
+
+
+def exported(exporter_class, spill_size):
+    exporter = exporter_class(COLUMNS, spill_size=spill_size)
+    for p in publications():
+        exporter.write(p)
+    assert exporter.rows == 2
+    return exporter.close().read()
+
+
+@pytest.mark.parametrize("spill_size", [1, 10 * 1024 * 1024])
+def test_xlsx_round_trip(spill_size):
+    workbook = openpyxl.load_workbook(io.BytesIO(exported(XlsxExporter, spill_size)))
+    rows = list(workbook.active.values)
+    assert rows == [
+        tuple(COLUMNS.values()),
+        (
+            "2025MNRAS.001",
+            "Doe, J., Roe, R.",
+            "SAAO, Cape Town, South Africa| Durham University, UK",
+            True,
+            1,
+            "https://ui.adsabs.harvard.edu/#abs/2025MNRAS.001/abstract",
+            "SAAO, Cape Town, South Africa",
+        ),
+        (
+            "2025ApJ...002",
+            "Poe, E.",
+            "MIT, USA",
+            False,
+            0,
+            "https://ui.adsabs.harvard.edu/#abs/2025ApJ...002/abstract",
+            None,
+        ),
+    ]
+    # the ADS URLs are hyperlinks
+    assert workbook.active.cell(2, 6).hyperlink is not None
+
+
+@pytest.mark.parametrize("spill_size", [1, 10 * 1024 * 1024])
+def test_csv_round_trip(spill_size):
+    content = exported(CsvExporter, spill_size).decode("utf-8")
+    rows = list(csv.reader(io.StringIO(content, newline="")))
+    assert rows == [
+        list(COLUMNS.keys()),
+        [
+            "2025MNRAS.001",
+            "Doe, J., Roe, R.",
+            "SAAO, Cape Town, South Africa| Durham University, UK",
+            "True",
+            "1",
+            "https://ui.adsabs.harvard.edu/#abs/2025MNRAS.001/abstract",
+            "SAAO, Cape Town, South Africa",
+        ],
+        [
+            "2025ApJ...002",
+            "Poe, E.",
+            "MIT, USA",
+            "False",
+            "0",
+            "https://ui.adsabs.harvard.edu/#abs/2025ApJ...002/abstract",
+            "",
+        ],
+    ]
+
+
+@pytest.mark.parametrize("spill_size", [1, 10 * 1024 * 1024])
+def test_parquet_round_trip(spill_size):
+    pyarrow = pytest.importorskip("pyarrow")
+    import pyarrow.parquet
+
+    table = pyarrow.parquet.read_table(
+        pyarrow.BufferReader(exported(ParquetExporter, spill_size))
+    )
+    assert table.column_names == list(COLUMNS.keys())
+    assert [field.metadata[b"name"].decode() for field in table.schema] == list(
+        COLUMNS.values()
+    )
+    assert table.schema.field("author").type == pyarrow.list_(pyarrow.string())
+    assert table.schema.field("refereed").type == pyarrow.bool_()
+    assert table.schema.field("no_of_authors_aff_to_SA_ins").type == pyarrow.int64()
+    assert table.to_pylist() == [
+        dict(
+            bibcode="2025MNRAS.001",
+            author=["Doe, J.", "Roe, R."],
+            aff=["SAAO, Cape Town, South Africa", "Durham University, UK"],
+            refereed=True,
+            no_of_authors_aff_to_SA_ins=1,
+            ads_url="https://ui.adsabs.harvard.edu/#abs/2025MNRAS.001/abstract",
+            SA_institutions="SAAO, Cape Town, South Africa",
+        ),
+        dict(
+            bibcode="2025ApJ...002",
+            author=["Poe, E."],
+            aff=["MIT, USA"],
+            refereed=False,
+            no_of_authors_aff_to_SA_ins=0,
+            ads_url="https://ui.adsabs.harvard.edu/#abs/2025ApJ...002/abstract",
+            SA_institutions=None,
+        ),
+    ]
+
+
+@pytest.mark.parametrize("exporter_class", [XlsxExporter, CsvExporter, ParquetExporter])
+def test_exported_rows_can_be_rewritten(exporter_class):
+    if exporter_class is ParquetExporter:
+        pytest.importorskip("pyarrow")
+    content = io.BytesIO(exported(exporter_class, 10 * 1024 * 1024))
+    rows = list(exporter_class.read(content, COLUMNS))
+    assert [row["bibcode"] for row in rows] == ["2025MNRAS.001", "2025ApJ...002"]
+    assert content.tell() == 0
+
+    exporter = exporter_class(COLUMNS)
+    for row in rows:
+        exporter.write(row)
+    assert list(exporter_class.read(exporter.close(), COLUMNS)) == rows
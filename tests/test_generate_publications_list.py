@@ -0,0 +1,114 @@
+import concurrent.futures
+import importlib.metadata
+import os
+
+import pytest
+
+from pubquery import generate_publications_list
+from pubquery.generate_publications_list import create_pdf, group_sections
+
+pypdf = pytest.importorskip("pypdf")
+
+
+def render_pdf(html, path):
+    # stand-in for WeasyPrint, rendering a blank page whose width is the length of the HTML
+    writer = pypdf.PdfWriter()
+    writer.add_blank_page(width=len(html), height=100)
+    with open(path, "wb") as f:
+        writer.write(f)
+
+
+@pytest.fixture
+def renderer(monkeypatch):
+    """Render sections with the stand-in, in threads, and return the list of rendered sections."""
+
+    rendered = []
+
+    def render(html, path):
+        rendered.append(html)
+        render_pdf(html, path)
+
+    version = importlib.metadata.version
+    monkeypatch.setattr(
+        importlib.metadata,
+        "version",
+        lambda name: "62.0" if name == "weasyprint" else version(name),
+    )
+    monkeypatch.setattr(generate_publications_list, "render_pdf", render)
+    monkeypatch.setattr(
+        concurrent.futures, "ProcessPoolExecutor", concurrent.futures.ThreadPoolExecutor
+    )
+    return rendered
+
+
+def page_widths(path):
+    return [int(page.mediabox.width) for page in pypdf.PdfReader(path).pages]
+
+
+def cached_sections(cache_dir):
+    return sorted(os.listdir(os.path.join(cache_dir, "sections")))
+
+
+def test_group_sections():
+    sections = [(2025, "<p>2025</p>"), (2019, "<p>2019</p>"), (2018, "<p>2018</p>")]
+    assert group_sections(sections, "year") == [html for _, html in sections]
+    assert group_sections(sections, "decade") == [
+        "<p>2025</p>",
+        "<p>2019</p><p>2018</p>",
+    ]
+    with pytest.raises(ValueError):
+        group_sections(sections, "century")
+
+
+def test_only_new_sections_are_rendered(tmp_path, renderer):
+    cache_dir = tmp_path / "cache"
+    out = tmp_path / "list.pdf"
+    create_pdf(["a" * 100, "b" * 200, "a" * 100], out, cache_dir)
+    assert sorted(renderer) == ["a" * 100, "b" * 200]
+    assert page_widths(out) == [100, 200, 100]
+
+    renderer.clear()
+    create_pdf(["c" * 300, "b" * 200], out, cache_dir)
+    assert renderer == ["c" * 300]
+    assert page_widths(out) == [300, 200]
+
+    # the section which is no longer used has been removed
+    assert len(cached_sections(cache_dir)) == 2
+
+
+def test_only_unused_cached_sections_are_removed(tmp_path, renderer):
+    cache_dir = tmp_path / "cache"
+    sections_dir = cache_dir / "sections"
+    os.makedirs(sections_dir)
+    (sections_dir / "notes.txt").write_text("not a section")
+    (sections_dir / "section_old.pdf").write_text("not a cached section either")
+
+    # the generated PDF may be in the cache directory
+    out = sections_dir / ("section_" + "0" * 64 + ".pdf")
+    create_pdf(["a" * 100], out, cache_dir)
+    create_pdf(["b" * 200], out, cache_dir)
+    assert page_widths(out) == [200]
+    assert "notes.txt" in cached_sections(cache_dir)
+    assert "section_old.pdf" in cached_sections(cache_dir)
+    assert len(cached_sections(cache_dir)) == 4
+
+
+def test_lists_share_the_cache(tmp_path, renderer):
+    cache_dir = tmp_path / "cache"
+    first = tmp_path / "first.pdf"
+    second = tmp_path / "second.pdf"
+    create_pdf(["a" * 100, "b" * 200], first, cache_dir)
+    create_pdf(["b" * 200, "c" * 300], second, cache_dir)
+    assert sorted(renderer) == ["a" * 100, "b" * 200, "c" * 300]
+
+    # the sections of the second list are kept when the first list changes
+    create_pdf(["a" * 100], first, cache_dir)
+    assert len(cached_sections(cache_dir)) == 3
+    renderer.clear()
+    create_pdf(["b" * 200, "c" * 300], second, cache_dir)
+    assert renderer == []
+
+    # but not once the second list has been removed
+    os.remove(second)
+    create_pdf(["a" * 100], first, cache_dir)
+    assert len(cached_sections(cache_dir)) == 1
@@ -0,0 +1,102 @@
+import datetime
+import functools
+import io
+import json
+import os
+import time
+
+import openpyxl
+import requests
+
+from pubquery import config, publications_query
+from pubquery.ads_queries import ADSQueries
+from pubquery.instrumentation import latest_run_report
+from pubquery.retry import RetryPolicy
+
+
+def spreadsheet_rows(content):
+    rows = list(openpyxl.load_workbook(io.BytesIO(content)).active.values)
+    return [dict(zip(rows[0], row)) for row in rows[1:]]
+
+
+def found_keywords(services):
+    # the keywords whose full text search finds each publication
+    queries = ADSQueries(datetime.date(2025, 1, 1), datetime.date(2025, 1, 31))
+    keywords = dict()
+    for keyword in config.KEYWORDS:
+        (q,) = queries.search_keys([("full", [keyword])])
+        for i in services._search_results(q):
+            keywords.setdefault(services.document(i)["bibcode"], []).append(keyword)
+    return keywords
+
+
+def test_publications_have_the_keywords_of_all_searches(
+    run_main, smtp, services, monkeypatch
+):
+    # Without --combine-queries every keyword is searched for separately. The searches for all but the first keyword
+    # are delayed, and the publications are passed on in small batches, so that the publications found by the first
+    # search could be written before the others have finished.
+    by_terms = ADSQueries._by_terms
+
+    def delayed(self, field, terms, hl=None, shard=None):
+        if field == "full" and list(terms) != config.KEYWORDS[:1]:
+            time.sleep(0.5)
+        return by_terms(self, field, terms, hl, shard)
+
+    monkeypatch.setattr(ADSQueries, "_by_terms", delayed)
+    monkeypatch.setattr(
+        publications_query,
+        "classify_publications",
+        functools.partial(publications_query.classify_publications, batch_size=1),
+    )
+    result = run_main(
+        "--no-cache", "--enrichment-batch-size", "1", "--wos-batch-size", "1"
+    )
+    assert result.exit_code == 0, result.output
+
+    expected = found_keywords(services)
+    rows = spreadsheet_rows(smtp.attachments()["all.xlsx"])
+    bibcodes = [row["Bibcode"] for row in rows]
+    assert len(bibcodes) == len(set(bibcodes))
+    fulltext = {
+        row["Bibcode"]: row["Keywords found in full text "] or "" for row in rows
+    }
+    assert any(len(keywords) > 1 for keywords in expected.values())
+    for bibcode, keywords in fulltext.items():
+        assert keywords.split(", ") == expected.get(bibcode, [""])
+
+
+def test_reused_authors_and_affiliations_are_reported(run_main, services):
+    result = run_main("--no-cache")
+    assert result.exit_code == 0, result.output
+    assert result.output.count("refetches avoided") == 1
+
+    (report_file,) = os.listdir(config.REPORT_DIR)
+    with open(os.path.join(config.REPORT_DIR, report_file)) as f:
+        report = json.load(f)
+    enrichment = report["requests"]["ads_enrichment"]
+    assert enrichment["reused"] == report["publications"]
+    assert enrichment["requests"] == 0
+
+
+def test_enrichment_retries_are_counted_per_run(run_main, monkeypatch):
+    get = publications_query._get
+    failed = []
+
+    def fail_once_per_run(url, headers, request_stats=None):
+        # the first authors and affiliations request of every run fails with a server error
+        if not failed:
+            failed.append(url)
+            response = requests.Response()
+            response.status_code = 503
+            raise requests.exceptions.HTTPError(response=response)
+        return get(url, headers, request_stats)
+
+    monkeypatch.setattr(publications_query, "_get", fail_once_per_run)
+    monkeypatch.setattr(RetryPolicy, "delay", lambda self, retry, error: 0)
+    for run in range(2):
+        failed.clear()
+        result = run_main("--no-cache", "--refetch-authors", "--no-quota-check")
+        assert result.exit_code == 0, result.output
+        report = latest_run_report(config.REPORT_DIR)
+        assert report["requests"]["ads_enrichment"]["retries"] == 1
@@ -0,0 +1,108 @@
+import datetime
+import json
+
+import pytest
+
+from pubquery import config
+from pubquery.ads_queries import ADSQueries
+from pubquery.publications_query import check_ads_quota, expected_publications
+from pubquery.quota import (
+    ADSQuota,
+    QuotaExceededError,
+    estimate_enrichment_requests,
+    estimate_search_requests,
+)
+
+
+def quota(remaining, reserve=10):
+    tracker = ADSQuota(reserve=reserve)
+    tracker.update(
+        {
+            "X-RateLimit-Limit": "5000",
+            "X-RateLimit-Remaining": str(remaining),
+            "X-RateLimit-Reset": "0",
+        }
+    )
+    return tracker
+
+
+def save_report(directory, from_date, to_date, publications, **details):
+    directory.mkdir(parents=True, exist_ok=True)
+    with open(directory / "run_report_{0}.json".format(from_date), "w") as f:
+        json.dump(
+            dict(
+                from_date=from_date,
+                to_date=to_date,
+                publications=publications,
+                **details,
+            ),
+            f,
+        )
+
+
+def test_update_reads_headers_case_insensitively():
+    tracker = ADSQuota()
+    tracker.update(
+        {
+            "x-ratelimit-limit": "5000",
+            "X-RATELIMIT-REMAINING": "42",
+            "X-RateLimit-Reset": "1700000000",
+        }
+    )
+    assert (tracker.limit, tracker.remaining, tracker.reset) == (5000, 42, 1700000000)
+
+
+def test_acquire_stops_at_reserve():
+    tracker = quota(12)
+    tracker.acquire()
+    tracker.acquire()
+    with pytest.raises(QuotaExceededError):
+        tracker.acquire()
+    assert tracker.remaining == 10
+
+
+def test_unknown_quota_is_not_checked():
+    ADSQuota().check(1000000)
+
+
+def test_estimates():
+    assert estimate_search_requests(4, 30) == (4, 120)
+    assert estimate_enrichment_requests(0, 50) == 0
+    assert estimate_enrichment_requests(101, 50) == 3
+
+
+def test_expected_publications_scales_latest_report(run_dirs):
+    assert expected_publications(12) is None
+    save_report(run_dirs / "reports", "2024-01-01", "2024-03-31", 90)
+    assert expected_publications(12) == 360
+
+
+def test_expected_publications_include_previously_reported(run_dirs):
+    # an incremental run reports only the new publications, but has found all of them
+    save_report(run_dirs / "reports", "2024-01-01", "2024-03-31", 6, found=90)
+    assert expected_publications(12) == 360
+
+
+def test_quota_check_includes_enrichment(run_dirs, monkeypatch):
+    queries = ADSQueries(datetime.date(2025, 1, 1), datetime.date(2025, 1, 31))
+    searches = sum(
+        len(queries.plan(field, terms))
+        for field, terms in [
+            ("full", config.KEYWORDS),
+            ("author", list(config.AUTHORS)),
+            ("aff", config.AFFILIATIONS),
+            ("aff", config.INSTITUTIONS),
+        ]
+    )
+    save_report(run_dirs / "reports", "2024-12-01", "2024-12-31", 500)
+    monkeypatch.setattr(ADSQuota, "refresh", lambda self: None)
+
+    # enough for the searches and 10 enrichment requests, with the reserve
+    tracker = quota(searches + 10 + 10)
+    check_ads_quota(tracker, queries, enrichment_batch_size=50)
+    check_ads_quota(tracker, queries, enrichment_batch_size=50, refetch=True)
+
+    tracker = quota(searches + 9 + 10)
+    check_ads_quota(tracker, queries, enrichment_batch_size=50)
+    with pytest.raises(QuotaExceededError):
+        check_ads_quota(tracker, queries, enrichment_batch_size=50, refetch=True)